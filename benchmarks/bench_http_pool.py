@@ -0,0 +1,97 @@
+"""
+Compares per-request httpx clients with the pooled CoinMarketCapAPI client.
+
+A local keep-alive HTTP/1.1 stub answers the global-metrics endpoint. The
+stub can delay the first response on every new connection to model the
+TCP+TLS round trips a real upstream costs.
+
+Usage:
+    python -m benchmarks.bench_http_pool --requests 200 --handshake-delay 30
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from src.api.coinmarketcap import CoinMarketCapAPI
+
+ENDPOINT = "/v1/global-metrics/quotes/latest"
+BODY = json.dumps({"data": {"quote": {"USD": {"total_market_cap": 1.0, "btc_dominance": 50.0}}}}).encode()
+
+async def _serve_connection(reader, writer, handshake_delay: float, stats: dict):
+    stats["connections"] += 1
+    if handshake_delay:
+        await asyncio.sleep(handshake_delay)
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            if not head:
+                break
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Connection: keep-alive\r\n"
+                b"Content-Length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+async def _time_calls(call, count: int) -> list:
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+def _report(name: str, latencies: list, connections: int):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<12} mean={statistics.mean(latencies):7.3f}ms  "
+        f"p50={statistics.median(latencies):7.3f}ms  p95={p95:7.3f}ms  "
+        f"connections={connections}"
+    )
+
+async def main(count: int, handshake_delay_ms: float):
+    stats = {"connections": 0}
+    server = await asyncio.start_server(
+        lambda r, w: _serve_connection(r, w, handshake_delay_ms / 1000, stats), "127.0.0.1", 0
+    )
+    port = server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+
+    async def per_request_call():
+        # The pre-pooling behaviour: a fresh client (and connection) per call.
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{base_url}{ENDPOINT}", headers={"X-CMC_PRO_API_KEY": "bench"})
+            response.raise_for_status()
+            response.json()
+
+    async with server:
+        per_request = await _time_calls(per_request_call, count)
+        _report("per-request", per_request, stats["connections"])
+
+        stats["connections"] = 0
+        api = CoinMarketCapAPI(api_key="bench", base_url=base_url)
+        try:
+            pooled = await _time_calls(api.get_market_cap, count)
+        finally:
+            await api.close()
+        _report("pooled", pooled, stats["connections"])
+
+    print(f"speedup (mean): {statistics.mean(per_request) / statistics.mean(pooled):.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--handshake-delay", type=float, default=0.0,
+                        help="Milliseconds added to the first response on each new connection.")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.handshake_delay))
@@ -0,0 +1,66 @@
+"""
+Renders CEX events with the original per-parameter str.replace path and the
+precompiled template path, and checks both produce identical output.
+
+Usage:
+    python -m benchmarks.bench_templates --events 100000 --distinct 1000
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict
+
+from src.cex import cex_screener
+
+def legacy_apply_template(template_obj: Dict[str, Any], data: Dict[str, Any]) -> str:
+    """The pre-compilation implementation of apply_template."""
+    if not template_obj:
+        return f"CEX Event (no template): {json.dumps(data, indent=2)}"
+
+    message = f"{template_obj.get('title', '')}\n\n{template_obj.get('message', '')}"
+    for param in template_obj.get('parameters', []):
+        value = data.get(param, 'N/A')
+        message = message.replace(f"{{{{{param}}}}}", str(value))
+    return message
+
+def make_events(count: int, distinct: int):
+    rng = random.Random(42)
+    categories = list(cex_screener.TEMPLATES)
+    pool = []
+    for i in range(distinct):
+        category = rng.choice(categories)
+        event = {"category": category}
+        for param in cex_screener.TEMPLATES[category].get("parameters", []):
+            # Leave some parameters out to exercise the N/A fallback.
+            if rng.random() < 0.9:
+                event[param] = f"{param}-{rng.randint(0, 10**6)}"
+        pool.append(event)
+    return [pool[i % distinct] for i in range(count)]
+
+def run(render, events) -> float:
+    templates = cex_screener.TEMPLATES
+    started = time.perf_counter()
+    for event in events:
+        render(templates[event["category"]], event)
+    return time.perf_counter() - started
+
+def main(count: int, distinct: int):
+    events = make_events(count, distinct)
+    for event in events[:distinct]:
+        template = cex_screener.TEMPLATES[event["category"]]
+        assert legacy_apply_template(template, event) == cex_screener.apply_template(template, event)
+
+    legacy = run(legacy_apply_template, events)
+    compiled = run(cex_screener.apply_template, events)
+    print(f"legacy    {count} events: {legacy * 1000:8.1f} ms ({legacy / count * 1e6:.2f} us/event)")
+    print(f"compiled  {count} events: {compiled * 1000:8.1f} ms ({compiled / count * 1e6:.2f} us/event)")
+    print(f"speedup: {legacy / compiled:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--distinct", type=int, default=1000,
+                        help="Number of distinct payloads; repeats exercise the render cache.")
+    args = parser.parse_args()
+    main(args.events, args.distinct)
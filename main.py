@@ -1,81 +1,158 @@
+import argparse
 import asyncio
-import threading
-from telegram.ext import Application
+import signal
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
 
 from src.logger import get_logger
-from src import config
-from src.web_server import app as fastapi_app
-from src.bots import admin_bot, cex_bot, market_stats_bot
+from src import config, startup
+from src import supervisor
 
-import uvicorn
+if TYPE_CHECKING:
+    from telegram.ext import Application
+    from src.web_server import EmbeddedServer
 
 log = get_logger(__name__)
 
-async def run_bot(token: str, setup_func):
-    """Generic function to run a bot."""
-    if not token:
-        log.error(f"Token for {setup_func.__name__} is not configured. Skipping.")
-        return
-
-    log.info(f"Starting bot for {setup_func.__name__}...")
-    application = Application.builder().token(token).build()
-    setup_func(application)
-
+CONFIG_DIR = Path(__file__).parent / 'config'
+
+# Heavy subsystems (telegram, FastAPI, uvicorn, psutil, the bots) are imported
+# inside main() after the configuration is loaded, so `--mode supervisor` and
+# configuration errors never pay for them.
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="CryptoHawk bots and API server.")
+    parser.add_argument(
+        "--mode", choices=("single", "supervisor"), default="single",
+        help="'single' runs everything in one process; 'supervisor' runs each bot, "
+             "the poller and the web server as separate, auto-restarted processes.",
+    )
+    parser.add_argument(
+        "--profile-startup", action="store_true",
+        help="Log the import and initialisation time of each subsystem once startup completes.",
+    )
+    # Used by the supervisor to start one worker process.
+    parser.add_argument("--worker", choices=supervisor.WORKERS, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def load_and_validate_configuration() -> bool:
+    with startup.timed("init", "configuration"):
+        config.load_configuration(CONFIG_DIR)
     try:
-        await application.initialize()
-        await application.start()
-        await application.updater.start_polling()
-        log.info(f"Bot {setup_func.__name__} started successfully.")
-    except Exception as e:
-        log.error(f"Error starting bot {setup_func.__name__}: {e}", exc_info=True)
-
-
-def run_fastapi_server():
-    """Function to run the FastAPI server in a separate thread."""
-    log.info(f"Starting FastAPI server on port {config.WEBHOOK_PORT}")
-    uvicorn.run(fastapi_app, host="0.0.0.0", port=config.WEBHOOK_PORT)
-
+        config.validate_configuration()
+    except ValueError as e:
+        log.critical(f"Configuration error: {e}")
+        return False
+    return True
 
 async def main():
     """
-    Main entrypoint to launch all bots and the web server.
+    Main entrypoint to launch all bots and the web server on one event loop.
     """
     log.info("🚀 Starting CryptoHawk project (Python Version)...")
 
     # Load and validate configuration first
-    from pathlib import Path
-    config_dir = Path(__file__).parent / 'config'
-    config.load_configuration(config_dir)
-
-    try:
-        config.validate_configuration()
-    except ValueError as e:
-        log.critical(f"Configuration error: {e}")
+    if not load_and_validate_configuration():
         return
 
-    # Run FastAPI server in a separate thread
-    server_thread = threading.Thread(target=run_fastapi_server, daemon=True)
-    server_thread.start()
-
-    # Gather all bot tasks
-    bot_tasks = [
-        run_bot(config.TELEGRAM_BOSS_BOT_TOKEN, admin_bot.setup_admin_bot),
-        run_bot(config.TELEGRAM_CEX_BOT_TOKEN, cex_bot.setup_cex_bot),
-        run_bot(config.TELEGRAM_MARKET_BOT_TOKEN, market_stats_bot.setup_market_stats_bot),
-    ]
+    runner = startup.import_module("src.bots.runner")
+    cex_screener = startup.import_module("src.cex.cex_screener")
+    market_poller = startup.import_module("src.market_stats.poller")
+    admin_bot = startup.import_module("src.bots.admin_bot")
+    cex_bot = startup.import_module("src.bots.cex_bot")
+    market_stats_bot = startup.import_module("src.bots.market_stats_bot")
+    web_server = startup.import_module("src.web_server")
+
+    # Bound the CEX notification queue before anything produces into it
+    with startup.timed("init", "notification queue"):
+        cex_screener.configure_notification_queue(
+            config.CEX_NOTIFICATION_QUEUE_SIZE, config.CEX_NOTIFICATION_OVERFLOW
+        )
+        cex_screener.configure_aggregation(config.CEX_AGGREGATION_WINDOW, config.CEX_DEDUP_SIZE)
+
+    # Restore market data history before anything reads the cache; it also
+    # seeds the change thresholds with the last announced values
+    with startup.timed("init", "market history"):
+        market_poller.configure_change_detection(config.MARKET_CHANGE_THRESHOLDS)
+        market_poller.load_history()
+
+    stop_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_requested.set)
+        except NotImplementedError:
+            pass
+
+    applications: Dict[str, "Application"] = {}
+    server: Optional["EmbeddedServer"] = None
+    try:
+        # Bots start first, so the CEX delivery pool is draining the
+        # notification queue before the web server accepts events.
+        names = ("admin", "cex", "market_stats")
+        with startup.timed("init", "bots"):
+            started = await asyncio.gather(
+                runner.run_bot(config.TELEGRAM_BOSS_BOT_TOKEN, admin_bot.setup_admin_bot, "admin"),
+                runner.run_bot(config.TELEGRAM_CEX_BOT_TOKEN, cex_bot.setup_cex_bot, "cex"),
+                runner.run_bot(config.TELEGRAM_MARKET_BOT_TOKEN, market_stats_bot.setup_market_stats_bot,
+                               "market_stats"),
+            )
+        applications = {name: application for name, application in zip(names, started)
+                        if application is not None}
+
+        server = web_server.EmbeddedServer(config.WEBHOOK_PORT)
+        with startup.timed("init", "web server"):
+            server_started = await server.start()
+        if server_started:
+            startup.report("single process")
+            # Run until a signal arrives or the server stops on its own.
+            stop_waiter = asyncio.create_task(stop_requested.wait())
+            await asyncio.wait({stop_waiter, server.task}, return_when=asyncio.FIRST_COMPLETED)
+            stop_waiter.cancel()
+    finally:
+        await shutdown(server, applications)
+
+
+async def shutdown(server: Optional["EmbeddedServer"] = None,
+                   applications: Optional[Dict[str, "Application"]] = None):
+    """
+    Stops everything in reverse dependency order: stop taking HTTP requests,
+    stop polling for market data, stop the bots (which flushes their queues and
+    stores), then release the shared resources.
+    """
+    from src.bots import market_stats_bot
+    from src.bots.runner import stop_bot
+    from src.market_stats import poller as market_poller
+    from src.storage.state_store import state_store
 
-    await asyncio.gather(*bot_tasks)
+    log.info("Shutting down CryptoHawk project...")
+    if server is not None:
+        await server.stop()
+    market_poller.stop_poller()
+    for name, application in (applications or {}).items():
+        await stop_bot(application, name)
 
-    # Keep the main thread alive (the bots are running in the asyncio event loop)
-    # The server thread is a daemon, so it won't block exit.
-    # The polling updaters will keep the asyncio loop running.
-    while True:
-        await asyncio.sleep(60)
+    log.info("Releasing shared resources...")
+    await market_stats_bot.subscriber_store.close()
+    await state_store.close()
+    await market_poller.close_api()
+    market_poller.close_history()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.profile_startup:
+        startup.enable()
     try:
-        asyncio.run(main())
+        if args.worker:
+            if load_and_validate_configuration():
+                supervisor.run_worker(args.worker)
+        elif args.mode == "supervisor":
+            if load_and_validate_configuration():
+                log.info("🚀 Starting CryptoHawk project in supervisor mode...")
+                asyncio.run(supervisor.run_supervisor())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         log.info("Shutting down CryptoHawk project...")
     except Exception as e:
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from ..logger import get_logger
+
+log = get_logger(__name__)
+
+@dataclass
+class CacheEntry:
+    value: Any
+    fetched_at: float
+
+class AsyncTTLCache:
+    """
+    A small TTL cache for upstream responses.
+
+    Concurrent misses for the same key share one in-flight fetch (single-flight),
+    and entries past their TTL but inside the stale window are served immediately
+    while a single background refresh revalidates them. A fetch that returns None
+    is treated as a failure and never replaces a cached value.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._entries: Dict[Hashable, CacheEntry] = {}
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """Returns the cached entry for `key` regardless of its age."""
+        return self._entries.get(key)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drops one entry, or every entry when `key` is None."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def get_or_fetch(self, key: Hashable, fetcher: Callable[[], Awaitable[Any]],
+                           ttl: float, stale_ttl: float = 0.0, allow_stale: bool = True) -> Any:
+        """
+        Returns the value for `key`, calling `fetcher` only when no usable entry exists.
+        With `allow_stale=False` a stale entry is revalidated before returning.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = self._clock() - entry.fetched_at
+            if age < ttl:
+                return entry.value
+            if allow_stale and age < ttl + stale_ttl:
+                self._start_fetch(key, fetcher)
+                return entry.value
+
+        # Shield the shared fetch so one cancelled caller doesn't cancel it for the rest.
+        return await asyncio.shield(self._start_fetch(key, fetcher))
+
+    def _start_fetch(self, key: Hashable, fetcher: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, fetcher))
+            self._in_flight[key] = task
+        return task
+
+    async def _fetch(self, key: Hashable, fetcher: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await fetcher()
+        except Exception as e:
+            log.error("Cache fetch for '%s' failed: %s", key, e)
+            value = None
+        finally:
+            self._in_flight.pop(key, None)
+
+        if value is not None:
+            self._entries[key] = CacheEntry(value=value, fetched_at=self._clock())
+        return value
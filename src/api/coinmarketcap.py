@@ -1,30 +1,98 @@
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
 import httpx
-from ..config import COINMARKETCAP_API_KEY
+from .. import config
 from ..logger import get_logger
+from .cache import AsyncTTLCache
 
 log = get_logger(__name__)
 
 BASE_URL = "https://pro-api.coinmarketcap.com"
+FEAR_AND_GREED_URL = "https://api.alternative.me/fng/?limit=1"
+
+# --- Connection Pool Settings ---
+# One pooled client is kept per upstream host, so every poll cycle reuses
+# warm TCP/TLS connections instead of paying a fresh handshake.
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=20,
+    max_keepalive_connections=10,
+    keepalive_expiry=120.0,
+)
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
 
 class CoinMarketCapAPI:
-    def __init__(self, api_key: str = COINMARKETCAP_API_KEY):
-        if not api_key:
-            raise ValueError("CoinMarketCap API key is required.")
-        self._headers = {
-            'Accepts': 'application/json',
-            'X-CMC_PRO_API_KEY': api_key,
-        }
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = BASE_URL,
+        fear_and_greed_url: str = FEAR_AND_GREED_URL,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        http2: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        # The key is resolved on first use so the instance can be built
+        # before load_configuration() has populated the config module.
+        self._api_key = api_key
+        self._base_url = base_url
+        self._fear_and_greed_url = fear_and_greed_url
+        self._limits = limits
+        self._timeout = timeout
+        self._http2 = http2
+        self._transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _get_client(self, url: str) -> httpx.AsyncClient:
+        """
+        Returns the shared client for the host of `url`, creating it on first use.
+        """
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self._limits,
+                timeout=self._timeout,
+                http2=self._http2,
+                transport=self._transport,
+            )
+            self._clients[origin] = client
+            log.info("Opened pooled HTTP client for %s.", origin)
+        return client
+
+    async def close(self):
+        """
+        Closes all pooled clients. Called once on application shutdown.
+        """
+        clients = list(self._clients.items())
+        self._clients.clear()
+        for origin, client in clients:
+            try:
+                await client.aclose()
+                log.info("Closed pooled HTTP client for %s.", origin)
+            except Exception as e:
+                log.error("Error closing HTTP client for %s: %s", origin, e)
 
     async def _request(self, endpoint: str, params: dict = None):
         """
         Makes an asynchronous request to the CoinMarketCap API.
         """
-        url = f"{BASE_URL}{endpoint}"
+        api_key = self._api_key or config.COINMARKETCAP_API_KEY
+        if not api_key:
+            log.error("CoinMarketCap API key is required.")
+            return None
+
+        headers = {
+            'Accepts': 'application/json',
+            'X-CMC_PRO_API_KEY': api_key,
+        }
+        url = f"{self._base_url}{endpoint}"
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self._headers, params=params)
-                response.raise_for_status()  # Raises an exception for 4XX/5XX responses
-                return response.json()
+            client = self._get_client(url)
+            response = await client.get(url, headers=headers, params=params)
+            response.raise_for_status()  # Raises an exception for 4XX/5XX responses
+            return response.json()
         except httpx.HTTPStatusError as e:
             log.error("HTTP error occurred: %s - %s", e.response.status_code, e.response.text)
             return None
@@ -42,13 +110,12 @@ class CoinMarketCapAPI:
         """
         log.warning("The official CoinMarketCap API does not provide a Fear & Greed Index.")
         # As a fallback, we can use the alternative.me API
-        alternative_url = "https://api.alternative.me/fng/?limit=1"
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(alternative_url)
-                response.raise_for_status()
-                data = response.json()
-                return data.get('data', [{}])[0]
+            client = self._get_client(self._fear_and_greed_url)
+            response = await client.get(self._fear_and_greed_url)
+            response.raise_for_status()
+            data = response.json()
+            return data.get('data', [{}])[0]
         except Exception as e:
             log.error("Could not fetch Fear & Greed index from alternative.me: %s", e)
             return None
@@ -74,6 +141,36 @@ class CoinMarketCapAPI:
             return data['data'].get('quote', {}).get('USD', {})
         return None
 
+# --- Cached Client ---
+# (ttl, stale window) in seconds per endpoint. Within the TTL callers share the
+# cached response; inside the stale window they get it instantly while one
+# background request revalidates it.
+ENDPOINT_TTLS = {
+    "market_cap": (30.0, 300.0),
+    "fear_and_greed": (600.0, 3600.0),
+}
+
+class CachedCoinMarketCapAPI(CoinMarketCapAPI):
+    """
+    CoinMarketCapAPI with a per-endpoint TTL cache and request coalescing,
+    so the poller, the bots and the web server share upstream responses.
+    """
+
+    def __init__(self, *args, ttls: Optional[Dict[str, tuple]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ttls = {**ENDPOINT_TTLS, **(ttls or {})}
+        self._cache = AsyncTTLCache()
+
+    async def _cached(self, key: str, fetcher, allow_stale: bool):
+        ttl, stale_ttl = self._ttls[key]
+        return await self._cache.get_or_fetch(key, fetcher, ttl, stale_ttl, allow_stale=allow_stale)
+
+    async def get_fear_and_greed_index(self, allow_stale: bool = True):
+        return await self._cached("fear_and_greed", super().get_fear_and_greed_index, allow_stale)
+
+    async def get_market_cap(self, allow_stale: bool = True):
+        return await self._cached("market_cap", super().get_market_cap, allow_stale)
+
 # Example usage (for testing)
 if __name__ == '__main__':
     import asyncio
@@ -81,18 +178,21 @@ if __name__ == '__main__':
     async def main():
         api = CoinMarketCapAPI()
 
-        print("--- Fear & Greed Index ---")
-        fg_index = await api.get_fear_and_greed_index()
-        print(fg_index)
+        try:
+            print("--- Fear & Greed Index ---")
+            fg_index = await api.get_fear_and_greed_index()
+            print(fg_index)
 
-        print("\n--- Altcoin Season Index ---")
-        alt_season = await api.get_altcoin_season_index()
-        print(alt_season)
+            print("\n--- Altcoin Season Index ---")
+            alt_season = await api.get_altcoin_season_index()
+            print(alt_season)
 
-        print("\n--- Global Market Cap ---")
-        market_cap = await api.get_market_cap()
-        if market_cap:
-            print(f"Total Market Cap: ${market_cap.get('total_market_cap'):,.2f}")
-            print(f"BTC Dominance: {market_cap.get('btc_dominance'):.2f}%")
+            print("\n--- Global Market Cap ---")
+            market_cap = await api.get_market_cap()
+            if market_cap:
+                print(f"Total Market Cap: ${market_cap.get('total_market_cap'):,.2f}")
+                print(f"BTC Dominance: {market_cap.get('btc_dominance'):.2f}%")
+        finally:
+            await api.close()
 
     asyncio.run(main())
@@ -1,12 +1,13 @@
 import asyncio
-import psutil
-import os
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 
 from .. import config
+from ..charts.service import chart_service
 from ..logger import get_logger
 from ..market_stats import poller as market_poller
+from ..server_status import format_duration, sparkline, status_sampler, system_uptime
+from ..storage.state_store import state_store
 
 log = get_logger(__name__)
 
@@ -23,7 +24,7 @@ def get_main_menu_keyboard():
     keyboard = [
         [InlineKeyboardButton("MarketStats", callback_data="menu_marketstats"), InlineKeyboardButton("OnChain", callback_data="menu_onchain")],
         [InlineKeyboardButton("CEX Screen", callback_data="menu_cex_screen"), InlineKeyboardButton("DEX Screen", callback_data="menu_dex_screen")],
-        [InlineKeyboardButton("Status", callback_data="menu_status")]
+        [InlineKeyboardButton("Status", callback_data="menu_status"), InlineKeyboardButton("Charts", callback_data="menu_charts")]
     ]
     return InlineKeyboardMarkup(keyboard)
 
@@ -49,6 +50,30 @@ market_stats_settings = {
     "cmc_fear_greed": False,
 }
 
+async def _restore_market_stats_settings(application: Application):
+    """Restores the saved event toggles and resumes polling for the active ones."""
+    try:
+        saved = await state_store.get_settings("market_stats")
+    except Exception as e:
+        log.error("Could not load MarketStats settings: %s", e)
+        return
+    for key, value in saved.items():
+        if key in market_stats_settings:
+            market_stats_settings[key] = bool(value)
+
+    active_events = [key for key, active in market_stats_settings.items() if active]
+    if active_events:
+        log.info("Resuming MarketStats polling for: %s", ", ".join(active_events))
+        market_poller.set_active_events(active_events)
+
+async def _post_init(application: Application):
+    status_sampler.start()
+    await _restore_market_stats_settings(application)
+
+async def _post_stop(application: Application):
+    await status_sampler.stop()
+    chart_service.close()
+
 def get_market_stats_menu_keyboard():
     buttons = []
     for key, is_active in market_stats_settings.items():
@@ -71,14 +96,15 @@ async def toggle_market_event(update: Update, context: ContextTypes.DEFAULT_TYPE
     if event_key in market_stats_settings:
         market_stats_settings[event_key] = not market_stats_settings[event_key]
         await query.answer(f"{event_key} is now {'ON' if market_stats_settings[event_key] else 'OFF'}")
+        try:
+            await state_store.set_setting("market_stats", event_key, market_stats_settings[event_key])
+        except Exception as e:
+            log.error("Could not save MarketStats setting '%s': %s", event_key, e)
     else:
         await query.answer("Unknown event.")
 
     active_events = [key for key, active in market_stats_settings.items() if active]
-    if active_events:
-        market_poller.start_poller(active_events)
-    else:
-        market_poller.stop_poller()
+    market_poller.set_active_events(active_events)
 
     await query.edit_message_text(
         text="MarketStats Settings:\nToggle market events to monitor:",
@@ -86,37 +112,46 @@ async def toggle_market_event(update: Update, context: ContextTypes.DEFAULT_TYPE
     )
 
 # --- Server Status Menu ---
-async def get_server_status() -> str:
-    """Gathers and formats server metrics using psutil."""
-    cpu_load = psutil.cpu_percent(interval=1)
+SPARKLINE_WIDTH = 30
+GB = 1024 ** 3
+MB = 1024 ** 2
 
-    mem = psutil.virtual_memory()
-    mem_total_gb = mem.total / (1024**3)
-    mem_used_gb = mem.used / (1024**3)
-    mem_percent = mem.percent
+def _range(values) -> str:
+    return f"{min(values):.1f}/{sum(values) / len(values):.1f}/{max(values):.1f}"
 
-    disk = psutil.disk_usage('/')
-    disk_total_gb = disk.total / (1024**3)
-    disk_used_gb = disk.used / (1024**3)
-    disk_percent = disk.percent
+async def get_server_status() -> str:
+    """Formats the latest background status sample and its recent history."""
+    sample = status_sampler.latest
+    if sample is None:
+        return "🖥 **System Status**\n\nStatus is still being collected; try again in a few seconds."
 
-    uptime_seconds = psutil.boot_time()
-    uptime_hours = int(uptime_seconds / 3600)
-    uptime_minutes = int((uptime_seconds % 3600) / 60)
+    cpu = status_sampler.series("cpu_percent")
+    memory = status_sampler.series("memory_percent")
+    lag_ms = [lag * 1000 for lag in status_sampler.series("loop_lag")]
+    window = format_duration(len(status_sampler.samples) * status_sampler.interval)
+    fds = "n/a" if sample.open_fds is None else str(sample.open_fds)
 
     status_text = (
         f"🖥 **System Status**\n\n"
-        f"⚡ **CPU Load:** `{cpu_load}%`\n"
-        f"🖥 **Memory:** `{mem_used_gb:.2f} GB / {mem_total_gb:.2f} GB ({mem_percent}%)`\n"
-        f"💾 **Disk Usage:** `{disk_used_gb:.2f} GB / {disk_total_gb:.2f} GB ({disk_percent}%)`\n"
-        f"⏳ **Uptime:** `{uptime_hours}h {uptime_minutes}m`"
+        f"⚡ **CPU Load:** `{sample.cpu_percent:.1f}%`\n"
+        f"`{sparkline(cpu, SPARKLINE_WIDTH)}` min/avg/max `{_range(cpu)}`\n"
+        f"🖥 **Memory:** `{sample.memory_used / GB:.2f} GB / {sample.memory_total / GB:.2f} GB "
+        f"({sample.memory_percent}%)`\n"
+        f"`{sparkline(memory, SPARKLINE_WIDTH)}` min/avg/max `{_range(memory)}`\n"
+        f"💾 **Disk Usage:** `{sample.disk_used / GB:.2f} GB / {sample.disk_total / GB:.2f} GB "
+        f"({sample.disk_percent}%)`\n"
+        f"🤖 **Process:** `{sample.process_rss / MB:.0f} MB RSS, {fds} open files`\n"
+        f"🔁 **Event Loop Lag:** `{lag_ms[-1]:.1f} ms` (max `{max(lag_ms):.1f} ms`)\n"
+        f"⏳ **Uptime:** `system {format_duration(system_uptime())}, "
+        f"bot {format_duration(status_sampler.process_uptime())}`\n\n"
+        f"_Last {window}, sampled every {status_sampler.interval:.0f}s._"
     )
     return status_text
 
 async def menu_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Displays the server status."""
     query = update.callback_query
-    await query.answer("Fetching server status...")
+    await query.answer()
 
     status_text = await get_server_status()
 
@@ -126,6 +161,44 @@ async def menu_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("← Back", callback_data="main_menu")]])
     )
 
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Replies to /status with the server status."""
+    if not admin_filter.filter(update.message):
+        await update.message.reply_text("❌ You are not authorized to use this bot.")
+        return
+    await update.message.reply_text(await get_server_status(), parse_mode='Markdown')
+
+# --- Charts Menu ---
+def get_charts_menu_keyboard():
+    buttons = []
+    for metric in market_poller.market_data_cache.metrics():
+        label = metric.replace(".", " · ").replace("_", " ")
+        buttons.append([
+            InlineKeyboardButton(f"📈 {label}", callback_data=f"chart_line_{metric}"),
+            InlineKeyboardButton("🕯", callback_data=f"chart_candle_{metric}"),
+        ])
+    buttons.append([InlineKeyboardButton("← Back", callback_data="main_menu")])
+    return InlineKeyboardMarkup(buttons)
+
+async def menu_charts(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    text = "Charts (last 24h):\nPick a metric as a line or candle chart."
+    if not market_poller.market_data_cache.metrics():
+        text = "No market history has been recorded yet."
+    await query.edit_message_text(text, reply_markup=get_charts_menu_keyboard())
+
+async def send_chart(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sends the 24h chart picked in the Charts menu."""
+    query = update.callback_query
+    _, kind, metric = query.data.split("_", 2)
+    chart = await chart_service.get(metric, kind=kind)
+    if chart is None:
+        await query.answer("No data for this chart yet.")
+        return
+    await query.answer()
+    await chart_service.send(context.bot, query.message.chat_id, chart)
+
 # --- Placeholder Handlers ---
 async def placeholder_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
@@ -140,12 +213,17 @@ def setup_admin_bot(application: Application):
     log.info("Setting up admin bot handlers...")
 
     application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("status", status_command))
     application.add_handler(CallbackQueryHandler(back_to_main_menu, pattern="^main_menu$"))
     application.add_handler(CallbackQueryHandler(menu_marketstats, pattern="^menu_marketstats$"))
     application.add_handler(CallbackQueryHandler(toggle_market_event, pattern="^toggle_market_"))
     application.add_handler(CallbackQueryHandler(menu_status, pattern="^menu_status$"))
+    application.add_handler(CallbackQueryHandler(menu_charts, pattern="^menu_charts$"))
+    application.add_handler(CallbackQueryHandler(send_chart, pattern="^chart_(line|candle)_"))
 
     application.add_handler(CallbackQueryHandler(placeholder_menu, pattern="^menu_(onchain|cex_screen|dex_screen)$"))
+    application.post_init = _post_init
+    application.post_stop = _post_stop
 
     log.info("Admin bot handlers set up successfully.")
 
@@ -1,18 +1,77 @@
 import asyncio
+from typing import Optional
+
 from telegram.ext import Application, CommandHandler
 from .. import config
 from ..logger import get_logger
+from ..cex import cex_screener
+from ..notifications.delivery import DeliveryPool
+from ..storage.state_store import state_store
 
 log = get_logger(__name__)
 
+# --- Notification Delivery ---
+delivery_pool: Optional[DeliveryPool] = None
+
+async def _on_chat_blocked(chat_id: int):
+    """Unsubscribes a chat that has blocked the bot."""
+    cex_screener.filter_index.remove(chat_id)
+    await state_store.delete_user_filters(chat_id)
+
+async def _load_user_filters():
+    """Rebuilds the filter index from the filters saved in the state store."""
+    try:
+        saved = await state_store.load_user_filters()
+    except Exception as e:
+        log.error("Could not load CEX subscriber filters: %s", e)
+        return
+    for chat_id, user_filters in saved.items():
+        cex_screener.filter_index.update(chat_id, user_filters)
+    log.info("Loaded filters for %d CEX subscribers.", len(saved))
+
+async def _start_delivery(application: Application):
+    """Restores subscribers and starts draining the screener's notification queue through this bot."""
+    global delivery_pool
+    await _load_user_filters()
+    delivery_pool = DeliveryPool(
+        application.bot,
+        cex_screener.notification_queue,
+        workers=config.CEX_DELIVERY_WORKERS,
+        on_blocked=_on_chat_blocked,
+    )
+    await delivery_pool.start()
+
+async def _stop_delivery(application: Application):
+    if delivery_pool is not None:
+        await delivery_pool.stop()
+
 async def start(update, context):
-    """A placeholder start command for the CEX bot."""
+    """Subscribes the chat to CEX alerts with the default filters."""
+    chat_id = update.effective_chat.id
+    if chat_id not in cex_screener.filter_index:
+        cex_screener.filter_index.update(chat_id, cex_screener.DEFAULT_USER_FILTERS)
+        await state_store.set_user_filters({chat_id: cex_screener.DEFAULT_USER_FILTERS})
+        log.info("New CEX subscriber added: %d", chat_id)
     await update.message.reply_text("🚀 Welcome to CryptoHawk CEX Bot (Python Version)!")
 
+async def stop(update, context):
+    """Unsubscribes the chat from CEX alerts."""
+    chat_id = update.effective_chat.id
+    if chat_id in cex_screener.filter_index:
+        cex_screener.filter_index.remove(chat_id)
+        await state_store.delete_user_filters(chat_id)
+        log.info("CEX subscriber removed: %d", chat_id)
+        await update.message.reply_text("👋 You have been unsubscribed from CEX alerts.")
+    else:
+        await update.message.reply_text("You were not subscribed.")
+
 def setup_cex_bot(application: Application):
     """Adds handlers to the CEX bot application."""
     log.info("Setting up CEX bot handlers...")
     application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("stop", stop))
+    application.post_init = _start_delivery
+    application.post_stop = _stop_delivery
     log.info("CEX bot handlers set up successfully.")
 
 async def main():
@@ -1,50 +1,60 @@
 import asyncio
 import json
 from pathlib import Path
-from typing import Set
+from typing import Dict, List, Set
 
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
 from .. import config
+from ..charts.service import CHART_KINDS, DEFAULT_WINDOW, chart_service, parse_window
 from ..logger import get_logger
 from ..market_stats import poller
+from ..storage.state_store import state_store
+from ..storage.subscribers import SubscriberStore
 
 log = get_logger(__name__)
 
 # --- Subscriber Management ---
+# Subscribers are kept in memory and written behind to the shared state store.
+# The old JSON file and subscriber snapshot are only read once, to migrate them.
 SUBSCRIBERS_FILE = Path(__file__).parent.parent.parent / 'config' / 'market_stats_subscribers.json'
-_subscribers: Set[int] = set()
-
-def _load_subscribers():
-    """Loads subscriber chat IDs from the JSON file."""
-    global _subscribers
-    if SUBSCRIBERS_FILE.exists():
-        try:
-            with open(SUBSCRIBERS_FILE, 'r') as f:
-                _subscribers = set(json.load(f))
-                log.info("Loaded %d subscribers for MarketStatsBot.", len(_subscribers))
-        except (json.JSONDecodeError, TypeError):
-            log.error("Could not decode subscribers file. Starting fresh.")
-            _subscribers = set()
-    else:
-        log.info("Subscribers file not found. Starting with an empty set.")
-
-def _save_subscribers():
-    """Saves the current set of subscribers to the JSON file."""
+SUBSCRIBERS_DIR = Path(__file__).parent.parent.parent / 'data' / 'subscribers'
+subscriber_store = SubscriberStore(SUBSCRIBERS_DIR, 'market_stats', legacy_json=SUBSCRIBERS_FILE,
+                                   state_store=state_store)
+_subscribers: Set[int] = subscriber_store.members
+
+def _prune_subscribers(chat_ids: List[int]):
+    """Drops chats the poller could no longer reach."""
+    removed = subscriber_store.discard_many(chat_ids)
+    if removed:
+        log.info("Removed %d unreachable subscribers.", removed)
+
+def _migrate_subscribers(moves: Dict[int, int]):
+    """Follows groups the poller found upgraded to supergroups."""
+    for old_chat_id, new_chat_id in moves.items():
+        if subscriber_store.discard(old_chat_id):
+            subscriber_store.add(new_chat_id)
+    log.info("Moved %d subscribers to their migrated chats.", len(moves))
+
+async def _start_subscriber_store(application: Application):
+    """Loads the subscribers and starts persisting changes to them."""
     try:
-        with open(SUBSCRIBERS_FILE, 'w') as f:
-            json.dump(list(_subscribers), f)
-    except IOError as e:
-        log.error("Could not save subscribers file: %s", e)
+        await subscriber_store.open()
+        log.info("Loaded %d subscribers for MarketStatsBot.", len(_subscribers))
+    except Exception as e:
+        log.error("Could not load subscribers: %s. Starting fresh.", e)
+        await subscriber_store.start()
+
+async def _stop_subscriber_store(application: Application):
+    await subscriber_store.close()
+    chart_service.close()
 
 # --- Command Handlers ---
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Adds the user to the subscriber list."""
     chat_id = update.effective_chat.id
-    if chat_id not in _subscribers:
-        _subscribers.add(chat_id)
-        _save_subscribers()
+    if subscriber_store.add(chat_id):
         log.info("New subscriber added: %d", chat_id)
         await update.message.reply_text("🚀 You are now subscribed to CryptoHawk MarketStats updates!")
     else:
@@ -53,18 +63,67 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Removes the user from the subscriber list."""
     chat_id = update.effective_chat.id
-    if chat_id in _subscribers:
-        _subscribers.remove(chat_id)
-        _save_subscribers()
+    if subscriber_store.discard(chat_id):
         log.info("Subscriber removed: %d", chat_id)
         await update.message.reply_text("👋 You have been unsubscribed from MarketStats updates.")
     else:
         await update.message.reply_text("You were not subscribed.")
 
+def _format_daily_summary(key: str) -> str:
+    """Formats the 24h range and change of each tracked field of `key`."""
+    lines = ""
+    for metric in poller.market_data_cache.metrics():
+        if not metric.startswith(f"{key}."):
+            continue
+        stats = poller.market_data_cache.aggregate(metric, 24 * 3600)
+        if not stats or stats['count'] < 2:
+            continue
+        field = metric.split('.', 1)[1].replace('_', ' ')
+        lines += (f"📈 {field} 24h: `{stats['min']:,.2f}` – `{stats['max']:,.2f}` "
+                  f"(`{stats['pct_change']:+.2f}%`)\n")
+    return lines
+
+CHART_USAGE = ("Usage: `/marketdata <metric> [window] [line|candle]`, "
+               "e.g. `/marketdata btc_dominance 7d candle`.\nMetrics: {metrics}")
+
+async def send_market_chart(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Sends a chart of one metric's history, as asked for by /marketdata's arguments."""
+    args = list(context.args)
+    metric = chart_service.resolve_metric(args.pop(0))
+    window, kind = DEFAULT_WINDOW, "line"
+    for arg in args:
+        if arg.lower() in CHART_KINDS:
+            kind = arg.lower()
+        elif parse_window(arg):
+            window = parse_window(arg)
+        else:
+            metric = None
+    if metric is None:
+        metrics = ", ".join(f"`{name}`" for name in poller.market_data_cache.metrics()) or "none yet"
+        await update.message.reply_text(CHART_USAGE.format(metrics=metrics), parse_mode='Markdown')
+        return
+
+    chart = await chart_service.get(metric, window, kind=kind)
+    if chart is None:
+        await update.message.reply_text("😕 No history recorded for that window yet.")
+        return
+    await chart_service.send(context.bot, update.effective_chat.id, chart)
+
 async def get_market_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Displays the latest cached market data."""
+    """Displays the latest cached market data, or a chart when given a metric."""
     log.info("User %s requested market data.", update.effective_user.id)
-    cache = poller.market_data_cache
+    if context.args:
+        await send_market_chart(update, context)
+        return
+    cache = poller.market_data_cache.latest()
+    if not cache:
+        # The poller hasn't run yet; fall back to the shared, coalesced API cache.
+        market_cap, fear_and_greed = await asyncio.gather(
+            poller.cmc_api.get_market_cap(),
+            poller.cmc_api.get_fear_and_greed_index(),
+        )
+        cache = {key: value for key, value in
+                 (('market_cap', market_cap), ('fear_and_greed', fear_and_greed)) if value}
     if not cache:
         await update.message.reply_text("😕 Market data cache is currently empty. Please try again later.")
         return
@@ -72,7 +131,9 @@ async def get_market_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message = "📊 **Latest Market Data** 📊\n\n"
     for key, value in cache.items():
         message += f"🔹 **{key.replace('_', ' ').title()}**:\n"
-        message += f"```json\n{json.dumps(value, indent=2)}\n```\n\n"
+        message += f"```json\n{json.dumps(value, indent=2)}\n```\n"
+        message += _format_daily_summary(key)
+        message += "\n"
 
     await update.message.reply_text(message, parse_mode='Markdown')
 
@@ -81,8 +142,10 @@ def setup_market_stats_bot(application: Application):
     """Adds handlers to the MarketStats bot application."""
     log.info("Setting up MarketStats bot handlers...")
 
-    _load_subscribers()
-    poller.set_notification_bot(application, _subscribers)
+    poller.set_notification_bot(application, _subscribers, on_unreachable=_prune_subscribers,
+                                on_migrated=_migrate_subscribers)
+    application.post_init = _start_subscriber_store
+    application.post_stop = _stop_subscriber_store
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("stop", stop))
@@ -0,0 +1,61 @@
+from typing import Callable, Optional
+
+from telegram.ext import Application
+
+from .. import telegram_webhooks
+from ..logger import get_logger
+
+log = get_logger(__name__)
+
+async def run_bot(token: str, setup_func: Callable[[Application], None],
+                  name: Optional[str] = None) -> Optional[Application]:
+    """
+    Builds, sets up and starts a bot. Returns the running application.
+    With TELEGRAM_WEBHOOK_URL configured, a bot with a `name` receives its
+    updates through the web server's /telegram/<name> endpoint; otherwise it
+    long-polls.
+    """
+    if not token:
+        log.error(f"Token for {setup_func.__name__} is not configured. Skipping.")
+        return None
+
+    log.info(f"Starting bot for {setup_func.__name__}...")
+    application = Application.builder().token(token).build()
+    setup_func(application)
+
+    try:
+        await application.initialize()
+    except Exception as e:
+        log.error(f"Error starting bot {setup_func.__name__}: {e}", exc_info=True)
+        return None
+    try:
+        # Mirror run_polling(), which is the only place the library calls post_init.
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        if name and telegram_webhooks.enabled():
+            await telegram_webhooks.set_webhook(name, application)
+        else:
+            await application.updater.start_polling()
+        log.info(f"Bot {setup_func.__name__} started successfully.")
+    except Exception as e:
+        log.error(f"Error starting bot {setup_func.__name__}: {e}", exc_info=True)
+        # Undo whatever post_init and start() already set up.
+        await stop_bot(application, name)
+        return None
+    return application
+
+async def stop_bot(application: Application, name: Optional[str] = None):
+    """Stops receiving updates and shuts the application down, mirroring run_polling()."""
+    if name:
+        telegram_webhooks.unregister(name)
+    try:
+        if application.updater and application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+    except Exception as e:
+        log.error("Error stopping bot: %s", e, exc_info=True)
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AbstractSet, Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from ..logger import get_logger
+from .filters import event_symbol
+
+log = get_logger(__name__)
+
+DEFAULT_DEDUP_SIZE = 10000
+DEFAULT_WINDOW = 60.0
+
+# What BurstAggregator.add() decided for an event.
+EMIT = "emit"
+DUPLICATE = "duplicate"
+AGGREGATED = "aggregated"
+
+# (scope, category, symbol); the scope keeps independent callers' state apart.
+BurstKey = Tuple[Optional[int], str, Optional[str]]
+
+def event_fingerprint(event: Dict[str, Any], scope: Optional[int] = None) -> bytes:
+    """A digest of the whole event, so only exact repeats in the same scope share a fingerprint."""
+    encoded = json.dumps([scope, event], sort_keys=True, separators=(',', ':'), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+class DedupCache:
+    """A bounded LRU of fingerprints seen recently."""
+
+    def __init__(self, size: int = DEFAULT_DEDUP_SIZE):
+        self.size = size
+        self._seen: "OrderedDict[bytes, None]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def seen(self, fingerprint: bytes) -> bool:
+        """Records the fingerprint and returns whether it was already there."""
+        if fingerprint in self._seen:
+            self._seen.move_to_end(fingerprint)
+            return True
+        self._seen[fingerprint] = None
+        if len(self._seen) > self.size:
+            self._seen.popitem(last=False)
+        return False
+
+@dataclass
+class Burst:
+    """Events for one (category, symbol) held back during a window."""
+    category: str
+    symbol: Optional[str]
+    started: float
+    count: int = 0
+    last_event: Optional[Dict[str, Any]] = None
+    recipients: Set[int] = field(default_factory=set)
+
+    def add(self, event: Dict[str, Any], recipients: AbstractSet[int]):
+        self.count += 1
+        self.last_event = event
+        self.recipients |= recipients
+
+class BurstAggregator:
+    """
+    Collapses bursts of CEX events before they are rendered.
+
+    Exact duplicates are dropped against an LRU of fingerprints. The first
+    event for a (category, symbol) goes out at once and opens a window; events
+    for the same key during the window are held and handed to `flush` as one
+    Burst when it closes. A window that produced a summary is reopened, so a
+    sustained flood yields one summary per window until it quietens down.
+
+    Callers that evaluate the same event separately per chat pass the chat as
+    `scope`, so one chat's copy is never taken for a repeat of another's.
+    """
+
+    def __init__(self, flush: Callable[[Burst], Awaitable[None]], window: float = DEFAULT_WINDOW,
+                 dedup_size: int = DEFAULT_DEDUP_SIZE):
+        self._flush = flush
+        self.window = window
+        self._dedup = DedupCache(dedup_size) if dedup_size > 0 else None
+        self._open: Dict[BurstKey, Burst] = {}
+        self._timers: Dict[BurstKey, asyncio.TimerHandle] = {}
+        self._flushing: Set[asyncio.Task] = set()
+
+    def add(self, event: Dict[str, Any], recipients: AbstractSet[int] = frozenset(),
+            scope: Optional[int] = None) -> str:
+        """Returns EMIT if the event should be sent now, else DUPLICATE or AGGREGATED."""
+        if self._dedup is not None and self._dedup.seen(event_fingerprint(event, scope)):
+            return DUPLICATE
+        if self.window <= 0:
+            return EMIT
+
+        category = event.get('category')
+        key = (scope, category, event_symbol(event))
+        burst = self._open.get(key)
+        if burst is None:
+            self._open_window(key)
+            return EMIT
+        burst.add(event, recipients)
+        return AGGREGATED
+
+    def _open_window(self, key: BurstKey):
+        self._open[key] = Burst(key[1], key[2], time.monotonic())
+        self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._close_window, key)
+
+    def _close_window(self, key: BurstKey):
+        burst = self._open.pop(key)
+        del self._timers[key]
+        if not burst.count:
+            return
+        self._open_window(key)
+        task = asyncio.create_task(self._run_flush(burst))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _run_flush(self, burst: Burst):
+        try:
+            await self._flush(burst)
+        except Exception as e:
+            log.error("Could not emit the summary for %s %s: %s", burst.category, burst.symbol, e)
+
+    async def close(self):
+        """Emits every held burst now and forgets all open windows."""
+        for timer in self._timers.values():
+            timer.cancel()
+        bursts = [burst for burst in self._open.values() if burst.count]
+        self._open.clear()
+        self._timers.clear()
+        for burst in bursts:
+            await self._run_flush(burst)
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
@@ -1,16 +1,94 @@
 import json
+import re
+import time
 import asyncio
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
+from .. import config, metrics
 from ..logger import get_logger
+from .aggregate import AGGREGATED, DUPLICATE, Burst, BurstAggregator
+from .filters import CategoryRule, FilterIndex
 
 log = get_logger(__name__)
 
 # --- Event Bus ---
 # An asyncio.Queue can serve as a simple, in-memory event bus.
 # The CEX bot will listen to this queue for notifications.
-notification_queue = asyncio.Queue()
+NOTIFICATION_OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+notification_overflow_policy = "drop_oldest"
+dropped_notifications = 0
+
+# --- Lazy Module State ---
+# The queue and the templates are built on first access rather than at import,
+# so importing this module does no file I/O and the queue is created by the
+# code that runs the event loop. Once built they are plain module globals.
+notification_queue: asyncio.Queue
+TEMPLATES: Dict[str, Any]
+
+def _lazy_global(name: str, factory: Callable[[], Any]) -> Any:
+    value = globals().get(name)
+    if value is None:
+        value = globals()[name] = factory()
+    return value
+
+def get_notification_queue() -> asyncio.Queue:
+    return _lazy_global("notification_queue", asyncio.Queue)
+
+def get_templates() -> Dict[str, Any]:
+    return _lazy_global("TEMPLATES", _load_compiled_templates)
+
+def __getattr__(name: str) -> Any:
+    if name == "notification_queue":
+        return get_notification_queue()
+    if name == "TEMPLATES":
+        return get_templates()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _queue_depth() -> int:
+    queue = globals().get("notification_queue")
+    return queue.qsize() if queue is not None else 0
+
+# Read at scrape time, so it follows the queue across configure_notification_queue().
+metrics.cex_notification_queue_depth.set_function(_queue_depth)
+
+def configure_notification_queue(maxsize: int, overflow_policy: str = "drop_oldest"):
+    """
+    Replaces the notification queue with a bounded one. Items already queued are
+    carried over. `overflow_policy` decides what happens when the queue is full:
+    wait for room ("block"), evict the oldest item, or discard the new one.
+    """
+    global notification_queue, notification_overflow_policy
+    if overflow_policy not in NOTIFICATION_OVERFLOW_POLICIES:
+        raise ValueError(f"Unknown notification overflow policy '{overflow_policy}'.")
+
+    queue = asyncio.Queue(maxsize=maxsize)
+    previous = globals().get("notification_queue")
+    while previous is not None and not previous.empty() and not queue.full():
+        queue.put_nowait(previous.get_nowait())
+    notification_queue = queue
+    notification_overflow_policy = overflow_policy
+    log.info("Notification queue bounded to %d items (overflow policy: %s).", maxsize, overflow_policy)
+
+async def enqueue_notification(item: Any):
+    """Puts a notification on the queue, applying the overflow policy when it is full."""
+    global dropped_notifications
+    queue = get_notification_queue()
+    if notification_overflow_policy == "block":
+        await queue.put(item)
+        return
+    try:
+        queue.put_nowait(item)
+        return
+    except asyncio.QueueFull:
+        pass
+
+    dropped_notifications += 1
+    if dropped_notifications == 1 or dropped_notifications % 1000 == 0:
+        log.warning("Notification queue full; %d notifications dropped so far.", dropped_notifications)
+    if notification_overflow_policy == "drop_oldest":
+        queue.get_nowait()
+        queue.put_nowait(item)
 
 # --- Template Loading ---
 def load_templates() -> Dict[str, Any]:
@@ -28,7 +106,74 @@ def load_templates() -> Dict[str, Any]:
         log.error("Error decoding CEX templates.json.")
     return {}
 
-TEMPLATES = load_templates()
+# --- Template Compilation ---
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+RENDER_CACHE_SIZE = 4096
+
+class CompiledTemplate:
+    """
+    A template compiled once into a positional format plan, so rendering is a
+    single linear pass instead of one full string scan per parameter.
+    Rendered messages are cached per distinct set of parameter values.
+    """
+
+    __slots__ = ("params", "_format", "_rendered")
+
+    def __init__(self, literals: List[str], params: List[str]):
+        # len(literals) == len(params) + 1; literals[i] precedes params[i].
+        self.params = tuple(params)
+        parts = []
+        for index, literal in enumerate(literals):
+            parts.append(literal.replace('{', '{{').replace('}', '}}'))
+            if index < len(params):
+                parts.append(f"{{{index}}}")
+        self._format = ''.join(parts)
+        self._rendered: Dict[Tuple[str, ...], str] = {}
+
+    def render(self, data: Dict[str, Any]) -> str:
+        get = data.get
+        values = tuple([str(get(param, 'N/A')) for param in self.params])
+        message = self._rendered.get(values)
+        if message is None:
+            message = self._format.format(*values)
+            # A full reset keeps the bound without per-hit LRU bookkeeping.
+            if len(self._rendered) >= RENDER_CACHE_SIZE:
+                self._rendered.clear()
+            self._rendered[values] = message
+        return message
+
+def compile_template(template_obj: Dict[str, Any]) -> CompiledTemplate:
+    """Compiles a template object. Placeholders not listed in `parameters` stay verbatim."""
+    text = f"{template_obj.get('title', '')}\n\n{template_obj.get('message', '')}"
+    known = set(template_obj.get('parameters', []))
+
+    literals, params = [], []
+    literal_start = 0
+    for match in PLACEHOLDER_PATTERN.finditer(text):
+        if match.group(1) not in known:
+            continue
+        literals.append(text[literal_start:match.start()])
+        params.append(match.group(1))
+        literal_start = match.end()
+    literals.append(text[literal_start:])
+    return CompiledTemplate(literals, params)
+
+# Compiled templates keyed by the id of their source object. The source is kept
+# alongside so a recycled id can never match a different template.
+_compiled_templates: Dict[int, Tuple[Dict[str, Any], CompiledTemplate]] = {}
+
+def get_compiled_template(template_obj: Dict[str, Any]) -> CompiledTemplate:
+    entry = _compiled_templates.get(id(template_obj))
+    if entry is None or entry[0] is not template_obj:
+        entry = (template_obj, compile_template(template_obj))
+        _compiled_templates[id(template_obj)] = entry
+    return entry[1]
+
+def _load_compiled_templates() -> Dict[str, Any]:
+    templates = load_templates()
+    for template in templates.values():
+        get_compiled_template(template)
+    return templates
 
 def apply_template(template_obj: Dict[str, Any], data: Dict[str, Any]) -> str:
     """
@@ -37,72 +182,133 @@ def apply_template(template_obj: Dict[str, Any], data: Dict[str, Any]) -> str:
     if not template_obj:
         return f"CEX Event (no template): {json.dumps(data, indent=2)}"
 
-    message = f"{template_obj.get('title', '')}\n\n{template_obj.get('message', '')}"
-
-    # Replace placeholders like {{param}}
-    for param in template_obj.get('parameters', []):
-        value = data.get(param, 'N/A')
-        message = message.replace(f"{{{{{param}}}}}", str(value))
-
-    return message
+    return get_compiled_template(template_obj).render(data)
 
 # --- Event Filtering Logic ---
 # These functions replicate the logic from the original CEXScreen.js file.
-# For now, they are simplified placeholders.
-
-def evaluate_flow_alerts(event_data: Dict[str, Any], settings: Dict[str, Any]) -> bool:
-    """Filter logic for Flow Alerts."""
-    if not settings.get('active', False):
-        return False
-    # Add more complex filter logic here based on favorite/unwanted coins etc.
-    return True
+# They evaluate one user's settings; fan-out across many subscribers goes
+# through the precompiled FilterIndex instead, which applies the same
+# CategoryRule, so both paths accept exactly the same events.
 
-def evaluate_cex_tracking(event_data: Dict[str, Any], settings: Dict[str, Any]) -> bool:
-    """Filter logic for CEX Tracking."""
+def evaluate_category(event_data: Dict[str, Any], settings: Dict[str, Any]) -> bool:
+    """Filter logic shared by every category: active, then coins and volume."""
     if not settings.get('active', False):
         return False
-    # Add more complex filter logic here
-    return True
-
-def evaluate_generic(event_data: Dict[str, Any], settings: Dict[str, Any]) -> bool:
-    """Generic filter for simple 'active'/'inactive' categories."""
-    return settings.get('active', False)
+    return CategoryRule.from_settings(settings).matches(event_data)
 
 EVALUATION_MAP = {
-    'flow_alerts': evaluate_flow_alerts,
-    'cex_tracking': evaluate_cex_tracking,
-    'all_spot': evaluate_generic,
-    'all_derivatives': evaluate_generic,
-    'all_spot_percent': evaluate_generic,
-    'all_derivatives_percent': evaluate_generic,
+    'flow_alerts': evaluate_category,
+    'cex_tracking': evaluate_category,
+    'all_spot': evaluate_category,
+    'all_derivatives': evaluate_category,
+    'all_spot_percent': evaluate_category,
+    'all_derivatives_percent': evaluate_category,
 }
 
+# --- Subscriber Filters ---
+# Every CEX bot subscriber's filters, compiled into an inverted index.
+filter_index = FilterIndex()
+
+# Filters given to new subscribers: every category on, no coin restrictions.
+DEFAULT_USER_FILTERS: Dict[str, Any] = {category: {'active': True} for category in EVALUATION_MAP}
+
+# --- Deduplication and Burst Aggregation ---
+# Off until configure_aggregation() is called; every event is then rendered.
+event_aggregator: Optional[BurstAggregator] = None
+
+def configure_aggregation(window: float, dedup_size: int):
+    """
+    Drops exact duplicate events (remembering the last `dedup_size`) and rolls
+    events for the same (category, symbol) within `window` seconds of the one
+    that was sent into a single summary. Zero disables either stage.
+    """
+    global event_aggregator
+    if window <= 0 and dedup_size <= 0:
+        event_aggregator = None
+        return
+    event_aggregator = BurstAggregator(_emit_burst, window=window, dedup_size=dedup_size)
+    log.info("CEX aggregation window %.0fs, dedup cache %d events.", window, dedup_size)
+
+async def close_aggregation():
+    """Sends the summaries still held in open windows."""
+    if event_aggregator is not None:
+        await event_aggregator.close()
+
+def format_burst(burst: Burst) -> str:
+    seconds = time.monotonic() - burst.started
+    subject = f"#{burst.symbol}" if burst.symbol else burst.category
+    header = f"🔁 {burst.count} more {burst.category} events for {subject} in the last {seconds:.0f}s. Latest:"
+    return f"{header}\n\n{apply_template(get_templates().get(burst.category), burst.last_event)}"
+
+async def _emit_burst(burst: Burst):
+    message = format_burst(burst)
+    for chat_id in burst.recipients:
+        await enqueue_notification((chat_id, message))
+    metrics.cex_notifications_emitted_total.labels(burst.category).inc(len(burst.recipients))
+    log.info("Summary of %d '%s' events for %s emitted.", burst.count, burst.category, burst.symbol)
+
 # --- Main Event Processing ---
-async def process_cex_event(event_data: Dict[str, Any], user_filters: Dict[str, Any]):
+async def process_cex_event(event_data: Dict[str, Any], user_filters: Optional[Dict[str, Any]] = None,
+                            chat_id: Optional[int] = None):
     """
     Processes a CEX event, filters it, and puts a formatted notification on the queue.
+
+    Every queued item is a `(chat_id, message)` pair. With `user_filters` the event
+    is checked against that single filter set and goes to `chat_id`, which defaults
+    to TARGET_CHAT_ID. Without it, the event is matched against every subscriber
+    in `filter_index` and one item is queued per match.
+    Events that pass the filters then go through `event_aggregator`, if configured,
+    which may drop them as duplicates or hold them for a burst summary; on the
+    per-chat path that state is kept per chat.
     """
     category = event_data.get('category')
     if not category:
+        metrics.cex_events_received_total.labels("unknown").inc()
         log.error("CEX event received with missing category!")
         return
 
     eval_func = EVALUATION_MAP.get(category)
     if not eval_func:
+        metrics.cex_events_received_total.labels("unknown").inc()
         log.warning("Unknown CEX event category '%s'. Event skipped.", category)
         return
+    metrics.cex_events_received_total.labels(category).inc()
 
-    settings = user_filters.get(category, {})
-    if not eval_func(event_data, settings):
-        log.info("CEX event did not pass filters for category '%s'.", category)
-        return
+    if user_filters is not None:
+        settings = user_filters.get(category, {})
+        if not eval_func(event_data, settings):
+            metrics.cex_events_filtered_total.labels(category).inc()
+            log.info("CEX event did not pass filters for category '%s'.", category)
+            return
+        if chat_id is None:
+            chat_id = config.TARGET_CHAT_ID
+        if chat_id is None:
+            log.warning("CEX event for '%s' has no destination chat; TARGET_CHAT_ID is not set.", category)
+            return
+        recipients = {chat_id}
+    else:
+        recipients = filter_index.match(event_data)
+        if not recipients:
+            metrics.cex_events_filtered_total.labels(category).inc()
+            log.info("CEX event matched no subscribers for category '%s'.", category)
+            return
 
-    template_obj = TEMPLATES.get(category)
+    if event_aggregator is not None:
+        # On the per-chat path each chat evaluates the event on its own call.
+        scope = chat_id if user_filters is not None else None
+        outcome = event_aggregator.add(event_data, recipients, scope=scope)
+        if outcome == DUPLICATE:
+            metrics.cex_events_deduplicated_total.labels(category).inc()
+            return
+        if outcome == AGGREGATED:
+            metrics.cex_events_aggregated_total.labels(category).inc()
+            return
+
+    template_obj = get_templates().get(category)
     notification_message = apply_template(template_obj, event_data)
 
     # Put the formatted message on the queue for the CEX bot to pick up.
-    await notification_queue.put(notification_message)
+    for recipient in recipients:
+        await enqueue_notification((recipient, notification_message))
+    metrics.cex_notifications_emitted_total.labels(category).inc(len(recipients))
     log.info("Notification for CEX event '%s' emitted.", event_data.get('event', 'N/A'))
-
-# Note: The `templates.json` file needs to be created in this directory
-# for the template loading to work. I will do that in a subsequent step.
@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Set
+
+from ..logger import get_logger
+
+log = get_logger(__name__)
+
+def event_symbol(event_data: Dict[str, Any]) -> Optional[str]:
+    """Returns the normalised symbol an event refers to, if any."""
+    symbol = event_data.get('symbol') or event_data.get('asset')
+    return str(symbol).strip().upper() if symbol else None
+
+def _symbols(values: Optional[Iterable[Any]]) -> FrozenSet[str]:
+    return frozenset(str(value).strip().upper() for value in values or () if value)
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+@dataclass(frozen=True)
+class CategoryRule:
+    """One user's precompiled settings for a single category."""
+    favorites: FrozenSet[str] = frozenset()
+    blocked: FrozenSet[str] = frozenset()
+    min_volume_usd: Optional[float] = None
+    max_volume_usd: Optional[float] = None
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "CategoryRule":
+        return cls(
+            favorites=_symbols(settings.get('favorite_coins')),
+            blocked=_symbols(settings.get('unwanted_coins')),
+            min_volume_usd=_as_float(settings.get('min_volume_usd')),
+            max_volume_usd=_as_float(settings.get('max_volume_usd')),
+        )
+
+    @property
+    def has_volume_range(self) -> bool:
+        return self.min_volume_usd is not None or self.max_volume_usd is not None
+
+    def volume_ok(self, event_data: Dict[str, Any]) -> bool:
+        if not self.has_volume_range:
+            return True
+        volume = _as_float(event_data.get('volume_usd'))
+        if volume is None:
+            return False
+        if self.min_volume_usd is not None and volume < self.min_volume_usd:
+            return False
+        if self.max_volume_usd is not None and volume > self.max_volume_usd:
+            return False
+        return True
+
+    def matches(self, event_data: Dict[str, Any]) -> bool:
+        symbol = event_symbol(event_data)
+        if symbol in self.blocked:
+            return False
+        if self.favorites and symbol not in self.favorites:
+            return False
+        return self.volume_ok(event_data)
+
+@dataclass(frozen=True)
+class CompiledUserFilter:
+    chat_id: int
+    rules: Dict[str, CategoryRule]
+
+def compile_user_filter(chat_id: int, user_filters: Dict[str, Any]) -> CompiledUserFilter:
+    """Turns a user's `{category: settings}` dict into precomputed structures."""
+    rules = {}
+    for category, settings in user_filters.items():
+        if not settings.get('active', False):
+            continue
+        rules[category] = CategoryRule.from_settings(settings)
+    return CompiledUserFilter(chat_id=chat_id, rules=rules)
+
+class FilterIndex:
+    """
+    An inverted index from (category, symbol) to subscribed chats.
+
+    Matching an event costs a few set operations on the chats that could
+    receive it, independent of the total number of subscribers. Only chats
+    with a volume range are checked individually.
+    """
+
+    def __init__(self):
+        self._users: Dict[int, CompiledUserFilter] = {}
+        # category -> chats that accept any symbol
+        self._any_symbol: Dict[str, Set[int]] = {}
+        # category -> symbol -> chats that listed it as a favorite / blocked it
+        self._favorites: Dict[str, Dict[str, Set[int]]] = {}
+        self._blocked: Dict[str, Dict[str, Set[int]]] = {}
+        # category -> chats whose rule has a volume range
+        self._volume_checked: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._users
+
+    def get(self, chat_id: int) -> Optional[CompiledUserFilter]:
+        return self._users.get(chat_id)
+
+    def update(self, chat_id: int, user_filters: Dict[str, Any]):
+        """Adds or replaces a chat's filters."""
+        self.remove(chat_id)
+        compiled = compile_user_filter(chat_id, user_filters)
+        self._users[chat_id] = compiled
+        for category, rule in compiled.rules.items():
+            if rule.favorites:
+                by_symbol = self._favorites.setdefault(category, {})
+                for symbol in rule.favorites:
+                    by_symbol.setdefault(symbol, set()).add(chat_id)
+            else:
+                self._any_symbol.setdefault(category, set()).add(chat_id)
+            if rule.blocked:
+                by_symbol = self._blocked.setdefault(category, {})
+                for symbol in rule.blocked:
+                    by_symbol.setdefault(symbol, set()).add(chat_id)
+            if rule.has_volume_range:
+                self._volume_checked.setdefault(category, set()).add(chat_id)
+
+    def remove(self, chat_id: int):
+        compiled = self._users.pop(chat_id, None)
+        if compiled is None:
+            return
+        for category, rule in compiled.rules.items():
+            self._any_symbol.get(category, set()).discard(chat_id)
+            self._volume_checked.get(category, set()).discard(chat_id)
+            for index, symbols in ((self._favorites, rule.favorites), (self._blocked, rule.blocked)):
+                by_symbol = index.get(category, {})
+                for symbol in symbols:
+                    chats = by_symbol.get(symbol)
+                    if chats is not None:
+                        chats.discard(chat_id)
+                        if not chats:
+                            del by_symbol[symbol]
+
+    def match(self, event_data: Dict[str, Any]) -> Set[int]:
+        """Returns the chats whose filters accept the event."""
+        category = event_data.get('category')
+        symbol = event_symbol(event_data)
+
+        recipients = set(self._any_symbol.get(category, ()))
+        if symbol is not None:
+            recipients |= self._favorites.get(category, {}).get(symbol, set())
+            recipients -= self._blocked.get(category, {}).get(symbol, set())
+
+        checked = recipients & self._volume_checked.get(category, set())
+        for chat_id in checked:
+            if not self._users[chat_id].rules[category].volume_ok(event_data):
+                recipients.discard(chat_id)
+        return recipients
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..logger import get_logger
+
+log = get_logger(__name__)
+
+MAX_BATCH_SIZE = 5000
+
+class IngestQueueFull(Exception):
+    """Raised when a batch does not fit in the ingest queue."""
+
+class IngestUnavailable(Exception):
+    """Raised when events are offered while the ingest workers are stopped."""
+
+def parse_events(body: bytes, ndjson: bool = False) -> List[Any]:
+    """
+    Parses a request body holding one JSON event, a JSON array of events,
+    or newline-delimited JSON. Raises ValueError on malformed input.
+    """
+    if ndjson:
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+    payload = json.loads(body)
+    return payload if isinstance(payload, list) else [payload]
+
+def validate_event(event: Any, categories) -> Optional[str]:
+    """Returns a reason the event is unusable, or None if it can be queued."""
+    if not isinstance(event, dict):
+        return "event must be a JSON object"
+    category = event.get('category')
+    if not isinstance(category, str):
+        return "missing category"
+    if category not in categories:
+        return f"unknown category '{category}'"
+    return None
+
+def split_valid(events: List[Any], categories) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Splits parsed events into the valid ones and per-index errors for the rest."""
+    valid, errors = [], []
+    for index, event in enumerate(events):
+        reason = validate_event(event, categories)
+        if reason is None:
+            valid.append(event)
+        else:
+            errors.append({"index": index, "error": reason})
+    return valid, errors
+
+class EventIngestor:
+    """
+    Hands validated CEX events to the screener through a bounded queue.
+
+    Batches are accepted whole or not at all, so a caller that receives a
+    backpressure error can safely retry the same batch later.
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[None]],
+                 maxsize: int = 10000, workers: int = 4):
+        self._handler = handler
+        self._maxsize = maxsize
+        self._num_workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.stats = {"accepted": 0, "rejected": 0, "processed": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def offer(self, events: List[Dict[str, Any]]) -> int:
+        """Queues every event in the batch, or raises if it cannot take all of them."""
+        if not self.running:
+            raise IngestUnavailable("CEX ingest workers are not running.")
+        if self._maxsize - self._queue.qsize() < len(events):
+            self.stats["rejected"] += len(events)
+            raise IngestQueueFull(f"Ingest queue is full ({self._queue.qsize()}/{self._maxsize}).")
+        for event in events:
+            self._queue.put_nowait(event)
+        self.stats["accepted"] += len(events)
+        return len(events)
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self._maxsize)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self._num_workers)]
+        log.info("CEX ingest started with %d workers (queue size %d).", self._num_workers, self._maxsize)
+
+    async def stop(self):
+        workers, self._workers = self._workers, []
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        log.info("CEX ingest stopped.")
+
+    async def _worker(self, worker_id: int):
+        while True:
+            event = await self._queue.get()
+            try:
+                await self._handler(event)
+                self.stats["processed"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                log.error("CEX ingest worker %d failed to process event: %s", worker_id, e)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,127 @@
+import asyncio
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .. import metrics
+from ..logger import get_logger
+from .filters import event_symbol
+
+log = get_logger(__name__)
+
+DEFAULT_SHARDS = 4
+DEFAULT_SHARD_QUEUE_SIZE = 1000
+
+def shard_key(event: Dict[str, Any]) -> str:
+    """The ordering key of an event: its category and symbol."""
+    return f"{event.get('category')}:{event_symbol(event) or ''}"
+
+def shard_index(event: Dict[str, Any], shards: int) -> int:
+    # crc32 rather than hash(), so the mapping is the same in every process and run.
+    return zlib.crc32(shard_key(event).encode()) % shards
+
+class _Shard:
+    def __init__(self, index: int, queue_size: int):
+        self.index = index
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_lag = 0.0
+        label = str(index)
+        self.processed_metric = metrics.cex_shard_events_total.labels(label)
+        self.lag_metric = metrics.cex_shard_lag_seconds.labels(label)
+        metrics.cex_shard_queue_depth.labels(label).set_function(self.queue.qsize)
+
+class ShardedScreener:
+    """
+    Runs the screener on `shards` worker tasks, each with its own bounded queue.
+
+    Events are routed by (category, symbol), so events for one symbol in one
+    category are handled in arrival order, while a backlog or a slow event
+    only holds up the keys that share its shard. A flood of `all_spot_percent`
+    events spreads over every shard instead of queueing `flow_alerts` behind it.
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[None]],
+                 shards: int = DEFAULT_SHARDS, queue_size: int = DEFAULT_SHARD_QUEUE_SIZE):
+        if shards < 1:
+            raise ValueError("At least one shard is required.")
+        self._handler = handler
+        self._num_shards = shards
+        self._queue_size = queue_size
+        self._shards: List[_Shard] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._shards)
+
+    def _shard_for(self, event: Dict[str, Any]) -> _Shard:
+        return self._shards[shard_index(event, self._num_shards)]
+
+    async def submit(self, event: Dict[str, Any]):
+        """Queues an event on its shard, waiting while that shard is full."""
+        if not self.running:
+            raise RuntimeError("The screener shards are not running.")
+        await self._shard_for(event).queue.put((time.monotonic(), event))
+
+    def submit_nowait(self, event: Dict[str, Any]) -> bool:
+        """Queues an event on its shard; drops and counts it if the shard is full."""
+        if not self.running:
+            raise RuntimeError("The screener shards are not running.")
+        shard = self._shard_for(event)
+        try:
+            shard.queue.put_nowait((time.monotonic(), event))
+        except asyncio.QueueFull:
+            shard.dropped += 1
+            return False
+        return True
+
+    async def start(self):
+        if self.running:
+            return
+        self._shards = [_Shard(index, self._queue_size) for index in range(self._num_shards)]
+        for shard in self._shards:
+            shard.task = asyncio.create_task(self._worker(shard))
+        log.info("CEX screener started with %d shards (queue size %d each).",
+                 self._num_shards, self._queue_size)
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Lets the shards finish what is queued, up to `drain_timeout`, then stops them."""
+        shards, self._shards = self._shards, []
+        if not shards:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(shard.queue.join() for shard in shards)), drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning("CEX screener shards did not drain within %.1fs; %d events discarded.",
+                        drain_timeout, sum(shard.queue.qsize() for shard in shards))
+        for shard in shards:
+            shard.task.cancel()
+        await asyncio.gather(*(shard.task for shard in shards), return_exceptions=True)
+        log.info("CEX screener shards stopped.")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-shard counters, queue depth and the worst enqueue-to-start lag seen."""
+        return [
+            {"shard": shard.index, "depth": shard.queue.qsize(), "processed": shard.processed,
+             "failed": shard.failed, "dropped": shard.dropped, "max_lag": shard.max_lag}
+            for shard in self._shards
+        ]
+
+    async def _worker(self, shard: _Shard):
+        while True:
+            enqueued, event = await shard.queue.get()
+            lag = time.monotonic() - enqueued
+            shard.lag_metric.observe(lag)
+            shard.max_lag = max(shard.max_lag, lag)
+            try:
+                await self._handler(event)
+                shard.processed += 1
+                shard.processed_metric.inc()
+            except Exception as e:
+                shard.failed += 1
+                log.error("CEX screener shard %d failed to process event: %s", shard.index, e)
+            finally:
+                shard.queue.task_done()
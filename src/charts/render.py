@@ -0,0 +1,81 @@
+import io
+from datetime import datetime, timezone
+from typing import List, Sequence, Tuple
+
+from ..market_stats.timeseries import downsample
+
+# Runs inside the chart worker processes. matplotlib is imported on first use
+# and drawn through the Agg canvas directly, so neither pyplot's global state
+# nor the interactive backend selection is ever involved.
+
+Sample = Tuple[float, float]
+Candle = Tuple[float, float, float, float, float]  # bucket start, open, high, low, close
+
+FIGURE_SIZE = (8, 4)
+DPI = 100
+UP_COLOR = "#26a69a"
+DOWN_COLOR = "#ef5350"
+LINE_COLOR = "#1f77b4"
+
+def to_candles(samples: Sequence[Sample], bucket_seconds: float) -> List[Candle]:
+    """Groups time-ordered samples into OHLC candles of `bucket_seconds` each."""
+    candles: List[Candle] = []
+    for timestamp, value in samples:
+        bucket = timestamp - (timestamp % bucket_seconds)
+        if candles and candles[-1][0] == bucket:
+            start, open_, high, low, _ = candles[-1]
+            candles[-1] = (start, open_, max(high, value), min(low, value), value)
+        else:
+            candles.append((bucket, value, value, value, value))
+    return candles
+
+def _dates(timestamps: Sequence[float]) -> List[datetime]:
+    return [datetime.fromtimestamp(ts, tz=timezone.utc) for ts in timestamps]
+
+def _new_axes(title: str):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.set_title(title)
+    axes.grid(True, alpha=0.3)
+    locator = AutoDateLocator()
+    axes.xaxis.set_major_locator(locator)
+    axes.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+    return figure, axes
+
+def _png(figure) -> bytes:
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+def render_line(title: str, samples: Sequence[Sample], bucket_seconds: float = 0) -> bytes:
+    """
+    Renders samples as a line chart and returns the PNG bytes. With
+    `bucket_seconds`, samples are averaged into buckets of that width first.
+    """
+    figure, axes = _new_axes(title)
+    if bucket_seconds and len(samples) > 1:
+        samples = downsample(samples, bucket_seconds)
+    if samples:
+        timestamps, values = zip(*samples)
+        axes.plot(_dates(timestamps), values, color=LINE_COLOR, linewidth=1.5)
+    return _png(figure)
+
+def render_candles(title: str, samples: Sequence[Sample], bucket_seconds: float) -> bytes:
+    """Aggregates samples into candles of `bucket_seconds` and renders them as PNG bytes."""
+    figure, axes = _new_axes(title)
+    candles = to_candles(samples, bucket_seconds)
+    if candles:
+        # Bar widths are in days on a date axis.
+        width = bucket_seconds / 86400 * 0.7
+        dates = _dates([candle[0] + bucket_seconds / 2 for candle in candles])
+        colors = [UP_COLOR if close >= open_ else DOWN_COLOR for _, open_, _, _, close in candles]
+        axes.vlines(dates, [c[3] for c in candles], [c[2] for c in candles], colors=colors, linewidth=1)
+        axes.bar(dates, [abs(c[4] - c[1]) for c in candles], width=width,
+                 bottom=[min(c[1], c[4]) for c in candles], color=colors)
+    return _png(figure)
@@ -0,0 +1,163 @@
+import asyncio
+import multiprocessing
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from ..logger import get_logger
+from ..market_stats import poller
+from ..market_stats.timeseries import TimeSeriesStore
+from . import render
+
+log = get_logger(__name__)
+
+CHART_KINDS = ("line", "candle")
+DEFAULT_WINDOW = 24 * 3600
+# Points per line chart and candles per candle chart when no resolution is given.
+LINE_POINTS = 240
+CANDLE_COUNT = 48
+DEFAULT_CACHE_SIZE = 32
+DEFAULT_WORKERS = 1
+
+WINDOW_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+WINDOW_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)([mhdw])$")
+
+ChartKey = Tuple[str, float, float, str, int]
+
+def parse_window(text: str) -> Optional[float]:
+    """Parses windows like `30m`, `24h` or `7d` into seconds."""
+    match = WINDOW_PATTERN.match(text.strip().lower())
+    if not match:
+        return None
+    return float(match.group(1)) * WINDOW_UNITS[match.group(2)]
+
+@dataclass
+class Chart:
+    key: ChartKey
+    png: bytes
+    # Set once the image has been uploaded; later sends reuse Telegram's copy.
+    file_id: Optional[str] = None
+
+    @property
+    def metric(self) -> str:
+        return self.key[0]
+
+class ChartService:
+    """
+    Renders metric history from a TimeSeriesStore into PNG charts.
+
+    Rendering runs in a process pool, so matplotlib's import and drawing never
+    hold the event loop or the GIL of the bot process. Charts are cached per
+    (metric, window, resolution, kind, metric version) in a small LRU, so a
+    sample for one metric leaves the other metrics' charts cached. Identical
+    requests in flight share one render, and the Telegram file_id of an
+    uploaded chart is kept with it so resending is just a reference.
+    """
+
+    def __init__(self, store: Optional[TimeSeriesStore] = None, workers: int = DEFAULT_WORKERS,
+                 cache_size: int = DEFAULT_CACHE_SIZE, executor: Optional[Executor] = None):
+        self._store = store
+        self._workers = workers
+        self._cache_size = cache_size
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._cache: "OrderedDict[ChartKey, Chart]" = OrderedDict()
+        self._pending: Dict[ChartKey, asyncio.Future] = {}
+        self.renders = 0
+
+    @property
+    def store(self) -> TimeSeriesStore:
+        # Looked up per call so the poller's cache can be swapped (e.g. in tests).
+        return self._store if self._store is not None else poller.market_data_cache
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # Spawned workers don't inherit the bot process's threads, sockets or locks.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def resolve_metric(self, name: str) -> Optional[str]:
+        """Accepts a full metric name (`market_cap.btc_dominance`) or just its field."""
+        metrics = self.store.metrics()
+        if name in metrics:
+            return name
+        matches = [metric for metric in metrics if metric.split('.', 1)[-1] == name]
+        return matches[0] if len(matches) == 1 else None
+
+    def key(self, metric: str, window: float = DEFAULT_WINDOW, resolution: Optional[float] = None,
+            kind: str = "line") -> ChartKey:
+        if kind not in CHART_KINDS:
+            raise ValueError(f"Unknown chart kind '{kind}'.")
+        if resolution is None:
+            resolution = window / (LINE_POINTS if kind == "line" else CANDLE_COUNT)
+        return (metric, float(window), float(resolution), kind, self.store.metric_version(metric))
+
+    async def get(self, metric: str, window: float = DEFAULT_WINDOW, resolution: Optional[float] = None,
+                  kind: str = "line") -> Optional[Chart]:
+        """Returns the chart, rendering it if needed. None if there is no data or rendering failed."""
+        key = self.key(metric, window, resolution, kind)
+        chart = self._cache.get(key)
+        if chart is not None:
+            self._cache.move_to_end(key)
+            return chart
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = asyncio.ensure_future(self._render(key))
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def _render(self, key: ChartKey) -> Optional[Chart]:
+        metric, window, resolution, kind, _ = key
+        samples = self.store.range(metric, time.time() - window)
+        if not samples:
+            return None
+        title = f"{metric.replace('.', ' · ').replace('_', ' ')} ({_format_window(window)})"
+        function = render.render_line if kind == "line" else render.render_candles
+
+        loop = asyncio.get_running_loop()
+        try:
+            png = await loop.run_in_executor(self._get_executor(), function, title, samples, resolution)
+        except BrokenProcessPool as e:
+            log.error("Chart worker died while rendering '%s': %s", metric, e)
+            if self._owns_executor:
+                self._executor = None
+            return None
+        except Exception as e:
+            log.error("Could not render chart for '%s': %s", metric, e)
+            return None
+
+        self.renders += 1
+        chart = Chart(key, png)
+        self._cache[key] = chart
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return chart
+
+    async def send(self, bot, chat_id: int, chart: Chart, caption: Optional[str] = None, **kwargs):
+        """Sends a chart as a photo, uploading it only the first time."""
+        photo = chart.file_id or chart.png
+        message = await bot.send_photo(chat_id=chat_id, photo=photo, caption=caption, **kwargs)
+        if chart.file_id is None and message is not None and message.photo:
+            # The largest size is last; its file_id stands for the whole upload.
+            chart.file_id = message.photo[-1].file_id
+        return message
+
+    def close(self):
+        executor, self._executor = self._executor, None
+        if executor is not None and self._owns_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def _format_window(seconds: float) -> str:
+    for unit, size in sorted(WINDOW_UNITS.items(), key=lambda item: -item[1]):
+        if seconds >= size and seconds % size == 0:
+            return f"{int(seconds // size)}{unit}"
+    return f"{int(seconds)}s"
+
+# Shared by the bots in this process.
+chart_service = ChartService()
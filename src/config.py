@@ -2,9 +2,9 @@ import os
 import json
 from dotenv import load_dotenv
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from .logger import get_logger
+from .logger import DEFAULT_RATE_BURST, DEFAULT_RATE_INTERVAL, configure_logging, get_logger
 
 log = get_logger(__name__)
 
@@ -15,8 +15,30 @@ TELEGRAM_CEX_BOT_TOKEN: Optional[str] = None
 COINMARKETCAP_API_KEY: Optional[str] = None
 WEBHOOK_SECRET: Optional[str] = None
 WEBHOOK_PORT: int = 3000
+# Public base URL of this server. When set, the bots receive updates through
+# webhooks on the web server instead of long polling.
+TELEGRAM_WEBHOOK_URL: Optional[str] = None
 ADMIN_LIST: List[int] = []
 TARGET_CHAT_ID: Optional[int] = None
+CEX_INGEST_QUEUE_SIZE: int = 10000
+CEX_NOTIFICATION_QUEUE_SIZE: int = 10000
+CEX_NOTIFICATION_OVERFLOW: str = "drop_oldest"
+CEX_DELIVERY_WORKERS: int = 4
+CEX_SCREENER_SHARDS: int = 4
+CEX_SHARD_QUEUE_SIZE: int = 1000
+# Seconds a burst for one (category, symbol) is rolled up for; 0 turns it off.
+CEX_AGGREGATION_WINDOW: float = 60.0
+CEX_DEDUP_SIZE: int = 10000
+MARKET_CHANGE_THRESHOLDS: Dict[str, Any] = {}
+WEB_WORKERS: int = 2
+# First port of the supervisor workers' own /metrics endpoints; 0 turns them off.
+WORKER_METRICS_PORT: int = 9100
+LOG_LEVEL: str = "INFO"
+LOG_FORMAT: str = "text"
+# Per-module level overrides from config/logging.json, e.g. {"src.cex": "WARNING"}.
+LOG_LEVELS: Dict[str, str] = {}
+LOG_RATE_BURST: int = DEFAULT_RATE_BURST
+LOG_RATE_INTERVAL: float = DEFAULT_RATE_INTERVAL
 
 def load_configuration(config_dir: Path):
     """
@@ -24,7 +46,12 @@ def load_configuration(config_dir: Path):
     This function populates the global config variables.
     """
     global TELEGRAM_BOSS_BOT_TOKEN, TELEGRAM_MARKET_BOT_TOKEN, TELEGRAM_CEX_BOT_TOKEN
-    global COINMARKETCAP_API_KEY, WEBHOOK_SECRET, WEBHOOK_PORT, ADMIN_LIST
+    global COINMARKETCAP_API_KEY, WEBHOOK_SECRET, WEBHOOK_PORT, ADMIN_LIST, TELEGRAM_WEBHOOK_URL
+    global TARGET_CHAT_ID, CEX_INGEST_QUEUE_SIZE
+    global CEX_NOTIFICATION_QUEUE_SIZE, CEX_NOTIFICATION_OVERFLOW, CEX_DELIVERY_WORKERS
+    global CEX_SCREENER_SHARDS, CEX_SHARD_QUEUE_SIZE, CEX_AGGREGATION_WINDOW, CEX_DEDUP_SIZE
+    global MARKET_CHANGE_THRESHOLDS, WEB_WORKERS, WORKER_METRICS_PORT
+    global LOG_LEVEL, LOG_FORMAT, LOG_LEVELS, LOG_RATE_BURST, LOG_RATE_INTERVAL
 
     # --- Load Environment Variables ---
     env_path = config_dir / '.env'
@@ -40,6 +67,21 @@ def load_configuration(config_dir: Path):
     COINMARKETCAP_API_KEY = os.getenv("COINMARKETCAP_API_KEY")
     WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
     WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "3000"))
+    TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL") or None
+    CEX_INGEST_QUEUE_SIZE = int(os.getenv("CEX_INGEST_QUEUE_SIZE", "10000"))
+    CEX_NOTIFICATION_QUEUE_SIZE = int(os.getenv("CEX_NOTIFICATION_QUEUE_SIZE", "10000"))
+    CEX_NOTIFICATION_OVERFLOW = os.getenv("CEX_NOTIFICATION_OVERFLOW", "drop_oldest")
+    CEX_DELIVERY_WORKERS = int(os.getenv("CEX_DELIVERY_WORKERS", "4"))
+    CEX_SCREENER_SHARDS = int(os.getenv("CEX_SCREENER_SHARDS", "4"))
+    CEX_SHARD_QUEUE_SIZE = int(os.getenv("CEX_SHARD_QUEUE_SIZE", "1000"))
+    CEX_AGGREGATION_WINDOW = float(os.getenv("CEX_AGGREGATION_WINDOW", "60"))
+    CEX_DEDUP_SIZE = int(os.getenv("CEX_DEDUP_SIZE", "10000"))
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", "2"))
+    WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+    LOG_RATE_BURST = int(os.getenv("LOG_RATE_BURST", str(DEFAULT_RATE_BURST)))
+    LOG_RATE_INTERVAL = float(os.getenv("LOG_RATE_INTERVAL", str(DEFAULT_RATE_INTERVAL)))
 
     chat_id_str = os.getenv("TARGET_CHAT_ID")
     if chat_id_str:
@@ -62,6 +104,35 @@ def load_configuration(config_dir: Path):
         log.error("An error occurred while loading admins.json: %s", e)
         ADMIN_LIST = []
 
+    # --- Market Change Thresholds (optional) ---
+    thresholds_path = config_dir / 'market_thresholds.json'
+    try:
+        with open(thresholds_path, 'r') as f:
+            MARKET_CHANGE_THRESHOLDS = json.load(f)
+            log.info("market_thresholds.json loaded successfully.")
+    except FileNotFoundError:
+        log.info("market_thresholds.json not found. Using default change thresholds.")
+        MARKET_CHANGE_THRESHOLDS = {}
+    except json.JSONDecodeError:
+        log.error("Error decoding market_thresholds.json. Using default change thresholds.")
+        MARKET_CHANGE_THRESHOLDS = {}
+
+    # --- Per-module Log Levels (optional) ---
+    logging_path = config_dir / 'logging.json'
+    try:
+        with open(logging_path, 'r') as f:
+            LOG_LEVELS = json.load(f).get("levels", {})
+            log.info("logging.json loaded successfully.")
+    except FileNotFoundError:
+        LOG_LEVELS = {}
+    except (json.JSONDecodeError, AttributeError):
+        log.error("Error decoding logging.json. Using the default log levels.")
+        LOG_LEVELS = {}
+
+    try:
+        configure_logging(LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_RATE_BURST, LOG_RATE_INTERVAL)
+    except ValueError as e:
+        log.error("Invalid logging configuration: %s. Keeping the current settings.", e)
 
 def validate_configuration():
     """Checks if essential configuration is missing."""
@@ -75,6 +146,14 @@ def validate_configuration():
         log.error("Missing required environment variables: %s", ", ".join(missing_vars))
         raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
+    if TELEGRAM_WEBHOOK_URL and not WEBHOOK_SECRET:
+        log.error("TELEGRAM_WEBHOOK_URL requires WEBHOOK_SECRET to authenticate Telegram.")
+        raise ValueError("TELEGRAM_WEBHOOK_URL is set but WEBHOOK_SECRET is missing.")
+
+    if CEX_SCREENER_SHARDS < 1:
+        log.error("CEX_SCREENER_SHARDS must be at least 1.")
+        raise ValueError("CEX_SCREENER_SHARDS must be at least 1.")
+
     if not ADMIN_LIST:
         log.warning("Admin list is empty. The admin bot may not have any authorized users.")
 
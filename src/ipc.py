@@ -0,0 +1,377 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from .logger import get_logger
+
+log = get_logger(__name__)
+
+# Worker processes find the supervisor's bus through this environment variable.
+BUS_ENV = "CRYPTOHAWK_BUS"
+DEFAULT_BUS_PATH = Path(__file__).parent.parent / 'data' / 'bus.sock'
+
+# Messages are single JSON lines: {"op": "sub"|"pub", "topic": str, "data": any}.
+# Flow control travels the same way as {"op": "pause"|"resume", "topic": str}:
+# a subscriber falling behind on a topic pauses it, and the hub passes that on
+# to every publisher so their `publish_wait` holds until the topic resumes.
+MAX_MESSAGE_SIZE = 1024 * 1024
+CLIENT_QUEUE_SIZE = 10000
+# Messages waiting for one topic's handlers before publishers are paused, and
+# the backlog they must drain to before publishers resume.
+INBOX_HIGH_WATER = 1000
+INBOX_LOW_WATER = 100
+# The same for a connection's outgoing queue at the hub: a worker that reads
+# too slowly pauses the topics filling it, rather than having them dropped.
+OUTGOING_HIGH_WATER = CLIENT_QUEUE_SIZE // 2
+OUTGOING_LOW_WATER = CLIENT_QUEUE_SIZE // 20
+STOP_TIMEOUT = 5.0
+
+Handler = Callable[[Any], Awaitable[None]]
+
+# --- Topics ---
+TOPIC_CEX_EVENTS = "cex.events"                  # web -> cex bot: validated CEX events
+TOPIC_MARKET_SAMPLE = "market.sample"            # poller -> bots, web: recorded samples
+TOPIC_POLLER_CONTROL = "poller.control"          # admin bot -> poller: active events
+TOPIC_MARKET_SUBSCRIBERS = "market.subscribers"  # market bot -> poller: (op, chat_id)
+TOPIC_MARKET_UNREACHABLE = "market.unreachable"  # poller -> market bot: chats to prune
+TOPIC_MARKET_MIGRATED = "market.migrated"        # poller -> market bot: [[old, new], ...]
+
+def telegram_update_topic(bot_name: str) -> str:
+    """web -> bot worker: raw webhook updates for one bot."""
+    return f"telegram.update.{bot_name}"
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, separators=(',', ':')).encode() + b"\n"
+
+class _Connection:
+    """One client of the bus hub, with its own bounded outgoing queue."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.topics: Set[str] = set()
+        self.outgoing: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.dropped = 0
+        # Topics the hub paused on this connection's behalf, and the key it
+        # pauses them under so they never clash with the worker's own pauses.
+        self.backlogged: Set[str] = set()
+        self.backlog_key = (self, "backlog")
+
+    def send(self, line: bytes) -> bool:
+        """Queues `line`; returns whether the backlog has reached the high-water mark."""
+        try:
+            self.outgoing.put_nowait(line)
+        except asyncio.QueueFull:
+            # A stalled worker must not stall the hub or the other workers;
+            # only publishers ignoring the pause can get it this far.
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                log.warning("Bus client is not keeping up; %d messages dropped.", self.dropped)
+        return self.outgoing.qsize() >= OUTGOING_HIGH_WATER
+
+    def control(self, op: str, topic: str):
+        # Written directly so that a full queue can never lose a resume.
+        self.writer.write(_encode({"op": op, "topic": topic}))
+
+    async def write_loop(self, on_drained: Callable[["_Connection"], None]):
+        while True:
+            line = await self.outgoing.get()
+            self.writer.write(line)
+            await self.writer.drain()
+            if self.backlogged and self.outgoing.qsize() <= OUTGOING_LOW_WATER:
+                on_drained(self)
+
+class BusServer:
+    """
+    A publish/subscribe hub on a Unix socket. Every published message is
+    forwarded to the other connections subscribed to its topic, and a topic
+    stays paused for publishers while any subscriber has it paused.
+    """
+
+    def __init__(self, path: Path = DEFAULT_BUS_PATH):
+        self.path = Path(path)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[_Connection] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        # Who holds each paused topic: a connection, or a connection's backlog key.
+        self._pauses: Dict[str, Set[Any]] = {}
+
+    async def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self.path.unlink()
+        self._server = await asyncio.start_unix_server(self._handle, path=str(self.path),
+                                                       limit=MAX_MESSAGE_SIZE)
+        log.info("IPC bus listening on %s.", self.path)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for connection in list(self._connections):
+            connection.writer.close()
+        # Closed connections read EOF, so their handlers finish on their own.
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=STOP_TIMEOUT)
+        if self.path.exists():
+            self.path.unlink()
+
+    def _pause(self, connection: _Connection, topic: str, pauser: Any = None):
+        pausers = self._pauses.setdefault(topic, set())
+        first = not pausers
+        pausers.add(connection if pauser is None else pauser)
+        if first:
+            for other in self._connections:
+                if other is not connection:
+                    other.control("pause", topic)
+
+    def _resume(self, connection: _Connection, topic: str, pauser: Any = None):
+        pauser = connection if pauser is None else pauser
+        pausers = self._pauses.get(topic)
+        if not pausers or pauser not in pausers:
+            return
+        pausers.discard(pauser)
+        if not pausers:
+            del self._pauses[topic]
+            for other in self._connections:
+                other.control("resume", topic)
+
+    def _backlogged(self, connection: _Connection, topic: str):
+        if topic not in connection.backlogged:
+            log.warning("Bus client is falling behind; pausing '%s'.", topic)
+            connection.backlogged.add(topic)
+            self._pause(connection, topic, connection.backlog_key)
+
+    def _drained(self, connection: _Connection):
+        topics, connection.backlogged = connection.backlogged, set()
+        for topic in topics:
+            self._resume(connection, topic, connection.backlog_key)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        connection = _Connection(reader, writer)
+        self._connections.add(connection)
+        for topic in self._pauses:
+            connection.control("pause", topic)
+        writer_task = asyncio.create_task(connection.write_loop(self._drained))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    log.warning("Ignoring malformed bus message.")
+                    continue
+                if not isinstance(message, dict):
+                    log.warning("Ignoring bus message that is not an object.")
+                    continue
+                op, topic = message.get("op"), message.get("topic")
+                if op == "sub" and isinstance(topic, str):
+                    connection.topics.add(topic)
+                elif op == "pub" and isinstance(topic, str):
+                    for other in self._connections:
+                        if other is not connection and topic in other.topics and other.send(line):
+                            self._backlogged(other, topic)
+                elif op == "pause" and isinstance(topic, str):
+                    self._pause(connection, topic)
+                elif op == "resume" and isinstance(topic, str):
+                    self._resume(connection, topic)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            log.warning("Bus connection closed: %s", e)
+        except Exception as e:
+            log.error("Bus connection failed: %s", e)
+        finally:
+            self._connections.discard(connection)
+            for topic in [topic for topic, pausers in self._pauses.items() if connection in pausers]:
+                self._resume(connection, topic)
+            self._drained(connection)
+            writer_task.cancel()
+            await asyncio.gather(writer_task, return_exceptions=True)
+            writer.close()
+            self._tasks.discard(task)
+
+class BusClient:
+    """
+    A worker's connection to the bus. Reconnects on its own and re-subscribes.
+    `publish` never blocks: messages wait in a bounded queue while the bus is
+    unreachable and are dropped once it is full. `publish_wait` is for
+    messages that must not be lost; it waits for room instead, and while a
+    subscriber has paused the topic.
+
+    Each subscribed topic has its own inbox and handler task, so a slow
+    handler only holds up its own topic. An inbox passing `high_water` pauses
+    the topic for publishers until it drains to `low_water`.
+    """
+
+    def __init__(self, path: Optional[Path] = None, name: str = "worker",
+                 high_water: int = INBOX_HIGH_WATER, low_water: int = INBOX_LOW_WATER):
+        self.path = Path(path or os.getenv(BUS_ENV) or DEFAULT_BUS_PATH)
+        self.name = name
+        self.high_water = high_water
+        self.low_water = low_water
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._outgoing: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._inboxes: Dict[str, asyncio.Queue] = {}
+        self._consumers: Dict[str, asyncio.Task] = {}
+        # Topics this worker has paused, and the resume state of topics it publishes.
+        self._paused_inboxes: Set[str] = set()
+        self._publishable: Dict[str, asyncio.Event] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def subscribe(self, topic: str, handler: Handler):
+        first = topic not in self._handlers
+        self._handlers.setdefault(topic, []).append(handler)
+        if first and self.connected:
+            self._send_now({"op": "sub", "topic": topic})
+
+    def publish(self, topic: str, data: Any):
+        try:
+            self._outgoing.put_nowait(_encode({"op": "pub", "topic": topic, "data": data}))
+        except asyncio.QueueFull:
+            log.warning("Bus outgoing queue full; dropping a '%s' message.", topic)
+
+    async def publish_wait(self, topic: str, data: Any):
+        """Publishes `data`, waiting while the topic is paused or the outgoing queue is full."""
+        await self._resumed(topic).wait()
+        await self._outgoing.put(_encode({"op": "pub", "topic": topic, "data": data}))
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def wait_connected(self, timeout: float = 10.0) -> bool:
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self):
+        task, self._task = self._task, None
+        tasks = list(self._consumers.values()) + ([task] if task is not None else [])
+        self._consumers.clear()
+        self._inboxes.clear()
+        self._paused_inboxes.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _resumed(self, topic: str) -> asyncio.Event:
+        event = self._publishable.get(topic)
+        if event is None:
+            event = self._publishable[topic] = asyncio.Event()
+            event.set()
+        return event
+
+    def _control(self, op: str, topic: str):
+        # Bypasses the outgoing queue, which may be full of the very backlog
+        # being paused. While disconnected, pauses are re-sent on connect.
+        if self._writer is not None:
+            self._writer.write(_encode({"op": op, "topic": topic}))
+
+    def _send_now(self, message: Dict[str, Any]):
+        try:
+            self._outgoing.put_nowait(_encode(message))
+        except asyncio.QueueFull:
+            pass
+
+    async def _run(self):
+        delay = 0.1
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(str(self.path), limit=MAX_MESSAGE_SIZE)
+            except OSError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+                continue
+
+            delay = 0.1
+            for topic in self._handlers:
+                writer.write(_encode({"op": "sub", "topic": topic}))
+            # The hub tells a new connection which topics are paused right now.
+            for event in self._publishable.values():
+                event.set()
+            self._writer = writer
+            for topic in self._paused_inboxes:
+                self._control("pause", topic)
+            self._connected.set()
+            log.info("Worker '%s' connected to the IPC bus.", self.name)
+            writer_task = asyncio.create_task(self._write_loop(writer))
+            failed = False
+            try:
+                await self._read_loop(reader)
+            except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+                log.warning("Worker '%s' lost the IPC bus: %s", self.name, e)
+            except Exception as e:
+                # Anything else must not end the connection task; reconnect instead.
+                log.error("Worker '%s' IPC bus connection failed: %s", self.name, e)
+                failed = True
+            finally:
+                self._connected.clear()
+                self._writer = None
+                writer_task.cancel()
+                writer.close()
+            if failed:
+                await asyncio.sleep(delay)
+
+    async def _write_loop(self, writer: asyncio.StreamWriter):
+        while True:
+            line = await self._outgoing.get()
+            writer.write(line)
+            await writer.drain()
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(message, dict) or not isinstance(message.get("topic"), str):
+                log.warning("Worker '%s' ignoring a bus message without a topic.", self.name)
+                continue
+            op, topic = message.get("op"), message.get("topic")
+            if op == "pause":
+                self._resumed(topic).clear()
+            elif op == "resume":
+                self._resumed(topic).set()
+            elif topic in self._handlers:
+                self._deliver(topic, message.get("data"))
+
+    def _deliver(self, topic: str, data: Any):
+        inbox = self._inboxes.get(topic)
+        if inbox is None:
+            inbox = self._inboxes[topic] = asyncio.Queue()
+            self._consumers[topic] = asyncio.create_task(self._consume(topic, inbox))
+        # Unbounded on purpose: publishers stop soon after the pause, and the
+        # read loop must never wait on one topic's handlers.
+        inbox.put_nowait(data)
+        if inbox.qsize() >= self.high_water and topic not in self._paused_inboxes:
+            self._paused_inboxes.add(topic)
+            self._control("pause", topic)
+
+    async def _consume(self, topic: str, inbox: asyncio.Queue):
+        while True:
+            data = await inbox.get()
+            for handler in self._handlers.get(topic, ()):
+                try:
+                    await handler(data)
+                except Exception as e:
+                    log.error("Bus handler for '%s' failed: %s", topic, e)
+            if topic in self._paused_inboxes and inbox.qsize() <= self.low_water:
+                self._paused_inboxes.discard(topic)
+                self._control("resume", topic)
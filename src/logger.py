@@ -1,25 +1,216 @@
+import atexit
+import json
 import logging
+import queue
 import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
 
-def get_logger(name: str) -> logging.Logger:
+# --- Logging Pipeline ---
+# Every record goes through one QueueHandler on the root logger. A background
+# QueueListener thread formats it and writes it to stdout, so the event loop
+# never formats records or blocks on the stream. When the queue is full,
+# records are dropped and counted instead of blocking the caller.
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_FORMATS = ("text", "json")
+DEFAULT_LEVEL = logging.INFO
+QUEUE_SIZE = 10000
+# Our own loggers, plus uvicorn's so its startup and access logs go through the
+# queue too; other third-party libraries stay at the root's WARNING.
+APP_LOGGERS = ("src", "__main__", "main", "uvicorn")
+
+# Per (logger, message template) budget below ERROR: `burst` records every
+# `interval` seconds, then the rest are counted and reported with the next one.
+DEFAULT_RATE_BURST = 20
+DEFAULT_RATE_INTERVAL = 10.0
+
+# Value types that can be formatted later on the listener thread without
+# risking a different result than formatting now.
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout currently is."""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" ({suppressed} similar messages suppressed)"
+        return text
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the standard fields plus any `extra`."""
+
+    _STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._STANDARD and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class RateLimitFilter(logging.Filter):
     """
-    Configures and returns a logger.
+    Lets at most `burst` records per (logger, message template) through every
+    `interval` seconds. ERROR and above always pass. The first record of a new
+    window carries the number suppressed in the previous one as `suppressed`.
     """
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
 
-    # Create handlers
-    stream_handler = logging.StreamHandler(sys.stdout)
+    def __init__(self, burst: int = DEFAULT_RATE_BURST, interval: float = DEFAULT_RATE_INTERVAL):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        # key -> [window start, passed, suppressed]
+        self._windows: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
 
-    # Create formatters and add it to handlers
-    log_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    stream_handler.setFormatter(log_format)
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is not None and window[2]:
+                    record.suppressed = window[2]
+                if len(self._windows) > 10000:
+                    self._windows.clear()
+                self._windows[key] = [now, 1, 0]
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
 
-    # Add handlers to the logger
-    if not logger.handlers:
-        logger.addHandler(stream_handler)
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener without formatting them. Messages whose
+    arguments are all immutable stay unformatted until the listener gets
+    them; anything else is rendered now, so later mutation can't change it.
+    """
 
-    return logger
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _DropReporter(logging.Handler):
+    """Runs on the listener thread and reports records dropped on a full queue."""
+
+    def __init__(self, source: NonBlockingQueueHandler, target: logging.Handler):
+        super().__init__()
+        self._source = source
+        self._target = target
+        self._reported = 0
+
+    def emit(self, record: logging.LogRecord):
+        dropped = self._source.dropped
+        if dropped > self._reported:
+            notice = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                       "Log queue was full; %d records dropped.",
+                                       (dropped - self._reported,), None)
+            self._reported = dropped
+            self._target.handle(notice)
+        self._target.handle(record)
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_output: Optional[logging.Handler] = None
+_rate_limit: Optional[RateLimitFilter] = None
+_setup_lock = threading.Lock()
+
+def _ensure_pipeline():
+    global _queue_handler, _listener, _output, _rate_limit
+    if _listener is not None:
+        return
+    with _setup_lock:
+        if _listener is not None:
+            return
+        _output = _StdoutHandler()
+        _output.setFormatter(TextFormatter())
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(QUEUE_SIZE))
+        _rate_limit = RateLimitFilter()
+        _queue_handler.addFilter(_rate_limit)
+        logging.getLogger().addHandler(_queue_handler)
+        for name in APP_LOGGERS:
+            logging.getLogger(name).setLevel(DEFAULT_LEVEL)
+        listener = QueueListener(_queue_handler.queue, _DropReporter(_queue_handler, _output))
+        listener.start()
+        _listener = listener
+        atexit.register(shutdown_logging)
+
+def configure_logging(level: str = "INFO", levels: Optional[Dict[str, str]] = None, fmt: str = "text",
+                      rate_burst: int = DEFAULT_RATE_BURST, rate_interval: float = DEFAULT_RATE_INTERVAL):
+    """
+    Applies the logging configuration: the level of our own loggers, per-module
+    overrides such as `{"src.cex": "WARNING"}` (which cover submodules too),
+    the output format, and the repeated-message budget.
+    """
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format '{fmt}'.")
+    _ensure_pipeline()
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(level.upper())
+    for name, module_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(str(module_level).upper())
+    _output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    _rate_limit.burst = rate_burst
+    _rate_limit.interval = rate_interval
+
+def shutdown_logging():
+    """Writes out every queued record and stops the listener thread."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        logging.getLogger().removeHandler(_queue_handler)
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns the logger for `name`, attached to the shared queued pipeline.
+    """
+    _ensure_pipeline()
+    return logging.getLogger(name)
 
 # A default logger for simple scripts or testing
 log = get_logger(__name__)
@@ -0,0 +1,133 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional
+
+from ..logger import get_logger
+
+log = get_logger(__name__)
+
+@dataclass(frozen=True)
+class Threshold:
+    """
+    How far a field must move from its last delivered value to be worth a
+    notification. With both limits set, crossing either one is enough.
+    A move against the direction of the last delivered move must be
+    `1 + hysteresis` times larger, so a value wobbling around the edge
+    doesn't notify on every poll.
+    """
+    absolute: Optional[float] = None
+    percent: Optional[float] = None
+    hysteresis: float = 0.5
+
+    @classmethod
+    def from_settings(cls, settings: Mapping[str, Any]) -> "Threshold":
+        hysteresis = _as_float(settings.get('hysteresis'))
+        return cls(
+            absolute=_as_float(settings.get('absolute')),
+            percent=_as_float(settings.get('percent')),
+            hysteresis=0.5 if hysteresis is None else hysteresis,
+        )
+
+    def crossed(self, baseline: float, value: float, last_direction: int) -> bool:
+        delta = value - baseline
+        if delta == 0:
+            return False
+        factor = 1.0
+        if last_direction and (delta > 0) != (last_direction > 0):
+            factor += self.hysteresis
+        if self.absolute is not None and abs(delta) >= self.absolute * factor:
+            return True
+        if self.percent is not None and baseline and abs(delta / baseline) * 100 >= self.percent * factor:
+            return True
+        return False
+
+@dataclass(frozen=True)
+class FieldChange:
+    field: str
+    previous: Optional[float]
+    current: float
+
+    @property
+    def pct_change(self) -> Optional[float]:
+        if not self.previous:
+            return None
+        return (self.current - self.previous) / self.previous * 100
+
+# Defaults per cache key and field. Market cap moves are relative; dominance and
+# the Fear & Greed index are already percentages, so absolute points fit better.
+DEFAULT_THRESHOLDS: Dict[str, Dict[str, Threshold]] = {
+    "market_cap": {
+        "total_market_cap": Threshold(percent=1.0),
+        "total_volume_24h": Threshold(percent=10.0),
+        "btc_dominance": Threshold(absolute=0.25),
+    },
+    "fear_and_greed": {
+        "value": Threshold(absolute=5),
+    },
+}
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def parse_thresholds(settings: Mapping[str, Mapping[str, Mapping[str, Any]]]) -> Dict[str, Dict[str, Threshold]]:
+    """Builds thresholds from `{key: {field: {"absolute"|"percent"|"hysteresis": number}}}`."""
+    return {
+        key: {field: Threshold.from_settings(values) for field, values in fields.items()}
+        for key, fields in settings.items()
+    }
+
+class ChangeDetector:
+    """
+    Decides whether a new sample differs enough from what subscribers last saw.
+
+    Baselines are kept per field and only move when that field crosses its
+    threshold, so slow drift still adds up to a notification eventually.
+    """
+
+    def __init__(self, thresholds: Optional[Dict[str, Dict[str, Threshold]]] = None):
+        self.thresholds = DEFAULT_THRESHOLDS if thresholds is None else thresholds
+        self._baselines: Dict[str, Dict[str, float]] = {}
+        self._directions: Dict[str, Dict[str, int]] = {}
+
+    def tracks(self, key: str) -> bool:
+        return bool(self.thresholds.get(key))
+
+    def seed(self, key: str, payload: Mapping[str, Any]):
+        """Sets the baselines from a payload subscribers have already seen."""
+        baselines = self._baselines.setdefault(key, {})
+        for field in self.thresholds.get(key, {}):
+            value = _as_float(payload.get(field))
+            if value is not None:
+                baselines[field] = value
+
+    def detect(self, key: str, payload: Mapping[str, Any]) -> List[FieldChange]:
+        """
+        Returns the fields of `payload` that crossed their threshold and moves
+        their baselines. An empty list means the sample isn't worth sending.
+        """
+        thresholds = self.thresholds.get(key, {})
+        baselines = self._baselines.setdefault(key, {})
+        directions = self._directions.setdefault(key, {})
+        changes = []
+        for field, threshold in thresholds.items():
+            value = _as_float(payload.get(field))
+            if value is None:
+                continue
+            baseline = baselines.get(field)
+            if baseline is not None and not threshold.crossed(baseline, value, directions.get(field, 0)):
+                continue
+            changes.append(FieldChange(field=field, previous=baseline, current=value))
+            if baseline is not None:
+                directions[field] = 1 if value > baseline else -1
+            baselines[field] = value
+        return changes
+
+    def reset(self, key: Optional[str] = None):
+        if key is None:
+            self._baselines.clear()
+            self._directions.clear()
+        else:
+            self._baselines.pop(key, None)
+            self._directions.pop(key, None)
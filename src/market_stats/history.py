@@ -0,0 +1,218 @@
+import asyncio
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..logger import get_logger
+
+log = get_logger(__name__)
+
+# --- File Format ---
+# A 16-byte header followed by fixed 16-byte records of little-endian
+# (timestamp, value) doubles, appended in timestamp order.
+MAGIC = b"CHTS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHH8x")
+RECORD = struct.Struct("<dd")
+FILE_SUFFIX = ".bin"
+# The newest full payload per cache key, rewritten on every sample.
+LATEST_FILE = "latest.json"
+
+Sample = Tuple[float, float]
+
+class MetricHistoryFile:
+    """
+    An append-only history file for one metric.
+
+    Appends are single unbuffered writes. Reads go through a read-only mmap of
+    the file, so range queries binary-search the timestamps in place and only
+    decode the records they return.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, 'a+b', buffering=0)
+        self._mmap: Optional[mmap.mmap] = None
+
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size))
+        else:
+            self._check_header()
+            # Drop a partial trailing record left behind by a crash mid-write.
+            excess = (size - HEADER.size) % RECORD.size
+            if excess:
+                log.warning("Truncating %d stray bytes from %s.", excess, path)
+                os.ftruncate(self._file.fileno(), size - excess)
+
+    def _check_header(self):
+        self._file.seek(0)
+        header = self._file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{self.path} is too short to be a history file.")
+        magic, version, record_size = HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} history file.")
+
+    def __len__(self) -> int:
+        size = os.fstat(self._file.fileno()).st_size
+        return max(0, (size - HEADER.size) // RECORD.size)
+
+    def append(self, timestamp: float, value: float):
+        self._file.write(RECORD.pack(timestamp, value))
+
+    def _view(self) -> Tuple[Optional[mmap.mmap], int]:
+        """Returns an mmap covering every complete record, remapping if the file grew."""
+        count = len(self)
+        if count == 0:
+            return None, 0
+        size = HEADER.size + count * RECORD.size
+        if self._mmap is None or len(self._mmap) < size:
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        return self._mmap, count
+
+    @staticmethod
+    def _timestamp_at(view: mmap.mmap, index: int) -> float:
+        return struct.unpack_from("<d", view, HEADER.size + index * RECORD.size)[0]
+
+    def _bisect(self, view: mmap.mmap, count: int, timestamp: float, right: bool) -> int:
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            ts = self._timestamp_at(view, mid)
+            if ts < timestamp or (right and ts == timestamp):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _records(self, view: mmap.mmap, first: int, last: int) -> List[Sample]:
+        start = HEADER.size + first * RECORD.size
+        end = HEADER.size + last * RECORD.size
+        with memoryview(view) as buffer:
+            return list(RECORD.iter_unpack(buffer[start:end]))
+
+    def tail(self, n: int) -> List[Sample]:
+        """Returns the newest `n` records, oldest first."""
+        view, count = self._view()
+        if view is None:
+            return []
+        return self._records(view, max(0, count - n), count)
+
+    def range(self, start: float, end: Optional[float] = None) -> List[Sample]:
+        """Returns the records with `start <= timestamp <= end`."""
+        view, count = self._view()
+        if view is None:
+            return []
+        first = self._bisect(view, count, start, right=False)
+        last = count if end is None else self._bisect(view, count, end, right=True)
+        return self._records(view, first, max(first, last))
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+class HistoryStore:
+    """
+    Manages one MetricHistoryFile per metric inside a directory, plus the
+    newest full payload of each cache key.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._files: Dict[str, MetricHistoryFile] = {}
+        self._latest: Dict[str, Any] = self._read_latest()
+        self._latest_dirty = False
+        self._latest_lock = asyncio.Lock()
+
+    def _file(self, metric: str, create: bool = True) -> Optional[MetricHistoryFile]:
+        """Opens the metric's file; with `create` False, returns None if it doesn't exist."""
+        history = self._files.get(metric)
+        if history is None:
+            path = self.directory / f"{metric}{FILE_SUFFIX}"
+            if not create and not path.exists():
+                return None
+            history = self._files[metric] = MetricHistoryFile(path)
+        return history
+
+    def _read_latest(self) -> Dict[str, Any]:
+        path = self.directory / LATEST_FILE
+        try:
+            with open(path, 'r') as f:
+                latest = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.error("Could not read %s: %s", path, e)
+            return {}
+        return latest if isinstance(latest, dict) else {}
+
+    def latest(self) -> Dict[str, Any]:
+        """Returns the newest payload saved per key."""
+        return dict(self._latest)
+
+    def save_latest(self, key: str, payload: Any):
+        """Records `payload` as the newest one for `key`; `flush_latest` writes it out."""
+        self._latest[key] = payload
+        self._latest_dirty = True
+
+    async def flush_latest(self):
+        """Writes the newest payloads to disk off the event loop if any changed."""
+        async with self._latest_lock:
+            if not self._latest_dirty:
+                return
+            self._latest_dirty = False
+            await asyncio.to_thread(self._write_latest, dict(self._latest))
+
+    def _write_latest(self, latest: Dict[str, Any]):
+        """Replaces the latest-payload file atomically."""
+        path = self.directory / LATEST_FILE
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(latest, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            log.error("Could not persist the latest payloads: %s", e)
+
+    def metrics(self) -> List[str]:
+        return sorted(path.name[:-len(FILE_SUFFIX)] for path in self.directory.glob(f"*{FILE_SUFFIX}"))
+
+    def append(self, metric: str, timestamp: float, value: float):
+        try:
+            self._file(metric).append(timestamp, value)
+        except (OSError, ValueError) as e:
+            log.error("Could not persist sample for '%s': %s", metric, e)
+
+    # Reads never create files, so asking about an unknown metric leaves no trace.
+    def tail(self, metric: str, n: int) -> List[Sample]:
+        history = self._file(metric, create=False)
+        return history.tail(n) if history else []
+
+    def range(self, metric: str, start: float, end: Optional[float] = None) -> List[Sample]:
+        history = self._file(metric, create=False)
+        return history.range(start, end) if history else []
+
+    def iter_tails(self, n: int) -> Iterator[Tuple[str, List[Sample]]]:
+        """Yields the newest `n` records of every stored metric."""
+        for metric in self.metrics():
+            try:
+                yield metric, self.tail(metric, n)
+            except (OSError, ValueError) as e:
+                log.error("Skipping unreadable history for '%s': %s", metric, e)
+
+    def close(self):
+        if self._latest_dirty:
+            self._latest_dirty = False
+            self._write_latest(dict(self._latest))
+        for history in self._files.values():
+            history.close()
+        self._files.clear()
@@ -1,115 +1,361 @@
 import asyncio
-from typing import Dict, Any, List, Optional, Set
+import html
+import time
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
 from telegram.ext import Application
 
-from .. import config
+from .. import config, metrics
 from ..logger import get_logger
-from ..api.coinmarketcap import CoinMarketCapAPI
+from ..api.coinmarketcap import CachedCoinMarketCapAPI
+from ..notifications.broadcast import BroadcastScheduler
+from .changes import DEFAULT_THRESHOLDS, ChangeDetector, parse_thresholds
+from .history import HistoryStore
+from .scheduler import PollScheduler
+from .timeseries import TimeSeriesStore
 
 log = get_logger(__name__)
 
 # --- In-Memory Cache ---
-market_data_cache: Dict[str, Any] = {}
+# Latest payload per key plus a bounded, timestamped history of its numeric fields.
+market_data_cache = TimeSeriesStore()
+HISTORY_DIR = Path(__file__).parent.parent.parent / 'data' / 'history'
 
 # --- Poller Task Management ---
 _poller_task: Optional[asyncio.Task] = None
 _notification_bot_app: Optional[Application] = None
 _subscribers: Set[int] = set()
+_broadcaster: Optional[BroadcastScheduler] = None
+_on_unreachable: Optional[Callable[[List[int]], None]] = None
+_on_migrated: Optional[Callable[[Dict[int, int]], None]] = None
+# Broadcasts outlive the fetch that triggered them. At most one runs per event;
+# samples that arrive meanwhile wait in `_pending_broadcasts`, newest wins.
+_broadcast_tasks: Dict[str, asyncio.Task] = {}
+_pending_broadcasts: Dict[str, Dict[str, Any]] = {}
+
+# --- Multi-process Hooks ---
+# In supervisor mode the poller runs in its own worker. Other workers hand it
+# their event toggles through `_remote_control`, and it shares every recorded
+# sample through `sample_listeners`.
+_remote_control: Optional[Callable[[List[str]], None]] = None
+sample_listeners: List[Callable[[str, Dict[str, Any], float], None]] = []
+
+# --- Fetch Scheduling ---
+DEFAULT_FETCH_TIMEOUT = 30.0
+DEFAULT_MAX_CONCURRENT_FETCHES = 4
+
+# Per-event timing of the most recent fetch, used to measure cycle drift.
+fetch_timings: Dict[str, Dict[str, Any]] = {}
+
+# --- Change Detection ---
+# Subscribers are only notified when a sample moves far enough from what they last saw.
+change_detector = ChangeDetector()
 
 # --- API Instance ---
-cmc_api = CoinMarketCapAPI()
+# Shared with the bots and the web server so every consumer hits the same cache.
+# Built on first use, after the configuration has been loaded; `poller.cmc_api`
+# resolves through the module __getattr__ until then.
+cmc_api: CachedCoinMarketCapAPI
+
+def get_cmc_api() -> CachedCoinMarketCapAPI:
+    api = globals().get("cmc_api")
+    if api is None:
+        api = globals()["cmc_api"] = CachedCoinMarketCapAPI()
+    return api
+
+def __getattr__(name: str) -> Any:
+    if name == "cmc_api":
+        return get_cmc_api()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+async def close_api():
+    """Closes the shared API client's connections, if it was ever built."""
+    api = globals().get("cmc_api")
+    if api is not None:
+        await api.close()
+
+def load_history(directory: Path = HISTORY_DIR):
+    """
+    Attaches the on-disk metric history to the cache and restores the newest
+    samples from it, so the last known values are served right after a restart.
+    """
+    restored = market_data_cache.attach_history(HistoryStore(directory))
+    log.info("Restored %d market data samples from %s.", restored, directory)
+    # Baselines restart from the newest recorded sample, not from the last
+    # announced one: drift that stayed under the threshold before the restart
+    # is forgotten, but nothing already recorded is announced a second time.
+    for key, payload in market_data_cache.latest().items():
+        change_detector.seed(key, payload)
+
+def close_history():
+    """Closes the on-disk metric history files."""
+    market_data_cache.detach_history()
+
+def configure_change_detection(settings: Dict[str, Any]):
+    """
+    Overrides the default change thresholds per cache key and field, e.g.
+    `{"fear_and_greed": {"value": {"absolute": 3}}}`. Fields a key's settings
+    leave out keep their defaults.
+    """
+    global change_detector
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for key, fields in parse_thresholds(settings or {}).items():
+        thresholds[key] = {**DEFAULT_THRESHOLDS.get(key, {}), **fields}
+    change_detector = ChangeDetector(thresholds)
+    log.info("Change thresholds configured for: %s", ", ".join(sorted(thresholds)))
+
+def _is_significant(key: str, data: Dict[str, Any]) -> bool:
+    """Runs a new sample through the change detector."""
+    if not change_detector.tracks(key):
+        return True
+    changes = change_detector.detect(key, data)
+    if not changes:
+        log.info("No significant change in '%s'; notification skipped.", key)
+        return False
+    log.info("Significant change in '%s': %s", key, ", ".join(change.field for change in changes))
+    return True
 
-def set_notification_bot(application: Application, subscribers: Set[int]):
-    """Sets the bot application instance and subscribers for sending notifications."""
-    global _notification_bot_app, _subscribers
+def set_notification_bot(application: Application, subscribers: Set[int],
+                         on_unreachable: Optional[Callable[[List[int]], None]] = None,
+                         on_migrated: Optional[Callable[[Dict[int, int]], None]] = None):
+    """
+    Sets the bot application instance and subscribers for sending notifications.
+    `on_unreachable` is called with the chats a broadcast found to be gone for
+    good (blocked the bot, deleted, or failing repeatedly) so they can be pruned,
+    and `on_migrated` with `{old_chat_id: new_chat_id}` for groups that became
+    supergroups.
+    """
+    global _notification_bot_app, _subscribers, _broadcaster, _on_unreachable, _on_migrated
     _notification_bot_app = application
     _subscribers = subscribers
+    _broadcaster = BroadcastScheduler(application.bot)
+    _on_unreachable = on_unreachable
+    _on_migrated = on_migrated
     log.info("Notification bot and subscribers have been set for the MarketStats poller.")
 
+# --- Notification Rendering ---
+DEFAULT_LOCALE = "en"
+DEFAULT_PARSE_MODE = "Markdown"
+
+NOTIFICATION_STRINGS = {
+    "en": {
+        "title": "Market Update: {name}",
+        "total_market_cap": "Total Market Cap",
+        "btc_dominance": "BTC Dominance",
+        "index_value": "Index Value",
+        "sentiment": "Sentiment",
+    },
+}
+
+def _markup(parse_mode: Optional[str]) -> Tuple[Callable[[str], str], Callable[[str], str]]:
+    """Returns (bold, code) wrappers for the parse mode."""
+    if parse_mode == "HTML":
+        return (lambda text: f"<b>{html.escape(text)}</b>",
+                lambda text: f"<code>{html.escape(text)}</code>")
+    if parse_mode == "Markdown":
+        return (lambda text: f"**{text}**", lambda text: f"`{text}`")
+    return (lambda text: text, lambda text: text)
+
+def _format_notification(event_name: str, data: Dict[str, Any], locale: str = DEFAULT_LOCALE,
+                         parse_mode: Optional[str] = DEFAULT_PARSE_MODE) -> str:
+    strings = NOTIFICATION_STRINGS.get(locale, NOTIFICATION_STRINGS[DEFAULT_LOCALE])
+    bold, code = _markup(parse_mode)
+    title = strings["title"].format(name=event_name.replace('_', ' ').title())
+    message = f"🔔 {bold(title)} 🔔\n\n"
+
+    if event_name == "crypto_market_cap" and 'total_market_cap' in data:
+        market_cap = f"${data['total_market_cap']:,.2f}"
+        dominance = f"{data['btc_dominance']:.2f}%"
+        message += f"{strings['total_market_cap']}: {code(market_cap)}\n"
+        message += f"{strings['btc_dominance']}: {code(dominance)}"
+    elif event_name == "cmc_fear_greed" and 'value_classification' in data:
+        message += f"{strings['index_value']}: {code(str(data['value']))}\n"
+        message += f"{strings['sentiment']}: {code(str(data['value_classification']))}"
+    elif parse_mode == "Markdown":
+        # Generic fallback
+        message += f"```json\n{data}\n```"
+    else:
+        message += code(str(data))
+    return message
+
 async def _send_notifications(event_name: str, data: Dict[str, Any]):
-    """Formats and sends a notification message to all subscribers."""
-    if not _notification_bot_app:
+    """Broadcasts a notification to all subscribers, rendered once for all of them."""
+    if not _notification_bot_app or not _broadcaster:
         log.warning("Cannot send notifications, bot application not set.")
         return
     if not _subscribers:
         log.info("No subscribers to send notifications to for event '%s'.", event_name)
         return
+    # Snapshot once; subscribers joining or leaving mid-broadcast don't affect it.
+    recipients = list(_subscribers)
+    log.info("Broadcasting '%s' to %d subscribers (about %.0f seconds).",
+             event_name, len(recipients), _broadcaster.estimate_duration(len(recipients)))
 
-    message = f"🔔 **Market Update: {event_name.replace('_', ' ').title()}** 🔔\n\n"
+    text = _format_notification(event_name, data)
+    result = await _broadcaster.broadcast(recipients, text, parse_mode=DEFAULT_PARSE_MODE)
+    log.info("Broadcast of '%s' finished in %.1f seconds: %d sent, %d failed.",
+             event_name, result.duration, result.sent, len(result.failed))
+    for chat_id, error in result.failed.items():
+        log.debug("Failed to send notification for '%s' to chat %d: %s", event_name, chat_id, error)
+    if result.unreachable:
+        _prune_subscribers(result.unreachable)
+    if result.migrated:
+        _migrate_subscribers(result.migrated)
 
-    if event_name == "crypto_market_cap" and 'total_market_cap' in data:
-        message += f"Total Market Cap: `${data['total_market_cap']:,.2f}`\n"
-        message += f"BTC Dominance: `{data['btc_dominance']:.2f}%`"
-    elif event_name == "cmc_fear_greed" and 'value_classification' in data:
-        message += f"Index Value: `{data['value']}`\n"
-        message += f"Sentiment: `{data['value_classification']}`"
+def _prune_subscribers(chat_ids: Iterable[int]):
+    chat_ids = list(chat_ids)
+    log.info("Pruning %d unreachable subscribers.", len(chat_ids))
+    if _on_unreachable:
+        _on_unreachable(chat_ids)
     else:
-        # Generic fallback
-        message += f"```json\n{data}\n```"
+        _subscribers.difference_update(chat_ids)
 
-    # Send message to all subscribers concurrently
-    notification_tasks = []
-    for chat_id in _subscribers:
-        task = _notification_bot_app.bot.send_message(
-            chat_id=chat_id,
-            text=message,
-            parse_mode='Markdown'
-        )
-        notification_tasks.append(task)
+def _migrate_subscribers(moves: Dict[int, int]):
+    log.info("Moving %d subscribers to their migrated chats.", len(moves))
+    if _on_migrated:
+        _on_migrated(moves)
+    else:
+        _subscribers.difference_update(moves)
+        _subscribers.update(moves.values())
 
-    results = await asyncio.gather(*notification_tasks, return_exceptions=True)
+def _record(key: str, data: Dict[str, Any]):
+    timestamp = time.time()
+    market_data_cache.record(key, data, timestamp)
+    for listener in sample_listeners:
+        listener(key, data, timestamp)
 
-    for i, result in enumerate(results):
-        chat_id = list(_subscribers)[i]
-        if isinstance(result, Exception):
-            log.error("Failed to send notification for '%s' to chat %d: %s", event_name, chat_id, result)
-        else:
-            log.info("Sent notification for '%s' to chat %d", event_name, chat_id)
+def _notify(event_name: str, data: Dict[str, Any]):
+    """
+    Broadcasts in the background so it never counts against the fetch timeout.
+    While a broadcast for the event is still running, only the newest sample is
+    kept and sent once it finishes; older ones would be stale by then.
+    """
+    if event_name in _pending_broadcasts:
+        log.info("Superseding the queued '%s' broadcast with a newer sample.", event_name)
+    _pending_broadcasts[event_name] = data
+    task = _broadcast_tasks.get(event_name)
+    if task is None or task.done():
+        _broadcast_tasks[event_name] = asyncio.create_task(_broadcast_latest(event_name))
 
+async def _broadcast_latest(event_name: str):
+    while event_name in _pending_broadcasts:
+        data = _pending_broadcasts.pop(event_name)
+        await _send_notifications(event_name, data)
 
 async def _fetch_market_cap():
     """Fetches, caches, and notifies for market cap data."""
     log.info("Fetching market cap data...")
-    data = await cmc_api.get_market_cap()
+    data = await get_cmc_api().get_market_cap(allow_stale=False)
     if data:
-        market_data_cache['market_cap'] = data
+        _record('market_cap', data)
         log.info("Market cap data updated.")
-        await _send_notifications("crypto_market_cap", data)
+        if _is_significant('market_cap', data):
+            _notify("crypto_market_cap", data)
 
 async def _fetch_fear_and_greed():
     """Fetches, caches, and notifies for the Fear & Greed index."""
     log.info("Fetching Fear & Greed Index...")
-    data = await cmc_api.get_fear_and_greed_index()
+    data = await get_cmc_api().get_fear_and_greed_index(allow_stale=False)
     if data:
-        market_data_cache['fear_and_greed'] = data
+        _record('fear_and_greed', data)
         log.info("Fear & Greed Index updated.")
-        await _send_notifications("cmc_fear_greed", data)
+        if _is_significant('fear_and_greed', data):
+            _notify("cmc_fear_greed", data)
 
 EVENT_FETCH_MAP = {
     "crypto_market_cap": _fetch_market_cap,
     "cmc_fear_greed": _fetch_fear_and_greed,
 }
 
-async def _poller_loop(active_events: List[str], interval_seconds: int):
+# Polling cadence per event, in seconds. Slow-moving indices are polled less
+# often so they don't spend API credits on unchanged data.
+DEFAULT_POLL_INTERVAL = 300.0
+EVENT_INTERVALS = {
+    "crypto_market_cap": 60.0,
+    "cmc_fear_greed": 3600.0,
+}
+
+async def _run_fetch(event: str, semaphore: asyncio.Semaphore, timeout: float,
+                     scheduled_at: Optional[float] = None):
+    """Runs one event's fetch function under the concurrency cap and a timeout."""
+    fetch_func = EVENT_FETCH_MAP.get(event)
+    if not fetch_func:
+        log.warning("No fetch function found for event '%s'", event)
+        return
+
+    queued = time.monotonic()
+    if scheduled_at is None:
+        scheduled_at = queued
+    async with semaphore:
+        started = time.monotonic()
+        started_at = time.time()
+        status = "ok"
+        try:
+            await asyncio.wait_for(fetch_func(), timeout=timeout)
+        except asyncio.TimeoutError:
+            status = "timeout"
+            log.error("Fetch for event '%s' timed out after %.1f seconds.", event, timeout)
+        except Exception as e:
+            status = "error"
+            log.error("Error fetching data for event '%s': %s", event, e)
+        finally:
+            duration = time.monotonic() - started
+            metrics.poller_fetch_duration_seconds.labels(event).observe(duration)
+            if status != "ok":
+                metrics.poller_fetch_errors_total.labels(event, status).inc()
+            fetch_timings[event] = {
+                "started_at": started_at,
+                "drift": started - scheduled_at,
+                "queue_wait": started - queued,
+                "duration": duration,
+                "status": status,
+            }
+    # One write per fetch, off the loop, however many keys it recorded.
+    await market_data_cache.flush_history()
+
+async def _run_fetches(events: List[str], semaphore: asyncio.Semaphore, timeout: float,
+                       scheduled_at: Optional[float] = None):
+    """Runs the fetches for `events` concurrently and waits for all of them."""
+    await asyncio.gather(*(_run_fetch(event, semaphore, timeout, scheduled_at) for event in events))
+
+async def _poller_loop(scheduler: PollScheduler,
+                       fetch_timeout: float = DEFAULT_FETCH_TIMEOUT,
+                       max_concurrency: int = DEFAULT_MAX_CONCURRENT_FETCHES):
     """The main loop for the poller task."""
-    log.info("Poller loop started with active events: %s", active_events)
-    while True:
-        for event in active_events:
-            fetch_func = EVENT_FETCH_MAP.get(event)
-            if fetch_func:
-                try:
-                    await fetch_func()
-                except Exception as e:
-                    log.error("Error fetching data for event '%s': %s", event, e)
-            else:
-                log.warning("No fetch function found for event '%s'", event)
-
-        log.info("Poller loop finished a cycle. Waiting for %d seconds.", interval_seconds)
-        await asyncio.sleep(interval_seconds)
-
-def start_poller(active_events: List[str], interval_seconds: int = 300):
+    log.info("Poller loop started with schedule: %s", scheduler.intervals)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    in_flight: Dict[str, asyncio.Task] = {}
+    try:
+        while True:
+            due_at, events = scheduler.next_batch()
+            delay = due_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scheduler.mark_dispatched(events)
+
+            # Batches run in the background so a slow fetch never delays the next tick.
+            # An event whose previous fetch is still running skips this tick.
+            for event in events:
+                running = in_flight.get(event)
+                if running and not running.done():
+                    log.warning("Fetch for event '%s' is still running; skipping this tick.", event)
+                    continue
+                in_flight[event] = asyncio.create_task(
+                    _run_fetch(event, semaphore, fetch_timeout, scheduled_at=due_at)
+                )
+    finally:
+        for task in in_flight.values():
+            task.cancel()
+
+def start_poller(active_events: List[str], interval_seconds: Optional[float] = None,
+                 fetch_timeout: float = DEFAULT_FETCH_TIMEOUT,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENT_FETCHES):
     """
     Starts the market data poller. If it's already running, it restarts it.
+    Each event polls on its own cadence from EVENT_INTERVALS unless
+    `interval_seconds` is given, which then applies to every event.
+    Fetches run concurrently, at most `max_concurrency` at a time,
+    and each one is abandoned after `fetch_timeout` seconds.
     """
     global _poller_task
     if _poller_task and not _poller_task.done():
@@ -121,8 +367,32 @@ def start_poller(active_events: List[str], interval_seconds: int = 300):
         _poller_task = None
         return
 
-    log.info("Starting poller with events: %s", active_events)
-    _poller_task = asyncio.create_task(_poller_loop(active_events, interval_seconds))
+    intervals = {
+        event: interval_seconds or EVENT_INTERVALS.get(event, DEFAULT_POLL_INTERVAL)
+        for event in active_events
+    }
+    log.info("Starting poller with schedule: %s", intervals)
+    _poller_task = asyncio.create_task(
+        _poller_loop(PollScheduler(intervals), fetch_timeout, max_concurrency)
+    )
+
+async def apply_remote_sample(sample: Dict[str, Any]):
+    """Records a sample published by the poller worker into this process's cache."""
+    market_data_cache.record(sample['key'], sample['payload'], sample['timestamp'])
+
+def set_remote_control(control: Optional[Callable[[List[str]], None]]):
+    """Routes set_active_events() to a poller running in another process."""
+    global _remote_control
+    _remote_control = control
+
+def set_active_events(active_events: List[str]):
+    """Polls exactly `active_events`, here or in the poller worker."""
+    if _remote_control is not None:
+        _remote_control(list(active_events))
+    elif active_events:
+        start_poller(active_events)
+    else:
+        stop_poller()
 
 def stop_poller():
     """Stops the market data poller."""
@@ -133,3 +403,7 @@ def stop_poller():
         _poller_task = None
     else:
         log.info("Poller is not running.")
+    for task in list(_broadcast_tasks.values()):
+        task.cancel()
+    _broadcast_tasks.clear()
+    _pending_broadcasts.clear()
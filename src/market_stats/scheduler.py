@@ -0,0 +1,71 @@
+import math
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+from ..logger import get_logger
+
+log = get_logger(__name__)
+
+class PollScheduler:
+    """
+    Tracks a per-event polling cadence on a monotonic clock.
+
+    Every event ticks on a fixed grid (`anchor + n * interval`), so the time a
+    fetch takes never pushes later ticks back. Jitter is added on top of each
+    grid point without accumulating, and events that fall due within
+    `merge_window` seconds of each other are handed out as a single batch.
+    """
+
+    def __init__(self, intervals: Dict[str, float], jitter_ratio: float = 0.05,
+                 merge_window: float = 2.0, clock: Callable[[], float] = time.monotonic,
+                 rng: Callable[[], float] = random.random):
+        if not intervals:
+            raise ValueError("At least one event interval is required.")
+        if any(interval <= 0 for interval in intervals.values()):
+            raise ValueError("Polling intervals must be positive.")
+
+        self._intervals = dict(intervals)
+        self._jitter_ratio = jitter_ratio
+        self._merge_window = merge_window
+        self._clock = clock
+        self._rng = rng
+
+        # Every event is due immediately; later ticks are anchored to now.
+        self._anchor = clock()
+        self._slots: Dict[str, int] = {event: 0 for event in self._intervals}
+        self._due: Dict[str, float] = {event: self._anchor for event in self._intervals}
+
+    @property
+    def intervals(self) -> Dict[str, float]:
+        return dict(self._intervals)
+
+    def next_batch(self) -> Tuple[float, List[str]]:
+        """
+        Returns the monotonic time at which the next batch is due, and the
+        events in it: the earliest due event plus any due within the merge window.
+        """
+        first_due = min(self._due.values())
+        cutoff = first_due + self._merge_window
+        events = [event for event, due in sorted(self._due.items(), key=lambda item: item[1])
+                  if due <= cutoff]
+        return first_due, events
+
+    def mark_dispatched(self, events: List[str]):
+        """
+        Advances each event to its next grid slot after it has been dispatched.
+        Slots that were missed entirely (e.g. after a stalled loop) are skipped
+        rather than fired back to back.
+        """
+        now = self._clock()
+        for event in events:
+            interval = self._intervals[event]
+            slot = self._slots[event] + 1
+            behind = math.floor((now - self._anchor) / interval)
+            if behind >= slot:
+                log.warning("Poll schedule for '%s' fell behind by %d tick(s); skipping ahead.",
+                            event, behind - slot + 1)
+                slot = behind + 1
+            self._slots[event] = slot
+            jitter = self._rng() * self._jitter_ratio * interval
+            self._due[event] = self._anchor + slot * interval + jitter
@@ -0,0 +1,271 @@
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..logger import get_logger
+
+log = get_logger(__name__)
+
+# One week of one-minute samples per metric (~160 KB each).
+DEFAULT_CAPACITY = 7 * 24 * 60
+
+# Numeric fields recorded as time series for each cached payload.
+TRACKED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "market_cap": ("total_market_cap", "total_volume_24h", "btc_dominance"),
+    "fear_and_greed": ("value",),
+}
+
+Sample = Tuple[float, float]
+
+def downsample(samples: Iterable[Sample], bucket_seconds: float) -> List[Sample]:
+    """Averages time-ordered samples into fixed-width time buckets."""
+    if bucket_seconds <= 0:
+        raise ValueError("Bucket width must be positive.")
+    buckets: List[Sample] = []
+    current_bucket = None
+    total = 0.0
+    count = 0
+    for timestamp, value in samples:
+        bucket = timestamp - (timestamp % bucket_seconds)
+        if bucket != current_bucket:
+            if count:
+                buckets.append((current_bucket, total / count))
+            current_bucket, total, count = bucket, 0.0, 0
+        total += value
+        count += 1
+    if count:
+        buckets.append((current_bucket, total / count))
+    return buckets
+
+class RingSeries:
+    """
+    A fixed-capacity ring buffer of (timestamp, value) samples.
+
+    Timestamps and values live in two preallocated `array('d')` columns, so
+    memory is bounded by the capacity and appends are O(1). Samples are kept
+    in timestamp order, which lets range queries use binary search.
+    """
+
+    __slots__ = ("capacity", "_timestamps", "_values", "_start", "_size")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("Series capacity must be positive.")
+        self.capacity = capacity
+        self._timestamps = array('d', bytes(8 * capacity))
+        self._values = array('d', bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _index(self, logical: int) -> int:
+        return (self._start + logical) % self.capacity
+
+    def append(self, timestamp: float, value: float) -> float:
+        """
+        Appends a sample, overwriting the oldest one once the buffer is full.
+        Returns the timestamp actually stored.
+        """
+        if self._size:
+            last_ts = self._timestamps[self._index(self._size - 1)]
+            # Keep the column sorted even if the wall clock steps backwards.
+            timestamp = max(timestamp, last_ts)
+
+        if self._size < self.capacity:
+            slot = self._index(self._size)
+            self._size += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._timestamps[slot] = timestamp
+        self._values[slot] = value
+        return timestamp
+
+    def _bisect_left(self, timestamp: float) -> int:
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamps[self._index(mid)] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _bisect_right(self, timestamp: float) -> int:
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamps[self._index(mid)] <= timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _samples(self, first: int, last: int) -> List[Sample]:
+        return [(self._timestamps[self._index(i)], self._values[self._index(i)])
+                for i in range(first, last)]
+
+    def oldest(self) -> Optional[Sample]:
+        if not self._size:
+            return None
+        return self._timestamps[self._start], self._values[self._start]
+
+    def latest(self) -> Optional[Sample]:
+        if not self._size:
+            return None
+        slot = self._index(self._size - 1)
+        return self._timestamps[slot], self._values[slot]
+
+    def last(self, n: int) -> List[Sample]:
+        """Returns the newest `n` samples, oldest first."""
+        n = max(0, min(n, self._size))
+        return self._samples(self._size - n, self._size)
+
+    def range(self, start: float, end: Optional[float] = None) -> List[Sample]:
+        """Returns the samples with `start <= timestamp <= end`."""
+        first = self._bisect_left(start)
+        last = self._size if end is None else self._bisect_right(end)
+        return self._samples(first, max(first, last))
+
+    def downsample(self, bucket_seconds: float, start: float = float("-inf"),
+                   end: Optional[float] = None) -> List[Sample]:
+        """Averages the samples in `[start, end]` into fixed-width time buckets."""
+        return downsample(self.range(start, end), bucket_seconds)
+
+    def aggregate(self, window_seconds: float, now: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """
+        Returns min/max/mean and the percent change over the trailing window,
+        or None if the window holds no samples.
+        """
+        now = time.time() if now is None else now
+        samples = self.range(now - window_seconds, now)
+        if not samples:
+            return None
+        values = [value for _, value in samples]
+        first, last = values[0], values[-1]
+        return {
+            "count": len(values),
+            "min": min(values),
+            "max": max(values),
+            "mean": sum(values) / len(values),
+            "first": first,
+            "last": last,
+            "pct_change": ((last - first) / first * 100) if first else 0.0,
+        }
+
+class TimeSeriesStore:
+    """
+    Holds the latest payload for each market data key plus a bounded history
+    of its tracked numeric fields, one RingSeries per `<key>.<field>` metric.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY,
+                 tracked_fields: Dict[str, Iterable[str]] = TRACKED_FIELDS):
+        self._capacity = capacity
+        self._history = None
+        self._tracked_fields = {key: tuple(fields) for key, fields in tracked_fields.items()}
+        self._latest: Dict[str, Any] = {}
+        self._series: Dict[str, RingSeries] = {}
+        # Bumped on every write so readers can tell when cached views are stale;
+        # `_versions` does the same per metric.
+        self.version = 0
+        self._versions: Dict[str, int] = {}
+
+    def record(self, key: str, payload: Dict[str, Any], timestamp: Optional[float] = None):
+        """Stores `payload` as the latest value for `key` and appends its tracked fields."""
+        timestamp = time.time() if timestamp is None else timestamp
+        self._latest[key] = payload
+        if self._history is not None:
+            self._history.save_latest(key, payload)
+        for field in self._tracked_fields.get(key, ()):
+            value = payload.get(field)
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            self.append(f"{key}.{field}", timestamp, value)
+        self.version += 1
+
+    def append(self, metric: str, timestamp: float, value: float):
+        # The history file gets the same clamped timestamp so it stays sorted too.
+        timestamp = self._append(metric, timestamp, value)
+        if self._history is not None:
+            self._history.append(metric, timestamp, value)
+
+    def _append(self, metric: str, timestamp: float, value: float) -> float:
+        series = self._series.get(metric)
+        if series is None:
+            series = self._series[metric] = RingSeries(self._capacity)
+        timestamp = series.append(timestamp, value)
+        self._versions[metric] = self._versions.get(metric, 0) + 1
+        return timestamp
+
+    def attach_history(self, history) -> int:
+        """
+        Persists every future sample to `history` (a HistoryStore) and reloads
+        the newest samples it already holds, along with the latest payload of
+        each key so readers have data before the first poll.
+        Returns the number of samples restored.
+        """
+        self._history = history
+        restored = 0
+        for metric, samples in history.iter_tails(self._capacity):
+            if not samples:
+                continue
+            for timestamp, value in samples:
+                self._append(metric, timestamp, value)
+            restored += len(samples)
+        for key, payload in history.latest().items():
+            self._latest.setdefault(key, payload)
+        if restored:
+            self.version += 1
+        return restored
+
+    async def flush_history(self):
+        """Writes the latest payloads recorded since the last flush to the history."""
+        if self._history is not None:
+            await self._history.flush_latest()
+
+    def detach_history(self):
+        if self._history is not None:
+            self._history.close()
+            self._history = None
+
+    def latest(self) -> Dict[str, Any]:
+        """Returns a snapshot of the latest payload per key."""
+        return dict(self._latest)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._latest.get(key)
+
+    def metrics(self) -> List[str]:
+        return sorted(self._series)
+
+    def series(self, metric: str) -> Optional[RingSeries]:
+        return self._series.get(metric)
+
+    def metric_version(self, metric: str) -> int:
+        """Counts the samples appended to `metric`; changes only when its data does."""
+        return self._versions.get(metric, 0)
+
+    def range(self, metric: str, start: float, end: Optional[float] = None) -> List[Sample]:
+        """
+        Returns samples in `[start, end]`, reading from the on-disk history
+        when the window reaches back past what is held in memory.
+        """
+        series = self._series.get(metric)
+        oldest = series.oldest() if series else None
+        if self._history is not None and (oldest is None or start < oldest[0]):
+            return self._history.range(metric, start, end)
+        return series.range(start, end) if series else []
+
+    def last(self, metric: str, n: int) -> List[Sample]:
+        series = self._series.get(metric)
+        return series.last(n) if series else []
+
+    def aggregate(self, metric: str, window_seconds: float,
+                  now: Optional[float] = None) -> Optional[Dict[str, float]]:
+        series = self._series.get(metric)
+        return series.aggregate(window_seconds, now) if series else None
@@ -0,0 +1,342 @@
+import asyncio
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .logger import get_logger
+
+log = get_logger(__name__)
+
+# Metrics in the Prometheus text exposition format, without the client library.
+# Recording is a dict lookup plus an addition; all formatting happens at scrape
+# time. Label values are bound once with `labels()`, and hot paths can keep
+# the returned child to skip even that lookup.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upstream API calls and Telegram sends take longer than local handlers.
+REMOTE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _label_string(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Returns the child for these label values, creating it on first use."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}.")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child) -> Iterable[str]:
+        yield f"{self.name}{_label_string(self.labelnames, values)} {_format_value(child.get())}"
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def get(self) -> float:
+        return self.value
+
+class Counter(_Metric):
+    """A monotonically increasing count. Names should end in `_total`."""
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.value += amount
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Reads the value from `function` at scrape time instead of tracking it."""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception as e:
+                log.warning("Gauge callback failed: %s", e)
+                return math.nan
+        return self.value
+
+class Gauge(_Metric):
+    """A value that goes up and down, either set directly or read from a callback."""
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default.set_function(function)
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bound plus the +Inf overflow; cumulated at scrape time.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        """Context manager observing the duration of its block."""
+        return _Timer(self)
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+class Histogram(_Metric):
+    """Observations counted into fixed buckets, plus their sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if not math.isinf(bound)))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return _Timer(self._default)
+
+    def _render_child(self, values: Tuple[str, ...], child: _HistogramChild) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), child.counts):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            yield f"{self.name}_bucket{_label_string(self.labelnames, values, le)} {cumulative}"
+        labels = _label_string(self.labelnames, values)
+        yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+        yield f"{self.name}_count{labels} {child.count}"
+
+class Registry:
+    """The set of metrics one process exposes."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered.")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# --- Application Metrics ---
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests handled, by route template.", ("method", "endpoint", "status"))
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "endpoint"))
+
+poller_fetch_duration_seconds = Histogram(
+    "poller_fetch_duration_seconds", "Market data fetch duration per event.", ("event",),
+    buckets=REMOTE_BUCKETS)
+poller_fetch_errors_total = Counter(
+    "poller_fetch_errors_total", "Failed market data fetches per event.", ("event", "reason"))
+
+cex_events_received_total = Counter(
+    "cex_events_received_total", "CEX events handed to the screener.", ("category",))
+cex_events_filtered_total = Counter(
+    "cex_events_filtered_total", "CEX events that matched no subscriber.", ("category",))
+cex_events_deduplicated_total = Counter(
+    "cex_events_deduplicated_total", "CEX events dropped as exact duplicates.", ("category",))
+cex_events_aggregated_total = Counter(
+    "cex_events_aggregated_total", "CEX events folded into a burst summary.", ("category",))
+cex_notifications_emitted_total = Counter(
+    "cex_notifications_emitted_total", "Notifications the screener queued.", ("category",))
+cex_notification_queue_depth = Gauge(
+    "cex_notification_queue_depth", "Notifications waiting for delivery.")
+cex_shard_events_total = Counter(
+    "cex_shard_events_total", "CEX events processed per screener shard.", ("shard",))
+cex_shard_queue_depth = Gauge(
+    "cex_shard_queue_depth", "CEX events waiting per screener shard.", ("shard",))
+cex_shard_lag_seconds = Histogram(
+    "cex_shard_lag_seconds", "Time a CEX event waited in its shard queue.", ("shard",))
+
+telegram_send_duration_seconds = Histogram(
+    "telegram_send_duration_seconds", "Latency of Telegram sendMessage calls.", ("component",),
+    buckets=REMOTE_BUCKETS)
+telegram_rate_limited_total = Counter(
+    "telegram_rate_limited_total", "Telegram 429 (RetryAfter) responses.", ("component",))
+
+event_loop_lag_seconds = Histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a scheduled wake-up.", buckets=LAG_BUCKETS)
+
+# --- Event Loop Lag ---
+LAG_INTERVAL = 0.5
+
+class LoopLagMonitor:
+    """Sleeps for a fixed interval and records how much later than asked it woke up."""
+
+    def __init__(self, interval: float = LAG_INTERVAL, histogram: Histogram = event_loop_lag_seconds):
+        self.interval = interval
+        self._histogram = histogram
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._histogram.observe(max(0.0, loop.time() - expected))
+
+def render() -> str:
+    """Renders every registered metric for a /metrics response."""
+    return REGISTRY.render()
+
+# --- Standalone Exporter ---
+class MetricsServer:
+    """
+    Serves GET /metrics over plain HTTP for processes without a web app, so
+    every supervisor worker's registry can be scraped on its own port.
+    """
+
+    def __init__(self, port: int, host: str = "0.0.0.0", registry: Optional[Registry] = None):
+        self.port = port
+        self.host = host
+        self._registry = REGISTRY if registry is None else registry
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        log.info("Metrics exporter listening on port %d.", self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await reader.readline()
+            # Headers are read and ignored; the request has no body.
+            while (await reader.readline()).strip():
+                pass
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+                status, body = "200 OK", self._registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            log.debug("Metrics request failed: %s", e)
+        finally:
+            writer.close()
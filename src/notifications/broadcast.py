@@ -0,0 +1,122 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from .. import metrics
+from ..logger import get_logger
+from .delivery import DEFAULT_GLOBAL_RATE, retry_after_seconds
+from .rate_limit import TokenBucket
+
+log = get_logger(__name__)
+
+_send_latency = metrics.telegram_send_duration_seconds.labels("broadcast")
+_rate_limited = metrics.telegram_rate_limited_total.labels("broadcast")
+
+# BadRequest messages that mean the chat can never be reached again.
+UNREACHABLE_CHAT_ERRORS = ("chat not found", "user is deactivated", "bot was kicked")
+
+@dataclass
+class BroadcastResult:
+    recipients: int = 0
+    sent: int = 0
+    failed: Dict[int, str] = field(default_factory=dict)
+    unreachable: List[int] = field(default_factory=list)
+    # Group chats that became supergroups: old chat id -> new chat id.
+    migrated: Dict[int, int] = field(default_factory=dict)
+    duration: float = 0.0
+
+class BroadcastScheduler:
+    """
+    Sends one message to many chats in paced waves under a global rate limit.
+
+    Each wave holds as many sends as the bucket refills per second, so a
+    broadcast to N chats takes about N / rate seconds and never bursts past
+    the flood limit. Recipients are snapshotted once per broadcast. Chats that
+    blocked the bot, no longer exist, or fail `max_failures` broadcasts in a
+    row are reported as unreachable so the caller can prune them. A group that
+    was migrated to a supergroup gets the message at its new id, and the move
+    is reported so the caller can update its subscribers.
+    """
+
+    def __init__(self, bot, rate: float = DEFAULT_GLOBAL_RATE, max_retries: int = 3,
+                 max_failures: int = 5):
+        self._bot = bot
+        self._rate = rate
+        self._bucket = TokenBucket(rate=rate, capacity=rate)
+        self._max_retries = max_retries
+        self._max_failures = max_failures
+        self._failures: Dict[int, int] = {}
+
+    def estimate_duration(self, recipients: int) -> float:
+        return recipients / self._rate
+
+    async def broadcast(self, chat_ids: Iterable[int], text: str, **send_kwargs: Any) -> BroadcastResult:
+        recipients = list(chat_ids)
+        result = BroadcastResult(recipients=len(recipients))
+        started = time.monotonic()
+
+        wave_size = max(1, int(self._rate))
+        for offset in range(0, len(recipients), wave_size):
+            wave = recipients[offset:offset + wave_size]
+            outcomes = await asyncio.gather(
+                *(self._send(chat_id, text, send_kwargs, result) for chat_id in wave),
+                return_exceptions=True,
+            )
+            for chat_id, outcome in zip(wave, outcomes):
+                if isinstance(outcome, BaseException):
+                    log.error("Broadcast to chat %d failed unexpectedly: %s", chat_id, outcome)
+                    outcome = (chat_id, str(outcome), False)
+                _, error, unreachable = outcome
+                if error is None:
+                    result.sent += 1
+                    self._failures.pop(chat_id, None)
+                    continue
+                result.failed[chat_id] = error
+                failures = self._failures.get(chat_id, 0) + 1
+                self._failures[chat_id] = failures
+                if unreachable or failures >= self._max_failures:
+                    result.unreachable.append(chat_id)
+                    self._failures.pop(chat_id, None)
+
+        result.duration = time.monotonic() - started
+        return result
+
+    async def _send(self, chat_id: int, text: str, send_kwargs: Dict[str, Any], result: BroadcastResult,
+                    follow_migration: bool = True):
+        """Returns (chat_id, error or None, whether the chat is permanently unreachable)."""
+        error = None
+        for attempt in range(self._max_retries + 1):
+            await self._bucket.acquire()
+            try:
+                with _send_latency.time():
+                    await self._bot.send_message(chat_id=chat_id, text=text, **send_kwargs)
+                return chat_id, None, False
+            except ChatMigrated as e:
+                if not follow_migration:
+                    return chat_id, str(e), False
+                # Resend to the supergroup; the caller moves the subscription.
+                result.migrated[chat_id] = e.new_chat_id
+                _, error, unreachable = await self._send(e.new_chat_id, text, send_kwargs, result,
+                                                         follow_migration=False)
+                return chat_id, error, unreachable
+            except RetryAfter as e:
+                _rate_limited.inc()
+                delay = retry_after_seconds(e)
+                log.warning("Flood control during broadcast; pausing for %.1f seconds.", delay)
+                self._bucket.pause(delay)
+                error = str(e)
+            except Forbidden as e:
+                return chat_id, str(e), True
+            except BadRequest as e:
+                message = str(e).lower()
+                return chat_id, str(e), any(reason in message for reason in UNREACHABLE_CHAT_ERRORS)
+            except NetworkError as e:
+                error = str(e)
+                await asyncio.sleep(min(2 ** attempt, 30))
+            except TelegramError as e:
+                # e.g. Conflict or InvalidToken: this chat fails, the broadcast goes on.
+                return chat_id, str(e), False
+        return chat_id, error, False
@@ -0,0 +1,216 @@
+import asyncio
+import inspect
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from .. import metrics
+from ..logger import get_logger
+from .rate_limit import TokenBucket
+
+log = get_logger(__name__)
+
+_send_latency = metrics.telegram_send_duration_seconds.labels("delivery")
+_rate_limited = metrics.telegram_rate_limited_total.labels("delivery")
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+MESSAGE_SEPARATOR = "\n\n"
+
+# Telegram allows roughly 30 messages per second per bot and about one per
+# second into the same chat; stay slightly under both.
+DEFAULT_GLOBAL_RATE = 25.0
+DEFAULT_PER_CHAT_INTERVAL = 1.0
+# Messages held across all chats before the pool stops taking from the queue,
+# so a backlog stays in the queue where its overflow policy applies.
+DEFAULT_MAX_BUFFERED = 1000
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """Returns RetryAfter.retry_after in seconds, whichever type the library uses."""
+    delay = error.retry_after
+    if isinstance(delay, timedelta):
+        return delay.total_seconds()
+    return float(delay)
+
+class DeliveryPool:
+    """
+    Drains a notification queue and delivers the messages through a bot.
+
+    Queue items are `(chat_id, text)` tuples; the screener resolves the chat
+    before queueing. Messages waiting for the same chat are merged into as
+    few Telegram messages as the length limit allows. A global token bucket
+    keeps the bot under the flood limit and each chat is sent to at most once
+    per `per_chat_interval`. Each chat keeps at most `max_pending_per_chat`
+    messages; older ones are dropped first. Once `max_buffered` messages are
+    held in total, nothing more is taken from the queue until some are sent.
+    """
+
+    def __init__(self, bot, queue: asyncio.Queue, workers: int = 4,
+                 global_rate: float = DEFAULT_GLOBAL_RATE, per_chat_interval: float = DEFAULT_PER_CHAT_INTERVAL,
+                 max_pending_per_chat: int = 50, max_buffered: int = DEFAULT_MAX_BUFFERED,
+                 max_retries: int = 3, on_blocked: Optional[Callable[[int], Any]] = None):
+        self._bot = bot
+        self._queue = queue
+        self._num_workers = workers
+        self._bucket = TokenBucket(rate=global_rate, capacity=global_rate)
+        self._per_chat_interval = per_chat_interval
+        self._max_pending = max_pending_per_chat
+        self._max_buffered = max_buffered
+        self._max_retries = max_retries
+        self._on_blocked = on_blocked
+
+        self._pending: Dict[int, Deque[str]] = {}
+        self._buffered = 0
+        self._room: Optional[asyncio.Event] = None
+        self._scheduled: Set[int] = set()
+        self._last_sent: Dict[int, float] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"received": 0, "sent": 0, "merged": 0, "dropped": 0, "retried": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.running:
+            return
+        self._ready = asyncio.Queue()
+        self._room = asyncio.Event()
+        self._update_buffered(0)
+        self._tasks = [asyncio.create_task(self._collect())]
+        self._tasks += [asyncio.create_task(self._work(i)) for i in range(self._num_workers)]
+        log.info("Notification delivery started with %d workers.", self._num_workers)
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        log.info("Notification delivery stopped. Stats: %s", self.stats)
+
+    def _normalise(self, item: Any) -> Optional[Tuple[int, str]]:
+        if isinstance(item, tuple) and len(item) == 2 and item[0] is not None:
+            return item
+        return None
+
+    def _update_buffered(self, delta: int):
+        self._buffered += delta
+        if self._room is None:
+            return
+        if self._buffered < self._max_buffered:
+            self._room.set()
+        else:
+            self._room.clear()
+
+    async def _collect(self):
+        while True:
+            await self._room.wait()
+            item = await self._queue.get()
+            self._queue.task_done()
+            self.stats["received"] += 1
+            normalised = self._normalise(item)
+            if normalised is None:
+                self.stats["dropped"] += 1
+                log.warning("Dropping notification without a destination chat.")
+                continue
+
+            chat_id, text = normalised
+            pending = self._pending.get(chat_id)
+            if pending is None:
+                pending = self._pending[chat_id] = deque(maxlen=self._max_pending)
+            if len(pending) == pending.maxlen:
+                self.stats["dropped"] += 1
+            else:
+                self._update_buffered(1)
+            pending.append(text)
+            self._schedule(chat_id)
+
+    def _schedule(self, chat_id: int):
+        if chat_id in self._scheduled:
+            return
+        self._scheduled.add(chat_id)
+        delay = self._last_sent.get(chat_id, float("-inf")) + self._per_chat_interval - time.monotonic()
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._ready.put_nowait, chat_id)
+        else:
+            self._ready.put_nowait(chat_id)
+
+    def _take_batch(self, chat_id: int) -> str:
+        """Pops as many pending messages for the chat as fit into one Telegram message."""
+        pending = self._pending[chat_id]
+        parts = [pending.popleft()[:TELEGRAM_MESSAGE_LIMIT]]
+        length = len(parts[0])
+        while pending and length + len(MESSAGE_SEPARATOR) + len(pending[0]) <= TELEGRAM_MESSAGE_LIMIT:
+            text = pending.popleft()
+            parts.append(text)
+            length += len(MESSAGE_SEPARATOR) + len(text)
+        self.stats["merged"] += len(parts) - 1
+        self._update_buffered(-len(parts))
+        return MESSAGE_SEPARATOR.join(parts)
+
+    async def _work(self, worker_id: int):
+        while True:
+            chat_id = await self._ready.get()
+            # The chat stays in _scheduled while it is being sent to, so no
+            # second worker can pick it up before its interval has passed.
+            try:
+                if self._pending.get(chat_id):
+                    await self._deliver(chat_id, self._take_batch(chat_id))
+            except Exception as e:
+                self.stats["failed"] += 1
+                log.error("Delivery worker %d failed for chat %d: %s", worker_id, chat_id, e)
+            finally:
+                self._scheduled.discard(chat_id)
+                if self._pending.get(chat_id):
+                    self._schedule(chat_id)
+                else:
+                    self._pending.pop(chat_id, None)
+                self._prune_last_sent()
+
+    async def _deliver(self, chat_id: int, text: str):
+        for attempt in range(self._max_retries + 1):
+            if attempt:
+                self.stats["retried"] += 1
+            await self._bucket.acquire()
+            try:
+                with _send_latency.time():
+                    await self._bot.send_message(chat_id=chat_id, text=text)
+                self._last_sent[chat_id] = time.monotonic()
+                self.stats["sent"] += 1
+                return
+            except RetryAfter as e:
+                _rate_limited.inc()
+                delay = retry_after_seconds(e)
+                log.warning("Flood control for chat %d; retrying in %.1f seconds.", chat_id, delay)
+                self._bucket.pause(delay)
+                await asyncio.sleep(delay)
+            except Forbidden as e:
+                log.info("Chat %d blocked the bot (%s); dropping its notifications.", chat_id, e)
+                dropped = len(self._pending.pop(chat_id, ()))
+                self._update_buffered(-dropped)
+                self.stats["dropped"] += 1 + dropped
+                if self._on_blocked:
+                    result = self._on_blocked(chat_id)
+                    if inspect.isawaitable(result):
+                        await result
+                return
+            except BadRequest as e:
+                log.error("Telegram rejected a notification for chat %d: %s", chat_id, e)
+                self.stats["failed"] += 1
+                return
+            except NetworkError as e:
+                log.warning("Network error sending to chat %d (attempt %d): %s", chat_id, attempt + 1, e)
+                await asyncio.sleep(min(2 ** attempt, 30))
+
+        self.stats["failed"] += 1
+        log.error("Giving up on a notification for chat %d after %d retries.", chat_id, self._max_retries)
+
+    def _prune_last_sent(self):
+        # Only recent sends constrain scheduling, so old entries can go.
+        if len(self._last_sent) < 10000:
+            return
+        cutoff = time.monotonic() - self._per_chat_interval
+        self._last_sent = {chat: sent for chat, sent in self._last_sent.items() if sent > cutoff}
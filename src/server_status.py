@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional, Sequence
+
+import psutil
+
+from .logger import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_INTERVAL = 5.0
+# Five minutes of history at the default interval.
+DEFAULT_HISTORY = 60
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+@dataclass
+class StatusSample:
+    timestamp: float
+    cpu_percent: float
+    memory_used: int
+    memory_total: int
+    memory_percent: float
+    disk_used: int
+    disk_total: int
+    disk_percent: float
+    process_rss: int
+    open_fds: Optional[int]
+    loop_lag: float
+
+def sparkline(values: Sequence[float], width: Optional[int] = None) -> str:
+    """Renders the last `width` values as block characters scaled to their range."""
+    values = list(values)[-width:] if width else list(values)
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    span = high - low
+    top = len(SPARK_CHARS) - 1
+    if span == 0:
+        return SPARK_CHARS[0] * len(values)
+    return "".join(SPARK_CHARS[round((value - low) / span * top)] for value in values)
+
+class StatusSampler:
+    """
+    Collects host and process metrics on a fixed cadence into a ring buffer,
+    so status requests read a snapshot instead of measuring on the spot.
+    CPU load is measured between consecutive samples, which needs no blocking
+    interval, and the psutil reads run in a thread off the event loop.
+    Event-loop lag is how late the sampler's own sleep wakes up.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, history: int = DEFAULT_HISTORY,
+                 disk_path: str = '/'):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.samples: Deque[StatusSample] = deque(maxlen=history)
+        self._process = psutil.Process(os.getpid())
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def latest(self) -> Optional[StatusSample]:
+        return self.samples[-1] if self.samples else None
+
+    def start(self):
+        if self._task is not None:
+            return
+        # The first call only sets the reference point for the next one.
+        psutil.cpu_percent(interval=None)
+        self._task = asyncio.create_task(self._run())
+        log.info("Server status sampler started (every %.0f seconds).", self.interval)
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            try:
+                self.samples.append(await asyncio.to_thread(self.collect, lag))
+            except Exception as e:
+                log.error("Could not sample server status: %s", e)
+
+    def collect(self, loop_lag: float = 0.0) -> StatusSample:
+        """Takes one sample. Blocking; call it from a thread."""
+        mem = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        with self._process.oneshot():
+            rss = self._process.memory_info().rss
+            try:
+                open_fds = self._process.num_fds()
+            except (AttributeError, psutil.Error):
+                # num_fds() is Unix-only.
+                open_fds = None
+        return StatusSample(
+            timestamp=time.time(),
+            cpu_percent=psutil.cpu_percent(interval=None),
+            memory_used=mem.used,
+            memory_total=mem.total,
+            memory_percent=mem.percent,
+            disk_used=disk.used,
+            disk_total=disk.total,
+            disk_percent=disk.percent,
+            process_rss=rss,
+            open_fds=open_fds,
+            loop_lag=loop_lag,
+        )
+
+    def series(self, field: str) -> List[float]:
+        return [getattr(sample, field) for sample in self.samples]
+
+    def process_uptime(self) -> float:
+        return time.time() - self._process.create_time()
+
+def system_uptime() -> float:
+    return time.time() - psutil.boot_time()
+
+def format_duration(seconds: float) -> str:
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h {minutes}m"
+    return f"{hours}h {minutes}m"
+
+# Shared by the admin bot; started and stopped with it.
+status_sampler = StatusSampler()
@@ -0,0 +1,68 @@
+import importlib
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from types import ModuleType
+from typing import List
+
+from .logger import get_logger
+
+log = get_logger(__name__)
+
+# Set by --profile-startup; worker processes inherit it through the environment.
+PROFILE_ENV = "CRYPTOHAWK_PROFILE_STARTUP"
+TOP_PACKAGES = 4
+
+@dataclass
+class StartupStep:
+    kind: str  # "import" or "init"
+    name: str
+    seconds: float
+    modules: int
+    packages: List[str]
+
+_steps: List[StartupStep] = []
+_started = time.perf_counter()
+
+def enable():
+    os.environ[PROFILE_ENV] = "1"
+
+def enabled() -> bool:
+    return os.environ.get(PROFILE_ENV) == "1"
+
+@contextmanager
+def timed(kind: str, name: str):
+    """Records how long the block took and how many modules it imported."""
+    if not enabled():
+        yield
+        return
+    before = set(sys.modules)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        new = [module for module in sys.modules if module not in before]
+        packages = Counter(module.split('.', 1)[0] for module in new)
+        _steps.append(StartupStep(kind, name, seconds, len(new),
+                                  [f"{package} {count}" for package, count in packages.most_common(TOP_PACKAGES)]))
+
+def import_module(name: str) -> ModuleType:
+    """Imports `name`, timing it when startup profiling is on."""
+    with timed("import", name):
+        return importlib.import_module(name)
+
+def report(label: str = "startup"):
+    """Logs every recorded step, slowest first. Modules are counted where first imported."""
+    if not enabled():
+        return
+    total = time.perf_counter() - _started
+    lines = [f"Startup profile ({label}): ready {total:.3f}s after the profiler was loaded."]
+    for step in sorted(_steps, key=lambda step: step.seconds, reverse=True):
+        detail = f" ({', '.join(step.packages)})" if step.packages else ""
+        lines.append(f"  {step.kind:<6} {step.name:<32} {step.seconds * 1000:8.1f} ms "
+                     f"{step.modules:5d} modules{detail}")
+    log.info("\n".join(lines))
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar, Union
+
+from ..logger import get_logger
+
+log = get_logger(__name__)
+
+T = TypeVar("T")
+
+STATE_DB_PATH = Path(__file__).parent.parent.parent / 'data' / 'state.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscribers (
+    scope   TEXT    NOT NULL,
+    chat_id INTEGER NOT NULL,
+    PRIMARY KEY (scope, chat_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS settings (
+    namespace TEXT NOT NULL,
+    key       TEXT NOT NULL,
+    value     TEXT NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS user_filters (
+    chat_id  INTEGER NOT NULL,
+    category TEXT    NOT NULL,
+    settings TEXT    NOT NULL,
+    PRIMARY KEY (chat_id, category)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS user_filters_by_category ON user_filters (category, chat_id);
+"""
+
+# Statements are module constants so sqlite3's statement cache prepares each once.
+SQL_ADD_SUBSCRIBER = "INSERT OR IGNORE INTO subscribers (scope, chat_id) VALUES (?, ?)"
+SQL_REMOVE_SUBSCRIBER = "DELETE FROM subscribers WHERE scope = ? AND chat_id = ?"
+SQL_SELECT_SUBSCRIBERS = "SELECT chat_id FROM subscribers WHERE scope = ?"
+SQL_IS_SUBSCRIBED = "SELECT 1 FROM subscribers WHERE scope = ? AND chat_id = ?"
+SQL_UPSERT_SETTING = (
+    "INSERT INTO settings (namespace, key, value) VALUES (?, ?, ?) "
+    "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value"
+)
+SQL_SELECT_SETTINGS = "SELECT key, value FROM settings WHERE namespace = ?"
+SQL_UPSERT_FILTER = (
+    "INSERT INTO user_filters (chat_id, category, settings) VALUES (?, ?, ?) "
+    "ON CONFLICT (chat_id, category) DO UPDATE SET settings = excluded.settings"
+)
+SQL_DELETE_FILTERS = "DELETE FROM user_filters WHERE chat_id = ?"
+SQL_SELECT_FILTERS = "SELECT category, settings FROM user_filters WHERE chat_id = ?"
+SQL_SELECT_ALL_FILTERS = "SELECT chat_id, category, settings FROM user_filters"
+SQL_SELECT_CATEGORY_CHATS = "SELECT chat_id FROM user_filters WHERE category = ?"
+
+# One subscriber change: (op, chat_id) with op 1 = add, 0 = remove.
+SubscriberChange = Tuple[int, int]
+
+class StateStore:
+    """
+    Persistent bot state in one SQLite database in WAL mode.
+
+    Every query runs on a single dedicated thread that owns the connection, so
+    callers await results without blocking the event loop and SQLite never sees
+    concurrent use of a connection. The database is opened on first use.
+    Lookups go through primary keys or the category index.
+    """
+
+    def __init__(self, path: Union[Path, str] = STATE_DB_PATH):
+        self.path = path
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # --- Connection ---
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if isinstance(self.path, Path):
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL with synchronous=NORMAL is durable across application crashes.
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            log.info("State store opened at %s.", self.path)
+        return self._conn
+
+    async def _run(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(self._connect()))
+
+    async def _write(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        def transaction(conn: sqlite3.Connection) -> T:
+            with conn:
+                return func(conn)
+        return await self._run(transaction)
+
+    async def close(self):
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+
+        def close_connection():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        await asyncio.get_running_loop().run_in_executor(executor, close_connection)
+        executor.shutdown(wait=True)
+        log.info("State store closed.")
+
+    # --- Subscribers ---
+    async def load_subscribers(self, scope: str) -> Set[int]:
+        rows = await self._run(lambda conn: conn.execute(SQL_SELECT_SUBSCRIBERS, (scope,)).fetchall())
+        return {chat_id for (chat_id,) in rows}
+
+    async def is_subscribed(self, scope: str, chat_id: int) -> bool:
+        row = await self._run(lambda conn: conn.execute(SQL_IS_SUBSCRIBED, (scope, chat_id)).fetchone())
+        return row is not None
+
+    async def add_subscribers(self, scope: str, chat_ids: Iterable[int]):
+        rows = [(scope, chat_id) for chat_id in chat_ids]
+        await self._write(lambda conn: conn.executemany(SQL_ADD_SUBSCRIBER, rows))
+
+    async def remove_subscribers(self, scope: str, chat_ids: Iterable[int]):
+        rows = [(scope, chat_id) for chat_id in chat_ids]
+        await self._write(lambda conn: conn.executemany(SQL_REMOVE_SUBSCRIBER, rows))
+
+    async def apply_subscriber_changes(self, scope: str, changes: List[SubscriberChange]):
+        """Applies a batch of adds and removes, in order, in one transaction."""
+        def apply(conn: sqlite3.Connection):
+            for op, chat_id in changes:
+                conn.execute(SQL_ADD_SUBSCRIBER if op else SQL_REMOVE_SUBSCRIBER, (scope, chat_id))
+        await self._write(apply)
+
+    # --- Settings ---
+    async def get_settings(self, namespace: str) -> Dict[str, Any]:
+        rows = await self._run(lambda conn: conn.execute(SQL_SELECT_SETTINGS, (namespace,)).fetchall())
+        return {key: json.loads(value) for key, value in rows}
+
+    async def set_settings(self, namespace: str, values: Dict[str, Any]):
+        rows = [(namespace, key, json.dumps(value)) for key, value in values.items()]
+        await self._write(lambda conn: conn.executemany(SQL_UPSERT_SETTING, rows))
+
+    async def set_setting(self, namespace: str, key: str, value: Any):
+        await self.set_settings(namespace, {key: value})
+
+    # --- User Filters ---
+    async def get_user_filters(self, chat_id: int) -> Dict[str, Any]:
+        rows = await self._run(lambda conn: conn.execute(SQL_SELECT_FILTERS, (chat_id,)).fetchall())
+        return {category: json.loads(settings) for category, settings in rows}
+
+    async def load_user_filters(self) -> Dict[int, Dict[str, Any]]:
+        rows = await self._run(lambda conn: conn.execute(SQL_SELECT_ALL_FILTERS).fetchall())
+        filters: Dict[int, Dict[str, Any]] = {}
+        for chat_id, category, settings in rows:
+            filters.setdefault(chat_id, {})[category] = json.loads(settings)
+        return filters
+
+    async def chats_for_category(self, category: str) -> List[int]:
+        rows = await self._run(lambda conn: conn.execute(SQL_SELECT_CATEGORY_CHATS, (category,)).fetchall())
+        return [chat_id for (chat_id,) in rows]
+
+    async def set_user_filters(self, filters_by_chat: Dict[int, Dict[str, Any]]):
+        """Replaces the filters of every chat in `filters_by_chat` in one transaction."""
+        rows = [
+            (chat_id, category, json.dumps(settings))
+            for chat_id, user_filters in filters_by_chat.items()
+            for category, settings in user_filters.items()
+        ]
+
+        def replace(conn: sqlite3.Connection):
+            conn.executemany(SQL_DELETE_FILTERS, [(chat_id,) for chat_id in filters_by_chat])
+            conn.executemany(SQL_UPSERT_FILTER, rows)
+        await self._write(replace)
+
+    async def delete_user_filters(self, chat_id: int):
+        await self._write(lambda conn: conn.execute(SQL_DELETE_FILTERS, (chat_id,)))
+
+# Shared by every bot so they all read and write the same database.
+state_store = StateStore()
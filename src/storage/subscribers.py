@@ -0,0 +1,310 @@
+import asyncio
+import json
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, List, Optional, Set, Tuple
+
+from ..logger import get_logger
+
+if TYPE_CHECKING:
+    from .state_store import StateStore
+
+log = get_logger(__name__)
+
+# --- File Format ---
+# The snapshot is a 16-byte header (magic, version, member count) followed by
+# the chat ids as little-endian int64s. The change log is a sequence of 9-byte
+# records: an op byte (1 = add, 0 = remove) and the chat id.
+MAGIC = b"CHSS"
+FORMAT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sHxxQ")
+LOG_RECORD = struct.Struct("<Bq")
+OP_REMOVE, OP_ADD = 0, 1
+
+Change = Tuple[int, int]
+
+# State store settings recording which scopes have had their files imported.
+MIGRATION_NAMESPACE = "subscribers_migrated"
+
+def _fsync_directory(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class SubscriberStore:
+    """
+    A set of subscribed chat ids persisted as a binary snapshot plus a change log,
+    or in a shared StateStore when one is given.
+
+    `add` and `discard` only touch the in-memory set and queue the change. A
+    background task coalesces queued changes for `flush_interval` seconds and
+    appends them to the log in one write, off the event loop. Once the log holds
+    `compact_after` records it is folded into a new snapshot, written to a
+    temporary file, fsynced and renamed over the old one. The snapshot holds
+    exactly the old snapshot plus the log, leaving out changes still queued, so
+    replaying the log over it changes nothing and a crash between the rename
+    and the log reset loses nothing.
+    With a state store, coalesced batches go to its subscribers table instead
+    and the files are only read once, to migrate them.
+    """
+
+    def __init__(self, directory: Path, name: str, legacy_json: Optional[Path] = None,
+                 flush_interval: float = 1.0, compact_after: int = 10000,
+                 state_store: Optional["StateStore"] = None,
+                 on_change: Optional[Callable[[int, int], None]] = None):
+        self.name = name
+        # Called with (op, chat_id) for every change, e.g. to tell other processes.
+        self.on_change = on_change
+        self.state_store = state_store
+        self.directory = Path(directory)
+        self.snapshot_path = self.directory / f"{name}.snap"
+        self.log_path = self.directory / f"{name}.log"
+        self.legacy_json = legacy_json
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+
+        self.members: Set[int] = set()
+        self._pending: List[Change] = []
+        self._log_records = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self.members
+
+    # --- Loading ---
+    def load(self) -> Set[int]:
+        """Loads the snapshot and replays the change log. Returns the member set."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        members = self._read_snapshot()
+        if members is None:
+            members = self._read_legacy_json()
+            if members:
+                self._write_snapshot(members)
+                log.info("Migrated %d subscribers from %s.", len(members), self.legacy_json)
+            members = members or set()
+        self._log_records = self._replay_log(members)
+
+        # Keep the same set object so existing references see the loaded members.
+        self.members.clear()
+        self.members.update(members)
+        log.info("Loaded %d subscribers from %s.", len(self.members), self.snapshot_path)
+        return self.members
+
+    async def open(self) -> Set[int]:
+        """Loads the members without blocking the event loop and starts the writer."""
+        if self.state_store is None:
+            await asyncio.to_thread(self.load)
+        else:
+            members = await self.state_store.load_subscribers(self.name)
+            migrated = await self.state_store.get_settings(MIGRATION_NAMESPACE)
+            if not migrated.get(self.name):
+                # Only ever import the files once; an empty table afterwards
+                # means everyone unsubscribed, not that nothing was migrated.
+                if not members:
+                    members = await asyncio.to_thread(self._load_files)
+                    if members:
+                        await self.state_store.add_subscribers(self.name, members)
+                        log.info("Migrated %d '%s' subscribers into the state store.",
+                                 len(members), self.name)
+                await self.state_store.set_setting(MIGRATION_NAMESPACE, self.name, True)
+            self.members.clear()
+            self.members.update(members)
+            log.info("Loaded %d '%s' subscribers from the state store.", len(self.members), self.name)
+        await self.start()
+        return self.members
+
+    def _load_files(self) -> Set[int]:
+        members = self._read_snapshot()
+        if members is None:
+            members = self._read_legacy_json() or set()
+        if self.directory.exists():
+            self._replay_log(members)
+        return members
+
+    def _read_snapshot(self) -> Optional[Set[int]]:
+        try:
+            data = self.snapshot_path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            magic, version, count = SNAPSHOT_HEADER.unpack_from(data)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError("bad header")
+            ids = array('q')
+            ids.frombytes(data[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + count * ids.itemsize])
+            if sys.byteorder == 'big':
+                ids.byteswap()
+            if len(ids) != count:
+                raise ValueError("truncated")
+        except (struct.error, ValueError) as e:
+            log.error("Subscriber snapshot %s is unreadable (%s). Starting from the change log.",
+                      self.snapshot_path, e)
+            return set()
+        return set(ids)
+
+    def _read_legacy_json(self) -> Optional[Set[int]]:
+        if not self.legacy_json or not self.legacy_json.exists():
+            return None
+        try:
+            with open(self.legacy_json, 'r') as f:
+                return {int(chat_id) for chat_id in json.load(f)}
+        except (json.JSONDecodeError, TypeError, ValueError) as e:
+            log.error("Could not decode legacy subscribers file %s: %s", self.legacy_json, e)
+            return None
+
+    def _replay_log(self, members: Set[int]) -> int:
+        try:
+            data = self.log_path.read_bytes()
+        except FileNotFoundError:
+            return 0
+        usable = len(data) - len(data) % LOG_RECORD.size
+        if usable != len(data):
+            # A partial trailing record left behind by a crash mid-write.
+            log.warning("Truncating %d stray bytes from %s.", len(data) - usable, self.log_path)
+            os.truncate(self.log_path, usable)
+        for op, chat_id in LOG_RECORD.iter_unpack(data[:usable]):
+            if op == OP_ADD:
+                members.add(chat_id)
+            else:
+                members.discard(chat_id)
+        return usable // LOG_RECORD.size
+
+    # --- Changes ---
+    def add(self, chat_id: int) -> bool:
+        if chat_id in self.members:
+            return False
+        self.members.add(chat_id)
+        self._queue(OP_ADD, chat_id)
+        return True
+
+    def discard(self, chat_id: int) -> bool:
+        if chat_id not in self.members:
+            return False
+        self.members.discard(chat_id)
+        self._queue(OP_REMOVE, chat_id)
+        return True
+
+    def discard_many(self, chat_ids) -> int:
+        return sum(self.discard(chat_id) for chat_id in chat_ids)
+
+    def _queue(self, op: int, chat_id: int):
+        self._pending.append((op, chat_id))
+        if self.on_change is not None:
+            self.on_change(op, chat_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # --- Write-behind ---
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._closing = asyncio.Event()
+        if self._pending:
+            self._wakeup.set()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Stops the background writer and flushes whatever is still queued."""
+        task, self._task = self._task, None
+        if task is not None:
+            # Let the writer finish its current write instead of cancelling it
+            # halfway through a thread it can't stop.
+            self._closing.set()
+            self._wakeup.set()
+            await task
+        await self.flush()
+
+    async def _flush_loop(self):
+        while not self._closing.is_set():
+            await self._wakeup.wait()
+            # Let a burst of /start and /stop commands pile up into one write.
+            try:
+                await asyncio.wait_for(self._closing.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error("Could not persist '%s' subscriber changes: %s", self.name, e)
+                self._wakeup.set()
+
+    async def flush(self):
+        """Persists queued changes, compacting the log when it has grown large."""
+        batch, self._pending = self._pending, []
+        if batch and self.state_store is not None:
+            try:
+                await self.state_store.apply_subscriber_changes(self.name, batch)
+            except Exception:
+                self._pending[:0] = batch
+                raise
+            return
+        if batch:
+            try:
+                await asyncio.to_thread(self._append_log, batch)
+            except OSError:
+                # Keep the changes so the next flush retries them in order.
+                self._pending[:0] = batch
+                raise
+            self._log_records += len(batch)
+        if self._log_records >= self.compact_after:
+            await asyncio.to_thread(self._compact, self._logged_members())
+            self._log_records = 0
+
+    def _logged_members(self) -> Set[int]:
+        """The members as of the last logged change, without the queued ones."""
+        members = set(self.members)
+        # Every queued change flipped membership, so undoing them newest first is exact.
+        for op, chat_id in reversed(self._pending):
+            if op == OP_ADD:
+                members.discard(chat_id)
+            else:
+                members.add(chat_id)
+        return members
+
+    def _append_log(self, batch: List[Change]):
+        data = b"".join(LOG_RECORD.pack(op, chat_id) for op, chat_id in batch)
+        with open(self.log_path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self, members: Set[int]):
+        self._write_snapshot(members)
+        # Every change in the log is now part of the snapshot.
+        with open(self.log_path, 'wb') as f:
+            os.fsync(f.fileno())
+        log.info("Compacted %d subscribers into %s.", len(members), self.snapshot_path)
+
+    def _write_snapshot(self, members: Set[int]):
+        ids = array('q', sorted(members))
+        if sys.byteorder == 'big':
+            ids.byteswap()
+        tmp_path = self.snapshot_path.with_suffix(self.snapshot_path.suffix + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(MAGIC, FORMAT_VERSION, len(ids)))
+            f.write(ids.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_directory(self.directory)
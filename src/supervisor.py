@@ -0,0 +1,308 @@
+import asyncio
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from . import config, metrics, startup, telegram_webhooks
+from .ipc import (
+    BUS_ENV, DEFAULT_BUS_PATH, TOPIC_CEX_EVENTS, TOPIC_MARKET_SAMPLE, TOPIC_MARKET_SUBSCRIBERS,
+    TOPIC_MARKET_MIGRATED, TOPIC_MARKET_UNREACHABLE, TOPIC_POLLER_CONTROL, BusClient, BusServer, telegram_update_topic,
+)
+from .logger import get_logger
+
+log = get_logger(__name__)
+
+ROOT_DIR = Path(__file__).parent.parent
+MAIN_SCRIPT = ROOT_DIR / 'main.py'
+
+WORKERS = ("admin", "cex", "market_stats", "poller", "web")
+# Each async worker serves its own metrics on WORKER_METRICS_PORT plus its
+# offset; the web worker's are on its /metrics route.
+METRICS_PORT_OFFSETS = {"admin": 0, "cex": 1, "market_stats": 2, "poller": 3}
+
+# Restart backoff: doubles per crash up to the cap, and resets once a worker
+# has stayed up for STABLE_AFTER seconds.
+MIN_RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+STABLE_AFTER = 60.0
+STOP_TIMEOUT = 10.0
+
+# The CEX worker's screener shards, drained before its bot stops.
+cex_shards = None
+
+class Supervisor:
+    """
+    Runs each worker as its own process, restarts the ones that exit, and
+    hosts the IPC bus they use to talk to each other.
+    """
+
+    def __init__(self, workers: Sequence[str] = WORKERS, bus_path: Path = DEFAULT_BUS_PATH,
+                 command: Optional[List[str]] = None):
+        self.workers = list(workers)
+        self.bus = BusServer(bus_path)
+        # The worker name is appended to the command.
+        self.command = command or [sys.executable, str(MAIN_SCRIPT), "--worker"]
+        self.processes: Dict[str, asyncio.subprocess.Process] = {}
+        self.restarts: Dict[str, int] = {name: 0 for name in self.workers}
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        await self.bus.start()
+        loop = asyncio.get_running_loop()
+        handled = []
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stopping.set)
+                handled.append(sig)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
+
+        keepers = [asyncio.create_task(self._keep_alive(name)) for name in self.workers]
+        try:
+            await self._stopping.wait()
+        finally:
+            log.info("Supervisor stopping workers...")
+            self._stopping.set()
+            await self._stop_all()
+            for keeper in keepers:
+                keeper.cancel()
+            await asyncio.gather(*keepers, return_exceptions=True)
+            await self.bus.stop()
+            for sig in handled:
+                loop.remove_signal_handler(sig)
+            log.info("Supervisor stopped.")
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _spawn(self, name: str) -> asyncio.subprocess.Process:
+        env = {**os.environ, BUS_ENV: str(self.bus.path)}
+        process = await asyncio.create_subprocess_exec(*self.command, name, env=env, cwd=str(ROOT_DIR))
+        log.info("Started worker '%s' (pid %d).", name, process.pid)
+        return process
+
+    async def _keep_alive(self, name: str):
+        delay = MIN_RESTART_DELAY
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            try:
+                process = await self._spawn(name)
+            except OSError as e:
+                log.error("Could not start worker '%s': %s", name, e)
+            else:
+                self.processes[name] = process
+                code = await process.wait()
+                if self._stopping.is_set():
+                    return
+                log.error("Worker '%s' exited with code %s.", name, code)
+                self.restarts[name] += 1
+
+            if time.monotonic() - started >= STABLE_AFTER:
+                delay = MIN_RESTART_DELAY
+            log.info("Restarting worker '%s' in %.0f seconds.", name, delay)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+
+    async def _stop_all(self):
+        running = [p for p in self.processes.values() if p.returncode is None]
+        for process in running:
+            process.terminate()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(p.wait() for p in running)), STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            for process in running:
+                if process.returncode is None:
+                    log.warning("Worker pid %d did not stop in time; killing it.", process.pid)
+                    process.kill()
+            await asyncio.gather(*(p.wait() for p in running))
+
+# --- Workers ---
+
+def run_worker(name: str):
+    """Entry point of a worker process."""
+    if name == "web":
+        _run_web_worker()
+    else:
+        asyncio.run(_run_async_worker(name))
+
+def _run_web_worker():
+    import uvicorn
+    # Each uvicorn worker joins the bus from the app's lifespan.
+    log.info("Starting FastAPI server on port %d with %d workers.", config.WEBHOOK_PORT, config.WEB_WORKERS)
+    uvicorn.run("src.web_server:app", host="0.0.0.0", port=config.WEBHOOK_PORT,
+                workers=config.WEB_WORKERS, app_dir=str(ROOT_DIR), log_config=None)
+
+async def _wait_for_stop_signal():
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    await stopped.wait()
+
+async def _run_async_worker(name: str):
+    from .bots.runner import stop_bot
+    from .market_stats import poller
+    from .storage.state_store import state_store
+
+    bus = BusClient(name=name)
+    application = None
+    exporter = None
+    try:
+        if config.WORKER_METRICS_PORT and name in METRICS_PORT_OFFSETS:
+            exporter = metrics.MetricsServer(config.WORKER_METRICS_PORT + METRICS_PORT_OFFSETS[name])
+            try:
+                await exporter.start()
+            except OSError as e:
+                log.error("Worker '%s' could not serve metrics: %s", name, e)
+                exporter = None
+        with startup.timed("init", f"{name} worker"):
+            if name == "admin":
+                application = await _start_admin(bus)
+            elif name == "cex":
+                application = await _start_cex(bus)
+            elif name == "market_stats":
+                application = await _start_market_stats(bus)
+            elif name == "poller":
+                application = await _start_poller(bus)
+            else:
+                raise ValueError(f"Unknown worker '{name}'.")
+        if application is None:
+            # Exit so the supervisor restarts the worker with backoff.
+            log.error("Worker '%s' failed to start its bot.", name)
+            return
+        if name != "poller" and telegram_webhooks.enabled():
+            # Webhook updates arrive at the web worker, which forwards them here.
+            async def forward_update(data, application=application):
+                await telegram_webhooks.enqueue_update(application, data)
+            bus.subscribe(telegram_update_topic(name), forward_update)
+        await bus.start()
+        startup.report(f"{name} worker")
+        await _wait_for_stop_signal()
+    finally:
+        log.info("Worker '%s' shutting down...", name)
+        if name == "poller":
+            poller.stop_poller()
+        if cex_shards is not None:
+            from .cex import cex_screener
+            await cex_shards.stop()
+            await cex_screener.close_aggregation()
+        if application is not None:
+            await stop_bot(application, name)
+        await bus.stop()
+        if exporter is not None:
+            await exporter.stop()
+        await state_store.close()
+        await poller.close_api()
+        poller.close_history()
+
+async def _start_admin(bus: BusClient):
+    from .bots import admin_bot
+    from .bots.runner import run_bot
+    from .market_stats import poller
+
+    # Event toggles go to the poller worker instead of a local poller.
+    poller.set_remote_control(lambda events: bus.publish(TOPIC_POLLER_CONTROL, events))
+    # Charts are drawn from this worker's copy of the history.
+    poller.load_history()
+    poller.close_history()
+    bus.subscribe(TOPIC_MARKET_SAMPLE, poller.apply_remote_sample)
+    return await run_bot(config.TELEGRAM_BOSS_BOT_TOKEN, admin_bot.setup_admin_bot, "admin")
+
+async def _start_cex(bus: BusClient):
+    global cex_shards
+    from .bots import cex_bot
+    from .bots.runner import run_bot
+    from .cex import cex_screener
+    from .cex.shards import ShardedScreener
+
+    cex_screener.configure_notification_queue(
+        config.CEX_NOTIFICATION_QUEUE_SIZE, config.CEX_NOTIFICATION_OVERFLOW
+    )
+    cex_screener.configure_aggregation(config.CEX_AGGREGATION_WINDOW, config.CEX_DEDUP_SIZE)
+    # CEX events have their own bus inbox, handed over one at a time, so
+    # waiting on a full shard keeps their order without holding up the
+    # Telegram updates topic. The inbox backlog pauses the web workers.
+    cex_shards = ShardedScreener(cex_screener.process_cex_event, shards=config.CEX_SCREENER_SHARDS,
+                                 queue_size=config.CEX_SHARD_QUEUE_SIZE)
+    await cex_shards.start()
+    bus.subscribe(TOPIC_CEX_EVENTS, cex_shards.submit)
+    return await run_bot(config.TELEGRAM_CEX_BOT_TOKEN, cex_bot.setup_cex_bot, "cex")
+
+async def _start_market_stats(bus: BusClient):
+    from .bots import market_stats_bot
+    from .bots.runner import run_bot
+    from .market_stats import poller
+
+    # Read the history once for /marketdata; only the poller worker writes it.
+    poller.load_history()
+    poller.close_history()
+    bus.subscribe(TOPIC_MARKET_SAMPLE, poller.apply_remote_sample)
+
+    async def prune(chat_ids):
+        market_stats_bot._prune_subscribers(chat_ids)
+
+    async def migrate(moves):
+        market_stats_bot._migrate_subscribers({old: new for old, new in moves})
+
+    bus.subscribe(TOPIC_MARKET_UNREACHABLE, prune)
+    bus.subscribe(TOPIC_MARKET_MIGRATED, migrate)
+    market_stats_bot.subscriber_store.on_change = (
+        lambda op, chat_id: bus.publish(TOPIC_MARKET_SUBSCRIBERS, [op, chat_id])
+    )
+    return await run_bot(config.TELEGRAM_MARKET_BOT_TOKEN, market_stats_bot.setup_market_stats_bot,
+                         "market_stats")
+
+async def _start_poller(bus: BusClient):
+    from telegram.ext import Application
+
+    from .bots import market_stats_bot
+    from .market_stats import poller
+    from .storage.state_store import state_store
+
+    poller.configure_change_detection(config.MARKET_CHANGE_THRESHOLDS)
+    poller.load_history()
+
+    # Sends through the MarketStats bot's token; only that worker polls for updates.
+    application = Application.builder().token(config.TELEGRAM_MARKET_BOT_TOKEN).build()
+    await application.initialize()
+    scope = market_stats_bot.subscriber_store.name
+    subscribers = await state_store.load_subscribers(scope)
+    poller.set_notification_bot(
+        application, subscribers,
+        on_unreachable=lambda chat_ids: bus.publish(TOPIC_MARKET_UNREACHABLE, chat_ids),
+        # JSON objects can't have integer keys, so the moves travel as pairs.
+        on_migrated=lambda moves: bus.publish(TOPIC_MARKET_MIGRATED, list(moves.items())),
+    )
+
+    async def apply_subscriber_change(change):
+        op, chat_id = change
+        if op:
+            subscribers.add(chat_id)
+        else:
+            subscribers.discard(chat_id)
+
+    async def apply_control(active_events):
+        poller.set_active_events(active_events)
+
+    bus.subscribe(TOPIC_MARKET_SUBSCRIBERS, apply_subscriber_change)
+    bus.subscribe(TOPIC_POLLER_CONTROL, apply_control)
+    poller.sample_listeners.append(
+        lambda key, payload, timestamp: bus.publish(
+            TOPIC_MARKET_SAMPLE, {"key": key, "payload": payload, "timestamp": timestamp})
+    )
+
+    saved = await state_store.get_settings("market_stats")
+    active_events = [event for event, active in saved.items() if active and event in poller.EVENT_FETCH_MAP]
+    if active_events:
+        poller.set_active_events(active_events)
+    return application
+
+async def run_supervisor():
+    await Supervisor().run()
@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from . import config
+from .logger import get_logger
+
+if TYPE_CHECKING:
+    from telegram.ext import Application
+
+log = get_logger(__name__)
+
+# Telegram sends the secret given to setWebhook back in this header.
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+WEBHOOK_PATH = "/telegram/{bot_name}"
+
+# Bot applications in this process that receive updates through the web server.
+# telegram is imported where it is used, so the supervisor can import this module cheaply.
+_applications: Dict[str, "Application"] = {}
+
+def enabled() -> bool:
+    return bool(config.TELEGRAM_WEBHOOK_URL)
+
+def secret_token(bot_name: str) -> Optional[str]:
+    """
+    A per-bot secret derived from WEBHOOK_SECRET. Telegram only allows
+    [A-Za-z0-9_-] in secret tokens, so the shared secret can't be used as is.
+    """
+    if not config.WEBHOOK_SECRET:
+        return None
+    return hmac.new(config.WEBHOOK_SECRET.encode(), bot_name.encode(), hashlib.sha256).hexdigest()
+
+def check_secret(bot_name: str, received: Optional[str]) -> bool:
+    expected = secret_token(bot_name)
+    return bool(expected and received and hmac.compare_digest(received.encode(), expected.encode()))
+
+def webhook_url(bot_name: str) -> str:
+    return config.TELEGRAM_WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH.format(bot_name=bot_name)
+
+def register(bot_name: str, application: "Application"):
+    _applications[bot_name] = application
+
+def unregister(bot_name: str):
+    _applications.pop(bot_name, None)
+
+def get_application(bot_name: str) -> Optional["Application"]:
+    return _applications.get(bot_name)
+
+async def enqueue_update(application: "Application", data: Dict[str, Any]):
+    """Feeds a raw update from Telegram into the application's update queue."""
+    from telegram import Update
+
+    await application.update_queue.put(Update.de_json(data, application.bot))
+
+async def set_webhook(bot_name: str, application: "Application"):
+    """Points Telegram at this bot's webhook endpoint and routes its updates here."""
+    from telegram import Update
+
+    register(bot_name, application)
+    await application.bot.set_webhook(
+        url=webhook_url(bot_name),
+        secret_token=secret_token(bot_name),
+        allowed_updates=Update.ALL_TYPES,
+    )
+    log.info("Webhook set for bot '%s' at %s.", bot_name, webhook_url(bot_name))
+
+# --- Local Test Harness ---
+_update_ids = itertools.count(int(time.time()))
+
+def make_fake_update(text: str, chat_id: int = 1, user_id: Optional[int] = None,
+                     update_id: Optional[int] = None) -> Dict[str, Any]:
+    """Builds a minimal private-chat message update, as Telegram would post it."""
+    user_id = chat_id if user_id is None else user_id
+    message: Dict[str, Any] = {
+        "message_id": next(_update_ids) % 1_000_000,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+        "text": text,
+    }
+    if text.startswith('/'):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": next(_update_ids) if update_id is None else update_id, "message": message}
+
+async def post_fake_update(base_url: str, bot_name: str, text: str, chat_id: int = 1) -> int:
+    """Posts a fake update to a running server's webhook endpoint. Returns the HTTP status."""
+    import httpx
+
+    url = base_url.rstrip('/') + WEBHOOK_PATH.format(bot_name=bot_name)
+    headers = {SECRET_HEADER: secret_token(bot_name) or ""}
+    async with httpx.AsyncClient() as client:
+        response = await client.post(url, json=make_fake_update(text, chat_id), headers=headers)
+    return response.status_code
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Post fake Telegram updates to a local webhook endpoint.")
+    parser.add_argument("bot", help="Bot name: admin, cex or market_stats.")
+    parser.add_argument("text", help="Message text, e.g. /start.")
+    parser.add_argument("--url", default=None, help="Server base URL (default: http://127.0.0.1:WEBHOOK_PORT).")
+    parser.add_argument("--chat-id", type=int, default=1)
+    parser.add_argument("--count", type=int, default=1, help="How many updates to post.")
+    args = parser.parse_args(argv)
+
+    from pathlib import Path
+    config.load_configuration(Path(__file__).parent.parent / 'config')
+    base_url = args.url or f"http://127.0.0.1:{config.WEBHOOK_PORT}"
+
+    async def run():
+        for _ in range(args.count):
+            status = await post_fake_update(base_url, args.bot, args.text, args.chat_id)
+            print(f"{args.bot} <- {args.text!r}: HTTP {status}")
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
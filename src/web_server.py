@@ -1,14 +1,140 @@
-from fastapi import FastAPI
+import asyncio
+import contextlib
+import hmac
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import Response
+from . import config, metrics
 from .logger import get_logger
+from .cex import cex_screener
+from .cex.ingest import (
+    MAX_BATCH_SIZE, EventIngestor, IngestQueueFull, IngestUnavailable, parse_events, split_valid,
+)
+from .cex.shards import ShardedScreener
+from . import telegram_webhooks
+from .ipc import BUS_ENV, TOPIC_CEX_EVENTS, TOPIC_MARKET_SAMPLE, BusClient, telegram_update_topic
+from .market_stats import poller
 
 log = get_logger(__name__)
 
+# --- CEX Event Ingestion ---
+cex_ingestor: Optional[EventIngestor] = None
+# Runs the screener in this process when there is no CEX bot worker to publish to.
+cex_shards: Optional[ShardedScreener] = None
+# Set when running as a supervisor worker; events then go to the CEX bot worker.
+event_bus: Optional[BusClient] = None
+CONFIG_DIR = Path(__file__).parent.parent / 'config'
+
+async def _process_ingested_event(event: Dict[str, Any]):
+    if event_bus is not None:
+        # Waits while the CEX bot worker has the topic paused, so a backlog
+        # there fills the ingest queue and the endpoint answers 429.
+        await event_bus.publish_wait(TOPIC_CEX_EVENTS, event)
+    else:
+        await cex_shards.submit(event)
+
+async def _join_bus():
+    """
+    Connects a web worker process to the supervisor's IPC bus. Each uvicorn
+    worker is a fresh interpreter, so it loads the configuration itself.
+    """
+    global event_bus
+    config.load_configuration(CONFIG_DIR)
+    event_bus = BusClient(name=f"web-{os.getpid()}")
+    event_bus.subscribe(TOPIC_MARKET_SAMPLE, poller.apply_remote_sample)
+    await event_bus.start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts the ingest workers with the server and stops them on shutdown."""
+    global cex_ingestor, cex_shards, event_bus
+    if os.getenv(BUS_ENV):
+        await _join_bus()
+    lag_monitor = metrics.LoopLagMonitor()
+    lag_monitor.start()
+    if event_bus is None:
+        cex_shards = ShardedScreener(
+            cex_screener.process_cex_event,
+            shards=config.CEX_SCREENER_SHARDS,
+            queue_size=config.CEX_SHARD_QUEUE_SIZE,
+        )
+        await cex_shards.start()
+    # One dispatcher keeps arrival order while it waits on a full shard or a
+    # paused bus topic; the shards do the concurrent work.
+    cex_ingestor = EventIngestor(
+        _process_ingested_event,
+        maxsize=config.CEX_INGEST_QUEUE_SIZE,
+        workers=1,
+    )
+    await cex_ingestor.start()
+    try:
+        yield
+    finally:
+        await cex_ingestor.stop()
+        if cex_shards is not None:
+            await cex_shards.stop()
+            cex_shards = None
+            await cex_screener.close_aggregation()
+        await lag_monitor.stop()
+        if event_bus is not None:
+            await event_bus.stop()
+            event_bus = None
+
 app = FastAPI(
     title="CryptoHawk API",
     description="Backend server for CryptoHawk bots.",
-    version="1.0.0-python"
+    version="1.0.0-python",
+    lifespan=lifespan,
 )
 
+class MetricsMiddleware:
+    """
+    Counts requests and times them per route template. A plain ASGI middleware,
+    so it adds no per-request task or body buffering.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The route template, not the raw path, keeps label cardinality bounded.
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            metrics.http_requests_total.labels(method, endpoint, status).inc()
+            metrics.http_request_duration_seconds.labels(method, endpoint).observe(
+                time.perf_counter() - started)
+
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics for this process.
+    """
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     """
@@ -27,7 +153,13 @@ async def get_api_endpoints():
     return [
         {"path": "/", "description": "Server status"},
         {"path": "/api/endpoints", "description": "List of API endpoints"},
+        {"path": "/metrics", "description": "Prometheus metrics"},
         {"path": "/api/webhooks", "description": "List of connected webhooks"},
+        {"path": "/api/market", "description": "Latest market cap and Fear & Greed data"},
+        {"path": "/api/market/history", "description": "List of recorded market metrics"},
+        {"path": "/api/market/history/{metric}", "description": "History and aggregates for a metric"},
+        {"path": "/api/cex/events", "description": "Authenticated CEX event ingestion (POST)"},
+        {"path": "/telegram/{bot_name}", "description": "Telegram webhook updates (POST)"},
     ]
 
 @app.get("/api/webhooks")
@@ -43,6 +175,157 @@ async def get_webhooks():
         {"bot": "Admin Bot", "status": "connected"},
     ]
 
+@app.get("/api/market")
+async def get_market():
+    """
+    Returns the latest market data from the shared CoinMarketCap cache.
+    Concurrent requests are coalesced into a single upstream call per endpoint.
+    """
+    market_cap, fear_and_greed = await asyncio.gather(
+        poller.cmc_api.get_market_cap(),
+        poller.cmc_api.get_fear_and_greed_index(),
+    )
+    return {"market_cap": market_cap, "fear_and_greed": fear_and_greed}
+
+@app.get("/api/market/history")
+async def get_market_metrics():
+    """
+    Lists the metrics recorded in the poller's time-series store.
+    """
+    return {"metrics": poller.market_data_cache.metrics()}
+
+@app.get("/api/market/history/{metric}")
+async def get_market_history(metric: str, window: float = Query(24 * 3600, gt=0),
+                             resolution: Optional[float] = Query(None, gt=0),
+                             last: Optional[int] = Query(None, ge=1)):
+    """
+    Returns samples for `metric` over the trailing `window` seconds, averaged
+    into `resolution`-second buckets when given, plus window aggregates.
+    """
+    series = poller.market_data_cache.series(metric)
+    if series is None:
+        raise HTTPException(status_code=404, detail=f"Unknown metric '{metric}'")
+
+    if last is not None:
+        samples = series.last(last)
+    else:
+        start = time.time() - window
+        if resolution:
+            samples = series.downsample(resolution, start)
+        else:
+            samples = poller.market_data_cache.range(metric, start)
+    return {
+        "metric": metric,
+        "samples": samples,
+        "aggregate": series.aggregate(window),
+    }
+
+@app.post("/api/cex/events", status_code=202)
+async def ingest_cex_events(request: Request, x_webhook_secret: Optional[str] = Header(None)):
+    """
+    Accepts a single CEX event, a JSON array of events, or NDJSON
+    (`Content-Type: application/x-ndjson`) and queues them for the screener.
+    Responds 429 when the queue cannot take the whole batch.
+    """
+    if not config.WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Event ingestion is not configured.")
+    if not x_webhook_secret or not hmac.compare_digest(
+            x_webhook_secret.encode(), config.WEBHOOK_SECRET.encode()):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret.")
+
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    try:
+        events = parse_events(await request.body(), ndjson=ndjson)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed JSON: {e}")
+    # A batch the queue could never hold would only ever get 429, so refuse it outright.
+    batch_limit = min(MAX_BATCH_SIZE, config.CEX_INGEST_QUEUE_SIZE)
+    if len(events) > batch_limit:
+        raise HTTPException(status_code=413, detail=f"Batches are limited to {batch_limit} events.")
+
+    valid, errors = split_valid(events, cex_screener.EVALUATION_MAP)
+    if cex_ingestor is None:
+        raise HTTPException(status_code=503, detail="Event ingestion is not running.")
+    try:
+        cex_ingestor.offer(valid)
+    except IngestQueueFull:
+        raise HTTPException(status_code=429, detail="Ingest queue is full.", headers={"Retry-After": "1"})
+    except IngestUnavailable:
+        raise HTTPException(status_code=503, detail="Event ingestion is not running.")
+
+    return {"accepted": len(valid), "rejected": errors}
+
+@app.post("/telegram/{bot_name}")
+async def telegram_webhook(bot_name: str, request: Request,
+                           x_telegram_bot_api_secret_token: Optional[str] = Header(None)):
+    """
+    Receives updates for a bot running in webhook mode and hands them to its
+    update queue, or to the bot's worker process in supervisor mode.
+    """
+    if not telegram_webhooks.check_secret(bot_name, x_telegram_bot_api_secret_token):
+        raise HTTPException(status_code=401, detail="Invalid secret token.")
+    try:
+        data = await request.json()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed JSON: {e}")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="An update must be a JSON object.")
+
+    application = telegram_webhooks.get_application(bot_name)
+    if application is not None:
+        await telegram_webhooks.enqueue_update(application, data)
+    elif event_bus is not None:
+        event_bus.publish(telegram_update_topic(bot_name), data)
+    else:
+        raise HTTPException(status_code=404, detail=f"Unknown bot '{bot_name}'")
+    return {"ok": True}
+
+class EmbeddedServer:
+    """
+    Serves the app with uvicorn as a task on the caller's event loop, so the
+    endpoints share the loop with the bots and can touch their state directly.
+    The caller owns signal handling and decides when the server stops.
+    """
+
+    def __init__(self, port: int, host: str = "0.0.0.0"):
+        import uvicorn
+
+        class _Server(uvicorn.Server):
+            @contextlib.contextmanager
+            def capture_signals(self):
+                # Signals belong to the application's own shutdown sequence.
+                yield
+
+        # log_config=None leaves uvicorn's loggers to the application's queued pipeline.
+        self.server = _Server(uvicorn.Config(app, host=host, port=port, lifespan="on", log_config=None))
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def task(self) -> Optional[asyncio.Task]:
+        return self._task
+
+    async def start(self) -> bool:
+        """Starts serving and waits until the server is accepting connections."""
+        log.info("Starting FastAPI server on port %d", self.server.config.port)
+        self._task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            if self._task.done():
+                log.error("FastAPI server failed to start.")
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def stop(self):
+        """Stops accepting requests, finishes in-flight ones and runs the lifespan shutdown."""
+        if self._task is None:
+            return
+        self.server.should_exit = True
+        try:
+            await self._task
+        except (Exception, SystemExit) as e:
+            log.error("FastAPI server stopped with an error: %s", e)
+        self._task = None
+
 def start_server(port: int):
     """
     A function to start the Uvicorn server programmatically.
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+class FakeClock:
+    """A monotonic clock the test moves by setting `now`."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+class FakeBot:
+    """
+    Records what the code under test sends. `errors` maps chat ids to a list
+    of exceptions, raised one per send to that chat before it succeeds.
+    """
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        # (chat_id, text) per delivered message, with its keyword arguments alongside.
+        self.sent = []
+        self.send_kwargs = []
+        self.photos = []
+
+    @property
+    def chat_ids(self):
+        return [chat_id for chat_id, _ in self.sent]
+
+    async def send_message(self, chat_id, text, **kwargs):
+        queued = self.errors.get(chat_id)
+        if queued:
+            raise queued.pop(0)
+        self.sent.append((chat_id, text))
+        self.send_kwargs.append(kwargs)
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        self.photos.append(photo)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id="small"), SimpleNamespace(file_id="large")])
+
+class FakeUpdateQueue:
+    def __init__(self):
+        self.updates = []
+
+    async def put(self, update):
+        self.updates.append(update)
+
+class FakeApplication:
+    """The parts of a telegram.ext.Application the bots' helpers touch."""
+
+    def __init__(self, bot=None):
+        self.bot = bot
+        self.update_queue = FakeUpdateQueue()
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from src.cex import cex_screener
+from src.cex.aggregate import (
+    AGGREGATED, DUPLICATE, EMIT, BurstAggregator, DedupCache, event_fingerprint,
+)
+from src.cex.filters import FilterIndex
+
+WINDOW = 0.05
+
+def event(asset, n, category="all_spot_percent"):
+    return {"category": category, "asset": asset, "n": n}
+
+# --- Tests for deduplication ---
+
+def test_fingerprint_ignores_key_order_only():
+    """
+    Tests that fingerprints match for equal events regardless of key order.
+    """
+    assert event_fingerprint({"a": 1, "b": 2}) == event_fingerprint({"b": 2, "a": 1})
+    assert event_fingerprint({"a": 1, "b": 2}) != event_fingerprint({"a": 1, "b": 3})
+
+def test_dedup_cache_is_bounded_lru():
+    """
+    Tests that the cache remembers recent fingerprints and evicts the least recent.
+    """
+    cache = DedupCache(size=2)
+    assert not cache.seen(b"a")
+    assert not cache.seen(b"b")
+    assert cache.seen(b"a")  # refreshes "a"
+    assert not cache.seen(b"c")  # evicts "b"
+    assert len(cache) == 2
+    assert cache.seen(b"a")
+    assert not cache.seen(b"b")
+
+# --- Tests for BurstAggregator ---
+
+@pytest.mark.asyncio
+async def test_first_event_emits_and_rest_are_summarised():
+    """
+    Tests that one event goes out at once and the rest of the window becomes one burst.
+    """
+    bursts = []
+
+    async def flush(burst):
+        bursts.append(burst)
+
+    aggregator = BurstAggregator(flush, window=WINDOW, dedup_size=100)
+    assert aggregator.add(event("BTC", 0), {1}) == EMIT
+    assert aggregator.add(event("BTC", 0), {1}) == DUPLICATE
+    assert aggregator.add(event("BTC", 1), {1}) == AGGREGATED
+    assert aggregator.add(event("BTC", 2), {2}) == AGGREGATED
+    # Another symbol has its own window.
+    assert aggregator.add(event("ETH", 0), {1}) == EMIT
+
+    await asyncio.sleep(WINDOW * 3)
+    assert len(bursts) == 1
+    burst = bursts[0]
+    assert (burst.category, burst.symbol, burst.count) == ("all_spot_percent", "BTC", 2)
+    assert burst.last_event["n"] == 2
+    assert burst.recipients == {1, 2}
+
+    # The window stays open after a summary, then closes once the key is quiet.
+    assert aggregator.add(event("BTC", 3), {1}) == EMIT
+    await aggregator.close()
+
+@pytest.mark.asyncio
+async def test_close_flushes_open_bursts():
+    """
+    Tests that closing emits held events without waiting for the window.
+    """
+    bursts = []
+
+    async def flush(burst):
+        bursts.append(burst)
+
+    aggregator = BurstAggregator(flush, window=60, dedup_size=0)
+    aggregator.add(event("BTC", 0))
+    aggregator.add(event("BTC", 0))
+    assert aggregator.add(event("BTC", 0)) == AGGREGATED
+    await aggregator.close()
+    assert [burst.count for burst in bursts] == [2]
+    assert bursts[0].recipients == set()
+
+@pytest.mark.asyncio
+async def test_zero_window_only_deduplicates():
+    """
+    Tests that with no window every distinct event is emitted.
+    """
+    async def flush(burst):
+        raise AssertionError("nothing should be held")
+
+    aggregator = BurstAggregator(flush, window=0, dedup_size=10)
+    assert [aggregator.add(event("BTC", n)) for n in (0, 1, 1)] == [EMIT, EMIT, DUPLICATE]
+
+# --- Tests for the screener stage ---
+
+@pytest.mark.asyncio
+async def test_screener_rolls_up_bursts(monkeypatch):
+    """
+    Tests that a burst for one pair yields one message plus one summary per subscriber.
+    """
+    index = FilterIndex()
+    index.update(10, {'all_spot_percent': {'active': True}})
+    monkeypatch.setattr(cex_screener, 'filter_index', index)
+    monkeypatch.setattr(cex_screener, 'event_aggregator', None)
+    cex_screener.configure_aggregation(WINDOW, 100)
+
+    while not cex_screener.notification_queue.empty():
+        cex_screener.notification_queue.get_nowait()
+
+    for n in range(50):
+        await cex_screener.process_cex_event(event("BTC", n % 10))
+    assert cex_screener.notification_queue.qsize() == 1
+
+    await asyncio.sleep(WINDOW * 3)
+    await cex_screener.close_aggregation()
+    items = [cex_screener.notification_queue.get_nowait()
+             for _ in range(cex_screener.notification_queue.qsize())]
+    assert len(items) == 2
+    chat_id, summary = items[1]
+    assert chat_id == 10
+    assert summary.startswith("🔁 9 more all_spot_percent events for #BTC")
+
+def test_configure_aggregation_can_disable(monkeypatch):
+    """
+    Tests that zero for both settings turns the stage off.
+    """
+    monkeypatch.setattr(cex_screener, 'event_aggregator', None)
+    cex_screener.configure_aggregation(0, 0)
+    assert cex_screener.event_aggregator is None
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from src.api.cache import AsyncTTLCache
+
+def counting_fetcher(result="fresh", delay=0.0):
+    """Returns a fetcher that counts its calls."""
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        if delay:
+            await asyncio.sleep(delay)
+        return f"{result}-{len(calls)}"
+
+    fetch.calls = calls
+    return fetch
+
+# --- Tests for AsyncTTLCache ---
+
+@pytest.mark.asyncio
+async def test_hit_within_ttl(clock):
+    """
+    Tests that a fresh entry is served without calling the fetcher again.
+    """
+    cache = AsyncTTLCache(clock=clock)
+    fetch = counting_fetcher()
+
+    assert await cache.get_or_fetch("k", fetch, ttl=10) == "fresh-1"
+    clock.now = 5
+    assert await cache.get_or_fetch("k", fetch, ttl=10) == "fresh-1"
+    assert len(fetch.calls) == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_are_coalesced(clock):
+    """
+    Tests that concurrent callers share a single in-flight fetch.
+    """
+    cache = AsyncTTLCache(clock=clock)
+    fetch = counting_fetcher(delay=0.05)
+
+    results = await asyncio.gather(*(cache.get_or_fetch("k", fetch, ttl=10) for _ in range(20)))
+
+    assert results == ["fresh-1"] * 20
+    assert len(fetch.calls) == 1
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(clock):
+    """
+    Tests that a stale entry is returned at once while one refresh runs in the background.
+    """
+    cache = AsyncTTLCache(clock=clock)
+    fetch = counting_fetcher(delay=0.05)
+    await cache.get_or_fetch("k", fetch, ttl=10, stale_ttl=60)
+
+    clock.now = 30
+    assert await cache.get_or_fetch("k", fetch, ttl=10, stale_ttl=60) == "fresh-1"
+    assert await cache.get_or_fetch("k", fetch, ttl=10, stale_ttl=60) == "fresh-1"
+
+    await asyncio.sleep(0.1)
+    assert len(fetch.calls) == 2
+    assert await cache.get_or_fetch("k", fetch, ttl=10, stale_ttl=60) == "fresh-2"
+
+@pytest.mark.asyncio
+async def test_disallow_stale_waits_for_refresh(clock):
+    """
+    Tests that allow_stale=False revalidates before returning.
+    """
+    cache = AsyncTTLCache(clock=clock)
+    fetch = counting_fetcher()
+    await cache.get_or_fetch("k", fetch, ttl=10, stale_ttl=60)
+
+    clock.now = 30
+    assert await cache.get_or_fetch("k", fetch, ttl=10, stale_ttl=60, allow_stale=False) == "fresh-2"
+
+@pytest.mark.asyncio
+async def test_failed_fetch_keeps_previous_value(clock):
+    """
+    Tests that a failing refresh does not evict the cached value.
+    """
+    cache = AsyncTTLCache(clock=clock)
+
+    async def ok():
+        return "good"
+
+    async def broken():
+        raise RuntimeError("upstream down")
+
+    await cache.get_or_fetch("k", ok, ttl=10)
+    clock.now = 30
+    assert await cache.get_or_fetch("k", broken, ttl=10) is None
+    assert cache.peek("k").value == "good"
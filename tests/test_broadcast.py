@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, ChatMigrated, Conflict, Forbidden, NetworkError
+
+from src.market_stats import poller
+from src.notifications.broadcast import BroadcastScheduler
+from tests.fakes import FakeApplication, FakeBot
+
+# --- Tests for BroadcastScheduler ---
+
+@pytest.mark.asyncio
+async def test_broadcast_is_paced_by_rate():
+    """
+    Tests that sends beyond the first wave wait for the bucket to refill.
+    """
+    bot = FakeBot()
+    scheduler = BroadcastScheduler(bot, rate=100)
+    loop = asyncio.get_running_loop()
+
+    started = loop.time()
+    result = await scheduler.broadcast(range(150), "hello")
+    elapsed = loop.time() - started
+
+    assert result.sent == 150
+    assert sorted(bot.chat_ids) == list(range(150))
+    assert elapsed >= 0.45
+    assert scheduler.estimate_duration(150) == pytest.approx(1.5)
+
+@pytest.mark.asyncio
+async def test_unreachable_chats_are_reported():
+    """
+    Tests that blocked and deleted chats are reported, but other rejections are not.
+    """
+    bot = FakeBot(errors={
+        1: [Forbidden("bot was blocked by the user")],
+        2: [BadRequest("Chat not found")],
+        3: [BadRequest("Message is too long")],
+    })
+    scheduler = BroadcastScheduler(bot, rate=100)
+
+    result = await scheduler.broadcast([1, 2, 3, 4], "hello")
+
+    assert bot.chat_ids == [4]
+    assert sorted(result.failed) == [1, 2, 3]
+    assert sorted(result.unreachable) == [1, 2]
+
+@pytest.mark.asyncio
+async def test_repeated_failures_mark_chat_unreachable():
+    """
+    Tests that a chat failing several broadcasts in a row is eventually reported.
+    """
+    bot = FakeBot(errors={1: [NetworkError("boom")] * 10})
+    scheduler = BroadcastScheduler(bot, rate=100, max_retries=0, max_failures=2)
+
+    first = await scheduler.broadcast([1], "a")
+    second = await scheduler.broadcast([1], "b")
+
+    assert first.unreachable == []
+    assert second.unreachable == [1]
+
+@pytest.mark.asyncio
+async def test_other_telegram_errors_do_not_abort_broadcast():
+    """
+    Tests that any TelegramError fails only its chat and migrated groups are followed.
+    """
+    bot = FakeBot(errors={1: [Conflict("terminated by other request")], 2: [ChatMigrated(-200)]})
+    scheduler = BroadcastScheduler(bot, rate=2, max_retries=0)
+
+    result = await scheduler.broadcast([1, 2, 3, 4], "hello")
+
+    assert sorted(bot.chat_ids) == [-200, 3, 4]
+    assert list(result.failed) == [1]
+    assert result.migrated == {2: -200}
+    assert result.sent == 3
+
+# --- Tests for poller fan-out ---
+
+@pytest.mark.asyncio
+async def test_poller_prunes_unreachable_subscribers(monkeypatch):
+    """
+    Tests that the poller broadcasts to a snapshot and prunes blocked chats.
+    """
+    pruned = []
+    subscribers = {1, 2, 3}
+    bot = FakeBot(errors={2: [Forbidden("bot was blocked by the user")]})
+    for name in ("_notification_bot_app", "_broadcaster", "_on_unreachable", "_on_migrated"):
+        monkeypatch.setattr(poller, name, None)
+    monkeypatch.setattr(poller, "_subscribers", set())
+    poller.set_notification_bot(FakeApplication(bot), subscribers, on_unreachable=pruned.append)
+
+    await poller._send_notifications("cmc_fear_greed", {"value": 50, "value_classification": "Neutral"})
+
+    assert sorted(bot.chat_ids) == [1, 3]
+    assert pruned == [[2]]
+
+@pytest.mark.asyncio
+async def test_poller_coalesces_broadcasts_per_event(monkeypatch):
+    """
+    Tests that samples arriving mid-broadcast collapse into one follow-up with the newest value.
+    """
+    release = asyncio.Event()
+    sent = []
+
+    async def send(event_name, data):
+        sent.append(data["value"])
+        await release.wait()
+
+    monkeypatch.setattr(poller, "_send_notifications", send)
+    monkeypatch.setattr(poller, "_broadcast_tasks", {})
+    monkeypatch.setattr(poller, "_pending_broadcasts", {})
+
+    for value in (1, 2, 3, 4):
+        poller._notify("cmc_fear_greed", {"value": value})
+        await asyncio.sleep(0)
+    assert sent == [1]
+    release.set()
+    await poller._broadcast_tasks["cmc_fear_greed"]
+
+    assert sent == [1, 4]
+
+@pytest.mark.asyncio
+async def test_poller_broadcast_renders_once(monkeypatch):
+    """
+    Tests that a broadcast renders one payload for every recipient.
+    """
+    rendered = []
+
+    def render(event_name, data):
+        rendered.append(event_name)
+        return f"{event_name}:{data['value']}"
+
+    bot = FakeBot()
+    monkeypatch.setattr(poller, "_notification_bot_app", FakeApplication(bot))
+    monkeypatch.setattr(poller, "_broadcaster", BroadcastScheduler(bot, rate=1000))
+    monkeypatch.setattr(poller, "_subscribers", set(range(50)))
+    monkeypatch.setattr(poller, "_format_notification", render)
+
+    await poller._send_notifications("cmc_fear_greed", {"value": 40})
+
+    assert len(bot.sent) == 50
+    assert rendered == ["cmc_fear_greed"]
+    assert {text for _, text in bot.sent} == {"cmc_fear_greed:40"}
+    assert bot.send_kwargs[0] == {"parse_mode": "Markdown"}
@@ -1,4 +1,5 @@
 import pytest
+from src import config
 from src.cex import cex_screener
 
 # --- Test Data ---
@@ -53,22 +54,57 @@ def test_apply_template_no_template_obj():
     assert '"event": "test"' in result
     assert '"data": 123' in result
 
+def test_apply_template_repeated_and_unknown_placeholders():
+    """
+    Tests that repeated placeholders are all filled and unlisted ones stay verbatim.
+    """
+    template = {
+        "title": "{{asset}} alert",
+        "message": "{{asset}} moved {{volume}} {{not_a_param}} {literal}",
+        "parameters": ["asset", "volume"]
+    }
+    result = cex_screener.apply_template(template, {"asset": "SOL", "volume": 5})
+    assert result == "SOL alert\n\nSOL moved 5 {{not_a_param}} {literal}"
+
+def test_apply_template_does_not_rescan_values(sample_template):
+    """
+    Tests that placeholder text inside a value is emitted as-is.
+    """
+    data = {"event": "Dump", "asset": "{{volume}}", "volume": 3.5}
+    result = cex_screener.apply_template(sample_template, data)
+    assert result == "Test Alert: Dump\n\nAsset: {{volume}}, Volume: 3.5"
+
+def test_shipped_templates_are_loaded():
+    """
+    Tests that templates.json parses and every template is precompiled.
+    """
+    templates = cex_screener.load_templates()
+    assert set(templates) == set(cex_screener.EVALUATION_MAP)
+    for template in cex_screener.TEMPLATES.values():
+        assert cex_screener.get_compiled_template(template).params
+
 # --- Tests for Filtering Logic ---
 
-def test_evaluate_generic():
+def test_evaluate_category():
     """
-    Tests the generic filter function.
+    Tests the filter function shared by every category.
     """
-    assert cex_screener.evaluate_generic({}, {"active": True}) == True
-    assert cex_screener.evaluate_generic({}, {"active": False}) == False
-    assert cex_screener.evaluate_generic({}, {}) == False # Should be inactive by default
+    assert cex_screener.evaluate_category({}, {"active": True}) == True
+    assert cex_screener.evaluate_category({}, {"active": False}) == False
+    assert cex_screener.evaluate_category({}, {}) == False # Should be inactive by default
 
-def test_evaluate_flow_alerts():
+def test_evaluate_category_applies_coin_filters_like_the_index():
     """
-    Tests the placeholder filter for flow alerts.
+    Tests that a single filter set and the subscriber index agree on coin filters.
     """
-    assert cex_screener.evaluate_flow_alerts({}, {"active": True}) == True
-    assert cex_screener.evaluate_flow_alerts({}, {"active": False}) == False
+    from src.cex.filters import FilterIndex
+
+    settings = {'active': True, 'unwanted_coins': ['ETH']}
+    index = FilterIndex()
+    index.update(10, {'all_spot': settings})
+    for asset in ('ETH', 'BTC'):
+        event = {'category': 'all_spot', 'asset': asset}
+        assert cex_screener.evaluate_category(event, settings) == (10 in index.match(event))
 
 # --- Tests for process_cex_event (Async) ---
 
@@ -103,14 +139,15 @@ async def test_process_cex_event_puts_on_queue(monkeypatch):
     while not cex_screener.notification_queue.empty():
         cex_screener.notification_queue.get_nowait()
 
+    monkeypatch.setattr(config, 'TARGET_CHAT_ID', 99)
     await cex_screener.process_cex_event(event_data, user_filters)
 
-    # Check if the message is on the queue
+    # Check if the message is on the queue, addressed to the target chat
     assert not cex_screener.notification_queue.empty()
     notification = await cex_screener.notification_queue.get()
 
     expected_message = "Title\n\nMessage for ETH"
-    assert notification == expected_message
+    assert notification == (99, expected_message)
 
 
 @pytest.mark.asyncio
@@ -119,7 +156,7 @@ async def test_process_cex_event_filtered_out(monkeypatch):
     Tests that a filtered event does not put a message on the queue.
     """
     # Mock the evaluation map to use a simple filter
-    monkeypatch.setitem(cex_screener.EVALUATION_MAP, 'test_category', cex_screener.evaluate_generic)
+    monkeypatch.setitem(cex_screener.EVALUATION_MAP, 'test_category', cex_screener.evaluate_category)
 
     user_filters = {
         'test_category': {'active': False} # Event is inactive
@@ -139,3 +176,77 @@ async def test_process_cex_event_filtered_out(monkeypatch):
 
     # Check that the queue is still empty
     assert cex_screener.notification_queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_process_cex_event_fans_out_to_subscribers(monkeypatch):
+    """
+    Tests that without explicit filters the event goes to every matching subscriber.
+    """
+    from src.cex.filters import FilterIndex
+
+    index = FilterIndex()
+    index.update(10, {'all_spot': {'active': True}})
+    index.update(20, {'all_spot': {'active': True, 'unwanted_coins': ['ETH']}})
+    monkeypatch.setattr(cex_screener, 'filter_index', index)
+
+    while not cex_screener.notification_queue.empty():
+        cex_screener.notification_queue.get_nowait()
+
+    await cex_screener.process_cex_event({'category': 'all_spot', 'asset': 'ETH'})
+
+    assert cex_screener.notification_queue.qsize() == 1
+    chat_id, message = cex_screener.notification_queue.get_nowait()
+    assert chat_id == 10
+    assert message.startswith("All Spot")
+
+
+@pytest.mark.asyncio
+async def test_per_chat_aggregation_is_kept_per_chat(monkeypatch):
+    """
+    Tests that the same event evaluated separately for two chats reaches both, and repeats per chat are dropped.
+    """
+    from src.cex.aggregate import BurstAggregator
+
+    async def flush(burst):
+        pass
+
+    monkeypatch.setattr(cex_screener, 'event_aggregator', BurstAggregator(flush, window=60.0))
+    monkeypatch.setitem(cex_screener.EVALUATION_MAP, 'test_category', lambda data, settings: True)
+    monkeypatch.setattr(cex_screener, 'TEMPLATES', {
+        'test_category': {"title": "Title", "message": "{{asset}}", "parameters": ["asset"]}
+    })
+    while not cex_screener.notification_queue.empty():
+        cex_screener.notification_queue.get_nowait()
+
+    event_data = {'category': 'test_category', 'asset': 'ETH'}
+    user_filters = {'test_category': {'active': True}}
+    for chat_id in (1, 2, 1):
+        await cex_screener.process_cex_event(dict(event_data), user_filters, chat_id=chat_id)
+
+    queued = [cex_screener.notification_queue.get_nowait()
+              for _ in range(cex_screener.notification_queue.qsize())]
+    assert queued == [(1, "Title\n\nETH"), (2, "Title\n\nETH")]
+    await cex_screener.event_aggregator.close()
+
+
+@pytest.mark.asyncio
+async def test_notification_queue_overflow_policies(monkeypatch):
+    """
+    Tests that a full queue evicts the oldest item or drops the new one.
+    """
+    monkeypatch.setattr(cex_screener, 'notification_queue', cex_screener.notification_queue)
+    monkeypatch.setattr(cex_screener, 'notification_overflow_policy', 'drop_oldest')
+
+    cex_screener.configure_notification_queue(2, 'drop_oldest')
+    for item in ("a", "b", "c"):
+        await cex_screener.enqueue_notification(item)
+    assert [cex_screener.notification_queue.get_nowait() for _ in range(2)] == ["b", "c"]
+
+    cex_screener.configure_notification_queue(2, 'drop_newest')
+    for item in ("a", "b", "c"):
+        await cex_screener.enqueue_notification(item)
+    assert [cex_screener.notification_queue.get_nowait() for _ in range(2)] == ["a", "b"]
+
+    with pytest.raises(ValueError):
+        cex_screener.configure_notification_queue(2, 'spill_to_disk')
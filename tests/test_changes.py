@@ -0,0 +1,89 @@
+import pytest
+
+from src.market_stats import poller
+from src.market_stats.changes import ChangeDetector, Threshold, parse_thresholds
+from src.market_stats.timeseries import TimeSeriesStore
+
+# --- Tests for Threshold ---
+
+def test_absolute_and_percent_thresholds():
+    """
+    Tests that either limit is enough to count as a change.
+    """
+    threshold = Threshold(absolute=5, percent=10)
+    assert not threshold.crossed(50, 54, 0)
+    assert threshold.crossed(50, 55, 0)
+    assert Threshold(percent=1).crossed(1000, 990, 0)
+    assert not Threshold(percent=1).crossed(1000, 995, 0)
+
+def test_reversal_needs_larger_move():
+    """
+    Tests that moving back against the last direction is damped by the hysteresis.
+    """
+    threshold = Threshold(absolute=4, hysteresis=0.5)
+    assert threshold.crossed(50, 46, 0)
+    assert not threshold.crossed(50, 46, 1)
+    assert threshold.crossed(50, 44, 1)
+
+def test_parse_thresholds():
+    """
+    Tests that thresholds are read from plain settings.
+    """
+    parsed = parse_thresholds({"fear_and_greed": {"value": {"absolute": "3", "hysteresis": 0}}})
+    assert parsed == {"fear_and_greed": {"value": Threshold(absolute=3.0, hysteresis=0.0)}}
+
+# --- Tests for ChangeDetector ---
+
+def test_detector_flags_first_sample_and_significant_moves():
+    """
+    Tests that only the first sample and threshold crossings are reported.
+    """
+    detector = ChangeDetector({"fear_and_greed": {"value": Threshold(absolute=5)}})
+    assert [change.field for change in detector.detect("fear_and_greed", {"value": 50})] == ["value"]
+    assert detector.detect("fear_and_greed", {"value": 53}) == []
+    # Small steps accumulate against the last delivered baseline.
+    changes = detector.detect("fear_and_greed", {"value": 56})
+    assert changes[0].previous == 50 and changes[0].current == 56
+
+def test_detector_does_not_flap():
+    """
+    Tests that a value wobbling across the threshold notifies only once.
+    """
+    detector = ChangeDetector({"fear_and_greed": {"value": Threshold(absolute=5, hysteresis=0.5)}})
+    detector.seed("fear_and_greed", {"value": 50})
+    notified = [bool(detector.detect("fear_and_greed", {"value": value}))
+                for value in (55, 50, 55, 50, 55)]
+    assert notified == [True, False, False, False, False]
+
+# --- Tests for poller integration ---
+
+@pytest.mark.asyncio
+async def test_poller_skips_unchanged_samples(monkeypatch):
+    """
+    Tests that repeated identical fetches notify subscribers only once.
+    """
+    notified = []
+
+    async def fake_fetch(allow_stale=True):
+        return {"value": 40, "value_classification": "Fear"}
+
+    monkeypatch.setattr(poller, "change_detector", ChangeDetector())
+    monkeypatch.setattr(poller, "market_data_cache", TimeSeriesStore())
+    monkeypatch.setattr(poller.cmc_api, "get_fear_and_greed_index", fake_fetch)
+    monkeypatch.setattr(poller, "_notify", lambda event, data: notified.append(event))
+
+    for _ in range(3):
+        await poller._fetch_fear_and_greed()
+
+    assert notified == ["cmc_fear_greed"]
+
+def test_configured_thresholds_merge_per_field(monkeypatch):
+    """
+    Tests that overriding one field of a key keeps the defaults for its other fields.
+    """
+    monkeypatch.setattr(poller, "change_detector", ChangeDetector())
+    poller.configure_change_detection({"market_cap": {"btc_dominance": {"absolute": 1}}})
+    thresholds = poller.change_detector.thresholds["market_cap"]
+    assert thresholds["btc_dominance"] == Threshold(absolute=1)
+    assert thresholds["total_market_cap"] == Threshold(percent=1.0)
+    assert "value" in poller.change_detector.thresholds["fear_and_greed"]
@@ -0,0 +1,122 @@
+import asyncio
+import time
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from src.charts import render
+from src.charts.service import ChartService, parse_window
+from src.market_stats.timeseries import TimeSeriesStore
+from tests.fakes import FakeBot
+
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+ROOT = Path(__file__).parent.parent
+
+def make_store(now, count=120, step=60):
+    store = TimeSeriesStore()
+    for i in range(count):
+        store.record("fear_and_greed", {"value": 40 + i % 7}, now - (count - i) * step)
+    return store
+
+# --- Tests for rendering ---
+
+def test_to_candles_groups_ohlc():
+    """
+    Tests that samples are grouped into open/high/low/close per bucket.
+    """
+    samples = [(0, 5), (10, 9), (20, 3), (30, 4), (60, 7), (90, 6)]
+    assert render.to_candles(samples, 60) == [(0, 5, 9, 3, 4), (60, 7, 7, 6, 6)]
+
+def test_downsample_averages_buckets():
+    """
+    Tests that line chart samples are averaged per bucket.
+    """
+    assert render.downsample([(0, 1), (30, 3), (60, 5)], 60) == [(0, 2), (60, 5)]
+
+def test_renderers_produce_png():
+    """
+    Tests that both chart kinds render to PNG bytes.
+    """
+    samples = [(1_700_000_000 + i * 60, float(i % 5)) for i in range(100)]
+    assert render.render_line("line", samples, 300).startswith(PNG_MAGIC)
+    assert render.render_candles("candle", samples, 600).startswith(PNG_MAGIC)
+
+def test_importing_the_bots_does_not_import_matplotlib():
+    """
+    Tests that matplotlib is only imported when a chart is first rendered.
+    """
+    code = ("import sys, src.bots.admin_bot, src.bots.market_stats_bot; "
+            "sys.exit('matplotlib' in sys.modules)")
+    assert subprocess.run([sys.executable, "-c", code], cwd=ROOT).returncode == 0
+
+# --- Tests for ChartService ---
+
+def test_parse_window():
+    """
+    Tests the accepted window formats.
+    """
+    assert parse_window("30m") == 1800
+    assert parse_window("24h") == 86400
+    assert parse_window("7d") == 7 * 86400
+    assert parse_window("soon") is None
+
+@pytest.mark.asyncio
+async def test_charts_are_cached_per_data_version():
+    """
+    Tests that a chart is rendered once per data version and concurrent requests share it.
+    """
+    store = make_store(time.time())
+    service = ChartService(store, executor=ThreadPoolExecutor(1))
+    first, second = await asyncio.gather(
+        service.get("fear_and_greed.value"), service.get("fear_and_greed.value"))
+    assert first is second and first.png.startswith(PNG_MAGIC)
+    assert service.renders == 1
+
+    assert await service.get("fear_and_greed.value") is first
+    await service.get("fear_and_greed.value", kind="candle")
+    assert service.renders == 2
+
+    # Samples for other metrics leave the chart cached.
+    store.record("market_cap", {"total_market_cap": 2.5e12})
+    assert await service.get("fear_and_greed.value") is first
+
+    store.record("fear_and_greed", {"value": 50})
+    assert await service.get("fear_and_greed.value") is not first
+    assert service.renders == 3
+    assert await service.get("market_cap.btc_dominance") is None
+
+@pytest.mark.asyncio
+async def test_resend_reuses_file_id():
+    """
+    Tests that a chart is uploaded once and then sent by its Telegram file_id.
+    """
+    service = ChartService(make_store(time.time()), executor=ThreadPoolExecutor(1))
+    bot = FakeBot()
+    chart = await service.get("fear_and_greed.value")
+    await service.send(bot, 1, chart)
+    await service.send(bot, 2, chart)
+    assert bot.photos == [chart.png, "large"]
+
+@pytest.mark.asyncio
+async def test_renders_in_process_pool():
+    """
+    Tests rendering through the default spawned process pool.
+    """
+    service = ChartService(make_store(time.time()))
+    try:
+        chart = await service.get("fear_and_greed.value", kind="candle")
+    finally:
+        service.close()
+    assert chart.png.startswith(PNG_MAGIC)
+
+def test_resolve_metric_by_field():
+    """
+    Tests that metrics can be named by their field alone.
+    """
+    service = ChartService(make_store(0, count=2))
+    assert service.resolve_metric("value") == "fear_and_greed.value"
+    assert service.resolve_metric("fear_and_greed.value") == "fear_and_greed.value"
+    assert service.resolve_metric("nope") is None
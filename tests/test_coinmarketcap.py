@@ -0,0 +1,70 @@
+import httpx
+import pytest
+from src.api.coinmarketcap import CoinMarketCapAPI
+
+# --- Test Data ---
+
+@pytest.fixture
+def mock_transport():
+    """A transport that answers both upstreams and records every request."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.host == "api.alternative.me":
+            return httpx.Response(200, json={"data": [{"value": "55", "value_classification": "Greed"}]})
+        return httpx.Response(200, json={"data": {"quote": {"USD": {"total_market_cap": 1.5e12}}}})
+
+    transport = httpx.MockTransport(handler)
+    transport.requests = requests
+    return transport
+
+# --- Tests for the pooled client ---
+
+@pytest.mark.asyncio
+async def test_client_is_reused_per_host(mock_transport):
+    """
+    Tests that repeated calls share one client per upstream host.
+    """
+    api = CoinMarketCapAPI(api_key="test-key", transport=mock_transport)
+    try:
+        await api.get_market_cap()
+        first_client = api._get_client("https://pro-api.coinmarketcap.com")
+        await api.get_market_cap()
+        await api.get_fear_and_greed_index()
+
+        assert api._get_client("https://pro-api.coinmarketcap.com") is first_client
+        assert len(api._clients) == 2
+        assert len(mock_transport.requests) == 3
+        assert mock_transport.requests[0].headers["X-CMC_PRO_API_KEY"] == "test-key"
+    finally:
+        await api.close()
+
+@pytest.mark.asyncio
+async def test_close_releases_clients(mock_transport):
+    """
+    Tests that close() shuts every pooled client and a later call reopens one.
+    """
+    api = CoinMarketCapAPI(api_key="test-key", transport=mock_transport)
+    await api.get_market_cap()
+    client = api._get_client("https://pro-api.coinmarketcap.com")
+
+    await api.close()
+    assert client.is_closed
+    assert api._clients == {}
+
+    assert await api.get_market_cap() == {"total_market_cap": 1.5e12}
+    await api.close()
+
+@pytest.mark.asyncio
+async def test_missing_api_key_returns_none(mock_transport, monkeypatch):
+    """
+    Tests that a CMC request without a key is skipped instead of sent.
+    """
+    from src import config
+    monkeypatch.setattr(config, "COINMARKETCAP_API_KEY", None)
+
+    api = CoinMarketCapAPI(transport=mock_transport)
+    assert await api.get_market_cap() is None
+    assert mock_transport.requests == []
+    await api.close()
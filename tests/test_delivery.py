@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+from telegram.error import Forbidden, RetryAfter
+
+from src.notifications.delivery import DeliveryPool
+from src.notifications.rate_limit import TokenBucket
+from tests.fakes import FakeBot
+
+async def drain(pool: DeliveryPool, queue: asyncio.Queue, predicate, timeout=2.0):
+    await pool.start()
+    try:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not predicate():
+            assert asyncio.get_running_loop().time() < deadline, "delivery did not finish"
+            await asyncio.sleep(0.01)
+    finally:
+        await pool.stop()
+
+# --- Tests for TokenBucket ---
+
+def test_token_bucket_refills_over_time(clock):
+    """
+    Tests that tokens are consumed up to capacity and refilled at the rate.
+    """
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.try_acquire() == 0
+
+def test_token_bucket_pause(clock):
+    """
+    Tests that a pause withholds tokens until it expires.
+    """
+    bucket = TokenBucket(rate=10, capacity=10, clock=clock)
+    bucket.pause(3)
+    assert bucket.try_acquire() == pytest.approx(3)
+    clock.now = 3.2
+    assert bucket.try_acquire() == 0
+
+# --- Tests for DeliveryPool ---
+
+@pytest.mark.asyncio
+async def test_messages_for_a_chat_are_merged():
+    """
+    Tests that queued messages for the same chat go out as one Telegram message.
+    """
+    queue = asyncio.Queue()
+    for i in range(3):
+        queue.put_nowait((1, f"alert {i}"))
+    queue.put_nowait((99, "channel alert"))
+    bot = FakeBot()
+    pool = DeliveryPool(bot, queue, workers=2)
+
+    await drain(pool, queue, lambda: len(bot.sent) == 2)
+
+    assert sorted(bot.sent) == [(1, "alert 0\n\nalert 1\n\nalert 2"), (99, "channel alert")]
+    assert pool.stats["merged"] == 2
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honoured():
+    """
+    Tests that a flood-control error is retried after the requested delay.
+    """
+    queue = asyncio.Queue()
+    queue.put_nowait((1, "hello"))
+    bot = FakeBot(errors={1: [RetryAfter(0)]})
+    pool = DeliveryPool(bot, queue)
+
+    await drain(pool, queue, lambda: bot.sent)
+
+    assert bot.sent == [(1, "hello")]
+    assert pool.stats["retried"] == 1
+
+@pytest.mark.asyncio
+async def test_blocked_chat_is_reported():
+    """
+    Tests that a chat that blocked the bot is dropped and reported.
+    """
+    blocked = []
+    queue = asyncio.Queue()
+    queue.put_nowait((1, "hello"))
+    queue.put_nowait((2, "hello"))
+    bot = FakeBot(errors={1: [Forbidden("bot was blocked by the user")]})
+    pool = DeliveryPool(bot, queue, on_blocked=blocked.append)
+
+    await drain(pool, queue, lambda: bot.sent and blocked)
+
+    assert blocked == [1]
+    assert bot.sent == [(2, "hello")]
+
+@pytest.mark.asyncio
+async def test_pending_per_chat_is_bounded():
+    """
+    Tests that a chat's backlog keeps only the newest messages.
+    """
+    queue = asyncio.Queue()
+    for i in range(10):
+        queue.put_nowait((1, f"m{i}"))
+    bot = FakeBot()
+    pool = DeliveryPool(bot, queue, max_pending_per_chat=3, workers=1)
+    # Stop the worker from sending until the whole backlog is collected.
+    pool._last_sent[1] = asyncio.get_running_loop().time() + 0.2
+
+    await drain(pool, queue, lambda: bot.sent)
+
+    assert bot.sent == [(1, "m7\n\nm8\n\nm9")]
+    assert pool.stats["dropped"] == 7
+
+@pytest.mark.asyncio
+async def test_buffered_total_is_bounded():
+    """
+    Tests that the pool leaves the backlog in the queue once it holds its limit, across all chats.
+    """
+    queue = asyncio.Queue()
+    for i in range(10):
+        queue.put_nowait((i, f"m{i}"))
+    bot = FakeBot()
+    pool = DeliveryPool(bot, queue, max_buffered=3, workers=1)
+    now = asyncio.get_running_loop().time()
+    for chat_id in range(10):
+        pool._last_sent[chat_id] = now + 0.2
+
+    await pool.start()
+    await asyncio.sleep(0.05)
+    assert not bot.sent
+    assert queue.qsize() == 7
+
+    await drain(pool, queue, lambda: len(bot.sent) == 10)
+    assert sorted(bot.sent) == [(i, f"m{i}") for i in range(10)]
@@ -0,0 +1,70 @@
+import pytest
+from src.cex.filters import CategoryRule, FilterIndex, compile_user_filter
+
+# --- Test Data ---
+
+@pytest.fixture
+def index():
+    index = FilterIndex()
+    index.update(1, {"flow_alerts": {"active": True}})
+    index.update(2, {"flow_alerts": {"active": True, "favorite_coins": ["btc", "ETH"]}})
+    index.update(3, {"flow_alerts": {"active": True, "unwanted_coins": ["DOGE"]}})
+    index.update(4, {"flow_alerts": {"active": True, "min_volume_usd": 1_000_000}})
+    index.update(5, {"flow_alerts": {"active": False}, "all_spot": {"active": True}})
+    return index
+
+# --- Tests for CategoryRule ---
+
+def test_category_rule_matches():
+    """
+    Tests favorites, blocked coins and the volume range of a single rule.
+    """
+    rule = CategoryRule.from_settings({
+        "favorite_coins": ["BTC", "DOGE"], "unwanted_coins": ["doge"], "max_volume_usd": 500,
+    })
+    assert rule.matches({"asset": "btc", "volume_usd": 100})
+    assert not rule.matches({"asset": "DOGE", "volume_usd": 100})
+    assert not rule.matches({"asset": "ETH", "volume_usd": 100})
+    assert not rule.matches({"asset": "BTC", "volume_usd": 1000})
+    assert not rule.matches({"asset": "BTC"})
+
+def test_compile_user_filter_keeps_active_categories():
+    """
+    Tests that only active categories are compiled into rules.
+    """
+    compiled = compile_user_filter(7, {"flow_alerts": {"active": True}, "all_spot": {"active": False}})
+    assert list(compiled.rules) == ["flow_alerts"]
+
+# --- Tests for FilterIndex ---
+
+def test_match_by_symbol(index):
+    """
+    Tests that favorites, blocked coins and categories are honoured.
+    """
+    assert index.match({"category": "flow_alerts", "asset": "BTC"}) == {1, 2, 3}
+    assert index.match({"category": "flow_alerts", "asset": "DOGE"}) == {1}
+    assert index.match({"category": "flow_alerts", "asset": "SOL", "volume_usd": "2500000"}) == {1, 3, 4}
+    assert index.match({"category": "all_spot", "asset": "SOL"}) == {5}
+    assert index.match({"category": "cex_tracking", "asset": "SOL"}) == set()
+
+def test_update_and_remove(index):
+    """
+    Tests that replacing or removing a chat's filters updates every index.
+    """
+    index.update(2, {"flow_alerts": {"active": True, "favorite_coins": ["SOL"]}})
+    assert 2 not in index.match({"category": "flow_alerts", "asset": "BTC"})
+    assert 2 in index.match({"category": "flow_alerts", "asset": "SOL"})
+
+    index.remove(3)
+    assert 3 not in index
+    assert index.match({"category": "flow_alerts", "asset": "DOGE"}) == {1}
+    assert len(index) == 4
+
+def test_match_scales_with_recipients_not_subscribers():
+    """
+    Tests that a symbol-specific event touches only the chats that follow it.
+    """
+    index = FilterIndex()
+    for chat_id in range(10_000):
+        index.update(chat_id, {"cex_tracking": {"active": True, "favorite_coins": [f"COIN{chat_id}"]}})
+    assert index.match({"category": "cex_tracking", "asset": "COIN42"}) == {42}
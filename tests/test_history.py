@@ -0,0 +1,121 @@
+import pytest
+from src.market_stats.history import HEADER, LATEST_FILE, RECORD, HistoryStore, MetricHistoryFile
+from src.market_stats.timeseries import TimeSeriesStore
+
+# --- Tests for MetricHistoryFile ---
+
+def test_append_and_read_back(tmp_path):
+    """
+    Tests that appended records are readable through the mmap view.
+    """
+    history = MetricHistoryFile(tmp_path / "m.bin")
+    for i in range(10):
+        history.append(float(i), float(i * 2))
+
+    assert len(history) == 10
+    assert history.tail(2) == [(8.0, 16.0), (9.0, 18.0)]
+    assert history.range(3.0, 5.0) == [(3.0, 6.0), (4.0, 8.0), (5.0, 10.0)]
+
+    # The mapping is refreshed after further appends.
+    history.append(10.0, 20.0)
+    assert history.tail(1) == [(10.0, 20.0)]
+    history.close()
+
+def test_reopen_and_truncate_partial_record(tmp_path):
+    """
+    Tests that a torn trailing write is dropped when the file is reopened.
+    """
+    path = tmp_path / "m.bin"
+    history = MetricHistoryFile(path)
+    history.append(1.0, 1.0)
+    history.append(2.0, 2.0)
+    history.close()
+
+    with open(path, 'ab') as f:
+        f.write(b"\x00" * 5)
+
+    history = MetricHistoryFile(path)
+    assert path.stat().st_size == HEADER.size + 2 * RECORD.size
+    assert history.tail(5) == [(1.0, 1.0), (2.0, 2.0)]
+    history.close()
+
+def test_rejects_foreign_file(tmp_path):
+    """
+    Tests that a file without the history header is refused.
+    """
+    path = tmp_path / "m.bin"
+    path.write_bytes(b"not a history file at all")
+    with pytest.raises(ValueError):
+        MetricHistoryFile(path)
+
+    path.write_bytes(b"CHTS")
+    with pytest.raises(ValueError):
+        MetricHistoryFile(path)
+
+def test_reads_do_not_create_files(tmp_path):
+    """
+    Tests that reading an unknown metric returns nothing and leaves no file behind.
+    """
+    history = HistoryStore(tmp_path)
+    assert history.tail("unknown.metric", 5) == []
+    assert history.range("unknown.metric", 0.0) == []
+    assert history.metrics() == []
+    history.close()
+
+@pytest.mark.asyncio
+async def test_latest_payloads_are_written_on_flush(tmp_path):
+    """
+    Tests that saved payloads reach disk in one write per flush, not one per save.
+    """
+    history = HistoryStore(tmp_path)
+    history.save_latest("a", {"n": 1})
+    history.save_latest("b", {"n": 2})
+    assert not (tmp_path / LATEST_FILE).exists()
+
+    await history.flush_latest()
+    assert HistoryStore(tmp_path).latest() == {"a": {"n": 1}, "b": {"n": 2}}
+
+    # Anything saved after the last flush is written when the store closes.
+    history.save_latest("a", {"n": 3})
+    history.close()
+    assert HistoryStore(tmp_path).latest() == {"a": {"n": 3}, "b": {"n": 2}}
+
+# --- Tests for rehydrating the in-memory store ---
+
+def test_store_rehydrates_from_history(tmp_path):
+    """
+    Tests that samples written in one run are restored in the next.
+    """
+    store = TimeSeriesStore(capacity=3)
+    store.attach_history(HistoryStore(tmp_path))
+    for i in range(5):
+        store.record("fear_and_greed", {"value": str(40 + i), "value_classification": "Fear"},
+                     timestamp=float(i))
+    store.detach_history()
+
+    restarted = TimeSeriesStore(capacity=3)
+    restored = restarted.attach_history(HistoryStore(tmp_path))
+
+    assert restored == 3
+    # The latest payload comes back as it was recorded, not rebuilt from its numbers.
+    assert restarted.get("fear_and_greed") == {"value": "44", "value_classification": "Fear"}
+    assert restarted.last("fear_and_greed.value", 10) == [(2.0, 42.0), (3.0, 43.0), (4.0, 44.0)]
+    # Older samples are still reachable from disk.
+    assert restarted.range("fear_and_greed.value", 0.0, 1.0) == [(0.0, 40.0), (1.0, 41.0)]
+    restarted.detach_history()
+
+def test_backwards_clock_keeps_history_sorted(tmp_path):
+    """
+    Tests that a wall clock stepping backwards is clamped the same way in memory and on disk.
+    """
+    store = TimeSeriesStore(capacity=10)
+    history = HistoryStore(tmp_path)
+    store.attach_history(history)
+    for timestamp, value in ((10.0, 1.0), (20.0, 2.0), (15.0, 3.0), (30.0, 4.0)):
+        store.append("btc.price", timestamp, value)
+
+    expected = [(10.0, 1.0), (20.0, 2.0), (20.0, 3.0), (30.0, 4.0)]
+    assert store.last("btc.price", 10) == expected
+    assert history.tail("btc.price", 10) == expected
+    assert history.range("btc.price", 20.0, 25.0) == [(20.0, 2.0), (20.0, 3.0)]
+    store.detach_history()
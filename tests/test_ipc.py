@@ -0,0 +1,283 @@
+import asyncio
+import json
+import sys
+
+import pytest
+
+from src import ipc, supervisor
+from src.ipc import BusClient, BusServer
+from src.market_stats import poller
+
+async def wait_until(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+# --- Tests for the IPC bus ---
+
+@pytest.mark.asyncio
+async def test_publish_reaches_other_subscribers(tmp_path):
+    """
+    Tests that messages reach subscribers of the topic but not the publisher.
+    """
+    server = BusServer(tmp_path / "bus.sock")
+    await server.start()
+    received = {"a": [], "b": []}
+
+    def recorder(name):
+        async def record(data):
+            received[name].append(data)
+        return record
+
+    a = BusClient(server.path, name="a")
+    b = BusClient(server.path, name="b")
+    for client, name in ((a, "a"), (b, "b")):
+        client.subscribe("topic", recorder(name))
+        await client.start()
+        assert await client.wait_connected()
+    # Subscriptions are sent on connect; give the hub a moment to register them.
+    await asyncio.sleep(0.05)
+
+    a.publish("topic", {"n": 1})
+    a.publish("other", {"n": 2})
+    await wait_until(lambda: received["b"])
+
+    assert received == {"a": [], "b": [{"n": 1}]}
+    await a.stop()
+    await b.stop()
+    await server.stop()
+
+@pytest.mark.asyncio
+async def test_client_connects_once_bus_appears(tmp_path):
+    """
+    Tests that a client started before the hub connects when it comes up.
+    """
+    client = BusClient(tmp_path / "bus.sock")
+    await client.start()
+    assert not await client.wait_connected(timeout=0.2)
+
+    server = BusServer(tmp_path / "bus.sock")
+    await server.start()
+    assert await client.wait_connected()
+    await client.stop()
+    await server.stop()
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_pauses_publish_wait(tmp_path):
+    """
+    Tests that a backlog at a subscriber holds `publish_wait` until it drains, without losing messages.
+    """
+    server = BusServer(tmp_path / "bus.sock")
+    await server.start()
+    gate = asyncio.Event()
+    received = []
+
+    async def slow(data):
+        await gate.wait()
+        received.append(data)
+
+    publisher = BusClient(server.path, name="web")
+    subscriber = BusClient(server.path, name="cex", high_water=3, low_water=1)
+    subscriber.subscribe("topic", slow)
+    for client in (publisher, subscriber):
+        await client.start()
+        assert await client.wait_connected()
+    await asyncio.sleep(0.05)
+
+    sent = 0
+
+    async def publish_all():
+        nonlocal sent
+        for n in range(20):
+            await publisher.publish_wait("topic", n)
+            sent += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(publish_all())
+    await wait_until(lambda: not publisher._resumed("topic").is_set())
+    await asyncio.sleep(0.05)
+    assert sent < 20
+    assert not task.done()
+
+    gate.set()
+    await asyncio.wait_for(task, timeout=5)
+    await wait_until(lambda: len(received) == 20)
+    assert received == list(range(20))
+    await publisher.stop()
+    await subscriber.stop()
+    await server.stop()
+
+@pytest.mark.asyncio
+async def test_slow_reader_pauses_instead_of_dropping(tmp_path, monkeypatch):
+    """
+    Tests that a worker not reading its socket pauses the topic at the hub rather than losing messages.
+    """
+    monkeypatch.setattr(ipc, "OUTGOING_HIGH_WATER", 4)
+    monkeypatch.setattr(ipc, "OUTGOING_LOW_WATER", 1)
+    server = BusServer(tmp_path / "bus.sock")
+    await server.start()
+    publisher = BusClient(server.path, name="web")
+    await publisher.start()
+    assert await publisher.wait_connected()
+
+    # A raw subscriber that stops reading until told to.
+    reader, writer = await asyncio.open_unix_connection(str(server.path), limit=ipc.MAX_MESSAGE_SIZE)
+    writer.write(b'{"op":"sub","topic":"topic"}\n')
+    await writer.drain()
+    await asyncio.sleep(0.05)
+
+    payload = "x" * 64 * 1024
+
+    async def publish_all():
+        for n in range(50):
+            await publisher.publish_wait("topic", [n, payload])
+            await asyncio.sleep(0.005)
+
+    task = asyncio.create_task(publish_all())
+    await wait_until(lambda: not publisher._resumed("topic").is_set())
+    assert not task.done()
+
+    received = []
+    while len(received) < 50:
+        message = json.loads(await asyncio.wait_for(reader.readline(), timeout=5))
+        if message.get("op") == "pub":
+            received.append(message["data"][0])
+    await asyncio.wait_for(task, timeout=5)
+
+    assert received == list(range(50))
+    assert all(connection.dropped == 0 for connection in server._connections)
+    writer.close()
+    await publisher.stop()
+    await server.stop()
+
+@pytest.mark.asyncio
+async def test_slow_topic_does_not_block_other_topics(tmp_path):
+    """
+    Tests that a handler stuck on one topic leaves the other topics flowing.
+    """
+    server = BusServer(tmp_path / "bus.sock")
+    await server.start()
+    updates = []
+
+    async def stuck(data):
+        await asyncio.Event().wait()
+
+    async def record(data):
+        updates.append(data)
+
+    publisher = BusClient(server.path, name="web")
+    subscriber = BusClient(server.path, name="cex")
+    subscriber.subscribe("cex.events", stuck)
+    subscriber.subscribe("telegram.update.cex", record)
+    for client in (publisher, subscriber):
+        await client.start()
+        assert await client.wait_connected()
+    await asyncio.sleep(0.05)
+
+    for n in range(5):
+        publisher.publish("cex.events", n)
+    publisher.publish("telegram.update.cex", {"update_id": 1})
+    await wait_until(lambda: updates)
+
+    assert updates == [{"update_id": 1}]
+    await publisher.stop()
+    await subscriber.stop()
+    await server.stop()
+
+@pytest.mark.asyncio
+async def test_non_object_messages_are_skipped(tmp_path):
+    """
+    Tests that JSON lines which are not objects are ignored by the hub and the client alike.
+    """
+    server = BusServer(tmp_path / "bus.sock")
+    await server.start()
+    received = []
+
+    async def record(data):
+        received.append(data)
+
+    subscriber = BusClient(server.path, name="cex")
+    subscriber.subscribe("topic", record)
+    await subscriber.start()
+    assert await subscriber.wait_connected()
+    await asyncio.sleep(0.05)
+
+    # A raw peer sends junk to the hub, then a valid publish.
+    reader, writer = await asyncio.open_unix_connection(str(server.path))
+    writer.write(b'[]\n1\n{"op":"pub","topic":"topic","data":1}\n')
+    await writer.drain()
+    await wait_until(lambda: received == [1])
+
+    # The same junk reaching the client, as a subscriber of the topic, is skipped too.
+    hub_side = next(c for c in server._connections if "topic" in c.topics)
+    hub_side.send(b'[]\n')
+    hub_side.send(b'{"op":"pub","topic":["topic"]}\n')
+    writer.write(b'{"op":"pub","topic":"topic","data":2}\n')
+    await writer.drain()
+    await wait_until(lambda: received == [1, 2])
+    assert subscriber.connected
+
+    writer.close()
+    await subscriber.stop()
+    await server.stop()
+
+@pytest.mark.asyncio
+async def test_server_stop_ends_connection_handlers(tmp_path):
+    """
+    Tests that stopping the hub finishes its per-connection tasks.
+    """
+    server = BusServer(tmp_path / "bus.sock")
+    await server.start()
+    client = BusClient(server.path)
+    await client.start()
+    assert await client.wait_connected()
+    await wait_until(lambda: server._tasks)
+
+    await server.stop()
+    assert not server._tasks
+    await client.stop()
+
+@pytest.mark.asyncio
+async def test_remote_control_routes_active_events(monkeypatch):
+    """
+    Tests that event toggles go to the remote poller when one is configured.
+    """
+    sent = []
+    monkeypatch.setattr(poller, "_remote_control", None)
+    poller.set_remote_control(sent.append)
+    poller.set_active_events(["cmc_fear_greed"])
+    assert sent == [["cmc_fear_greed"]]
+
+# --- Tests for Supervisor ---
+
+@pytest.mark.asyncio
+async def test_crashed_worker_is_restarted(tmp_path, monkeypatch):
+    """
+    Tests that a worker that exits is started again after the backoff.
+    """
+    monkeypatch.setattr(supervisor, "MIN_RESTART_DELAY", 0.01)
+    sup = supervisor.Supervisor(
+        workers=["crashy"], bus_path=tmp_path / "bus.sock",
+        command=[sys.executable, "-c", "import sys; sys.exit(3)"],
+    )
+    task = asyncio.create_task(sup.run())
+    await wait_until(lambda: sup.restarts["crashy"] >= 2)
+    sup.stop()
+    await task
+    assert not (tmp_path / "bus.sock").exists()
+
+@pytest.mark.asyncio
+async def test_stop_terminates_workers(tmp_path):
+    """
+    Tests that stopping the supervisor terminates running workers.
+    """
+    sup = supervisor.Supervisor(
+        workers=["sleepy"], bus_path=tmp_path / "bus.sock",
+        command=[sys.executable, "-c", "import time; time.sleep(60)"],
+    )
+    task = asyncio.create_task(sup.run())
+    await wait_until(lambda: "sleepy" in sup.processes)
+    sup.stop()
+    await asyncio.wait_for(task, timeout=5)
+    assert sup.processes["sleepy"].returncode is not None
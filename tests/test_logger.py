@@ -0,0 +1,105 @@
+import json
+import logging
+import queue
+import time
+
+import pytest
+
+from src import logger
+
+def make_record(msg="hello %s", args=("world",), level=logging.INFO, name="src.test", **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+# --- Tests for RateLimitFilter ---
+
+def test_rate_limit_suppresses_repeats_and_reports_them(monkeypatch):
+    """
+    Tests that repeats beyond the burst are dropped and counted on the next window.
+    """
+    clock = [100.0]
+    monkeypatch.setattr(logger.time, "monotonic", lambda: clock[0])
+    limiter = logger.RateLimitFilter(burst=2, interval=10)
+
+    results = [limiter.filter(make_record(args=(i,))) for i in range(5)]
+    assert results == [True, True, False, False, False]
+    assert limiter.filter(make_record("other message")) is True
+    assert limiter.filter(make_record(level=logging.ERROR)) is True
+
+    clock[0] += 10
+    record = make_record()
+    assert limiter.filter(record) is True
+    assert record.suppressed == 3
+
+# --- Tests for the formatters ---
+
+def test_json_formatter_includes_extra_fields():
+    """
+    Tests that JSON records carry the message, level, logger and any extras.
+    """
+    entry = json.loads(logger.JsonFormatter().format(make_record(chat_id=42)))
+    assert entry["msg"] == "hello world"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "src.test"
+    assert entry["chat_id"] == 42
+
+def test_text_formatter_notes_suppressed_messages():
+    """
+    Tests that the text format mentions how many similar messages were dropped.
+    """
+    text = logger.TextFormatter().format(make_record(suppressed=7))
+    assert text.endswith("hello world (7 similar messages suppressed)")
+
+# --- Tests for NonBlockingQueueHandler ---
+
+def test_queue_handler_never_blocks_when_full():
+    """
+    Tests that records are dropped and counted once the queue is full.
+    """
+    handler = logger.NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record())
+    handler.handle(make_record())
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+def test_queue_handler_formats_mutable_args_eagerly():
+    """
+    Tests that only records with mutable arguments are formatted on the caller's thread.
+    """
+    handler = logger.NonBlockingQueueHandler(queue.Queue())
+    lazy = handler.prepare(make_record())
+    assert (lazy.msg, lazy.args) == ("hello %s", ("world",))
+
+    items = [1]
+    eager = handler.prepare(make_record("items %s", (items,)))
+    items.append(2)
+    assert (eager.msg, eager.args) == ("items [1]", None)
+
+# --- Tests for the pipeline ---
+
+def test_records_are_written_by_the_listener(capsys):
+    """
+    Tests that a logged message reaches stdout through the background listener.
+    """
+    logger.get_logger("src.test_pipeline").info("pipeline check %d", 12345)
+    deadline = time.monotonic() + 2
+    output = ""
+    while "pipeline check 12345" not in output and time.monotonic() < deadline:
+        time.sleep(0.01)
+        output += capsys.readouterr().out
+    assert "src.test_pipeline - INFO - pipeline check 12345" in output
+
+def test_per_module_levels_cover_submodules():
+    """
+    Tests that a configured module level applies to the modules below it.
+    """
+    try:
+        logger.configure_logging("INFO", {"src.test_levels": "WARNING"})
+        assert not logging.getLogger("src.test_levels.child").isEnabledFor(logging.INFO)
+        assert logging.getLogger("src.other").isEnabledFor(logging.INFO)
+        with pytest.raises(ValueError):
+            logger.configure_logging(fmt="xml")
+    finally:
+        logging.getLogger("src.test_levels").setLevel(logging.NOTSET)
+        logger.configure_logging()
@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import metrics, web_server
+
+@pytest.fixture
+def registry():
+    return metrics.Registry()
+
+# --- Tests for the metric types ---
+
+def test_counter_renders_per_label_set(registry):
+    """
+    Tests that each label combination gets its own counter line.
+    """
+    counter = metrics.Counter("jobs_total", "Jobs run.", ("kind",), registry=registry)
+    counter.labels("a").inc()
+    counter.labels("a").inc(2)
+    counter.labels("b").inc()
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP jobs_total Jobs run.", "# TYPE jobs_total counter"]
+    assert 'jobs_total{kind="a"} 3' in lines
+    assert 'jobs_total{kind="b"} 1' in lines
+
+def test_labels_are_validated_and_escaped(registry):
+    """
+    Tests that a wrong label count is refused and label values are escaped.
+    """
+    counter = metrics.Counter("things_total", "Things.", ("name",), registry=registry)
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
+    counter.labels('say "hi"\n').inc()
+    assert 'things_total{name="say \\"hi\\"\\n"} 1' in registry.render()
+
+def test_duplicate_names_are_refused(registry):
+    """
+    Tests that a registry holds one metric per name.
+    """
+    metrics.Gauge("depth", "Depth.", registry=registry)
+    with pytest.raises(ValueError):
+        metrics.Gauge("depth", "Depth again.", registry=registry)
+
+def test_gauge_callback_is_read_at_scrape_time(registry):
+    """
+    Tests that a gauge with a callback reports the callback's current value.
+    """
+    items = []
+    gauge = metrics.Gauge("queue_depth", "Queue depth.", registry=registry)
+    gauge.set_function(lambda: len(items))
+    items.extend([1, 2])
+    assert "queue_depth 2" in registry.render().splitlines()
+
+def test_failing_gauge_callback_renders_nan(registry):
+    """
+    Tests that a gauge whose callback raises is reported as NaN instead of breaking the scrape.
+    """
+    def broken():
+        raise RuntimeError("queue is gone")
+
+    gauge = metrics.Gauge("queue_depth", "Queue depth.", registry=registry)
+    gauge.set_function(broken)
+    assert "queue_depth NaN" in registry.render().splitlines()
+
+def test_histogram_buckets_are_cumulative(registry):
+    """
+    Tests bucket counts, the +Inf bucket, sum and count of a histogram.
+    """
+    histogram = metrics.Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 3.65" in lines
+    assert "latency_seconds_count 4" in lines
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor_observes_blocking(registry):
+    """
+    Tests that blocking the event loop shows up as lag.
+    """
+    histogram = metrics.Histogram("lag_seconds", "Lag.", buckets=(0.05,), registry=registry)
+    monitor = metrics.LoopLagMonitor(interval=0.01, histogram=histogram)
+    monitor.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.1)
+    await asyncio.sleep(0.03)
+    await monitor.stop()
+    child = histogram.labels()
+    assert child.count >= 2
+    assert child.counts[-1] >= 1
+
+# --- Tests for /metrics ---
+
+def test_metrics_endpoint_counts_requests_by_route():
+    """
+    Tests that requests are counted under their route template.
+    """
+    with TestClient(web_server.app) as client:
+        client.get("/api/market/history/not_a_metric")
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert ('http_requests_total{method="GET",endpoint="/api/market/history/{metric}",status="404"}'
+            in body)
+    assert "# TYPE event_loop_lag_seconds histogram" in body
+    assert "cex_notification_queue_depth" in body
+
+@pytest.mark.asyncio
+async def test_worker_exporter_serves_its_registry(registry):
+    """
+    Tests that the standalone exporter answers /metrics with the registry and 404s anything else.
+    """
+    metrics.Counter("worker_jobs_total", "Jobs run.", registry=registry).inc(3)
+    server = metrics.MetricsServer(0, host="127.0.0.1", registry=registry)
+    await server.start()
+    port = server._server.sockets[0].getsockname()[1]
+
+    async def get(path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+
+    response = await get("/metrics")
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert b"worker_jobs_total 3" in response
+    assert (await get("/other")).startswith(b"HTTP/1.1 404")
+    await server.stop()
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+from src.market_stats import poller
+
+# --- Tests for concurrent fetch fan-out ---
+
+@pytest.mark.asyncio
+async def test_fetches_run_concurrently(monkeypatch):
+    """
+    Tests that a cycle takes as long as the slowest fetch, not the sum.
+    """
+    async def slow_fetch():
+        await asyncio.sleep(0.2)
+
+    monkeypatch.setattr(poller, 'EVENT_FETCH_MAP', {'a': slow_fetch, 'b': slow_fetch, 'c': slow_fetch})
+
+    started = time.monotonic()
+    await poller._run_fetches(['a', 'b', 'c'], asyncio.Semaphore(4), timeout=5)
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 0.4
+    assert {poller.fetch_timings[e]['status'] for e in 'abc'} == {'ok'}
+
+@pytest.mark.asyncio
+async def test_fetch_timeout_does_not_block_others(monkeypatch):
+    """
+    Tests that a hung fetch is cut off and recorded without affecting the rest.
+    """
+    completed = []
+
+    async def hung_fetch():
+        await asyncio.sleep(10)
+
+    async def fast_fetch():
+        completed.append('fast')
+
+    monkeypatch.setattr(poller, 'EVENT_FETCH_MAP', {'hung': hung_fetch, 'fast': fast_fetch})
+
+    before = time.time()
+    await poller._run_fetches(['hung', 'fast'], asyncio.Semaphore(4), timeout=0.1)
+
+    assert completed == ['fast']
+    assert poller.fetch_timings['hung']['status'] == 'timeout'
+    # Stamped when the fetch began, not when the timeout ended it.
+    assert poller.fetch_timings['hung']['started_at'] < before + 0.05
+    assert poller.fetch_timings['fast']['status'] == 'ok'
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_is_respected(monkeypatch):
+    """
+    Tests that no more than `max_concurrency` fetches are in flight at once.
+    """
+    in_flight = 0
+    peak = 0
+
+    async def tracked_fetch():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+
+    events = [f"event_{i}" for i in range(6)]
+    monkeypatch.setattr(poller, 'EVENT_FETCH_MAP', {e: tracked_fetch for e in events})
+
+    await poller._run_fetches(events, asyncio.Semaphore(2), timeout=5)
+    assert peak == 2
@@ -0,0 +1,64 @@
+import pytest
+
+from src.bots import runner
+
+class FakeUpdater:
+    running = False
+
+    async def start_polling(self):
+        raise RuntimeError("polling refused")
+
+class FakeApplication:
+    def __init__(self, calls):
+        self.calls = calls
+        self.updater = FakeUpdater()
+        self.running = False
+        self.post_init = self._post_init
+        self.post_stop = self._post_stop
+
+    async def initialize(self):
+        self.calls.append("initialize")
+
+    async def _post_init(self, application):
+        self.calls.append("post_init")
+
+    async def start(self):
+        self.running = True
+        self.calls.append("start")
+
+    async def stop(self):
+        self.running = False
+        self.calls.append("stop")
+
+    async def _post_stop(self, application):
+        self.calls.append("post_stop")
+
+    async def shutdown(self):
+        self.calls.append("shutdown")
+
+class FakeBuilder:
+    def __init__(self, application):
+        self.application = application
+
+    def token(self, token):
+        return self
+
+    def build(self):
+        return self.application
+
+# --- Tests for run_bot ---
+
+@pytest.mark.asyncio
+async def test_failed_start_tears_the_bot_down(monkeypatch):
+    """
+    Tests that a bot failing after post_init is stopped and shut down before None is returned.
+    """
+    calls = []
+    application = FakeApplication(calls)
+    monkeypatch.setattr(runner.Application, "builder", lambda: FakeBuilder(application))
+
+    def setup(application):
+        pass
+
+    assert await runner.run_bot("token", setup) is None
+    assert calls == ["initialize", "post_init", "start", "stop", "post_stop", "shutdown"]
@@ -0,0 +1,82 @@
+import pytest
+from src.market_stats.scheduler import PollScheduler
+
+@pytest.fixture
+def clock(clock):
+    """The shared fake clock, started away from zero."""
+    clock.now = 1000.0
+    return clock
+
+# --- Tests for PollScheduler ---
+
+def test_all_events_due_immediately(clock):
+    """
+    Tests that every event is part of the first batch.
+    """
+    scheduler = PollScheduler({"fast": 60, "slow": 3600}, clock=clock, rng=lambda: 0.0)
+    due_at, events = scheduler.next_batch()
+    assert due_at == clock.now
+    assert sorted(events) == ["fast", "slow"]
+
+def test_per_event_cadence(clock):
+    """
+    Tests that each event follows its own interval.
+    """
+    scheduler = PollScheduler({"fast": 60, "slow": 3600}, clock=clock, rng=lambda: 0.0)
+    scheduler.mark_dispatched(["fast", "slow"])
+
+    due_at, events = scheduler.next_batch()
+    assert due_at == 1060.0
+    assert events == ["fast"]
+
+def test_schedule_does_not_drift(clock):
+    """
+    Tests that late dispatches do not push later ticks back.
+    """
+    scheduler = PollScheduler({"fast": 60}, clock=clock, rng=lambda: 0.0)
+    for tick in range(1, 6):
+        scheduler.mark_dispatched(["fast"])
+        due_at, _ = scheduler.next_batch()
+        assert due_at == 1000.0 + tick * 60
+        # Dispatch every tick 5 seconds late.
+        clock.now = due_at + 5
+
+def test_missed_ticks_are_skipped(clock):
+    """
+    Tests that a stalled loop resumes on the next grid slot instead of bursting.
+    """
+    scheduler = PollScheduler({"fast": 60}, clock=clock, rng=lambda: 0.0)
+    scheduler.mark_dispatched(["fast"])
+    clock.now = 1000.0 + 60 * 3 + 10
+    scheduler.mark_dispatched(["fast"])
+    due_at, _ = scheduler.next_batch()
+    assert due_at == 1000.0 + 60 * 4
+
+def test_jitter_is_bounded_and_not_accumulated(clock):
+    """
+    Tests that jitter offsets each tick from its grid point without adding up.
+    """
+    scheduler = PollScheduler({"fast": 100}, jitter_ratio=0.1, clock=clock, rng=lambda: 1.0)
+    scheduler.mark_dispatched(["fast"])
+    assert scheduler.next_batch()[0] == 1000.0 + 100 + 10
+    scheduler.mark_dispatched(["fast"])
+    assert scheduler.next_batch()[0] == 1000.0 + 200 + 10
+
+def test_nearby_events_are_merged(clock):
+    """
+    Tests that events due within the merge window are fetched together.
+    """
+    scheduler = PollScheduler({"a": 60, "b": 61, "c": 90}, merge_window=2.0, clock=clock, rng=lambda: 0.0)
+    scheduler.mark_dispatched(["a", "b", "c"])
+    due_at, events = scheduler.next_batch()
+    assert due_at == 1060.0
+    assert events == ["a", "b"]
+
+def test_invalid_intervals():
+    """
+    Tests that empty or non-positive schedules are rejected.
+    """
+    with pytest.raises(ValueError):
+        PollScheduler({})
+    with pytest.raises(ValueError):
+        PollScheduler({"a": 0})
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from src import server_status
+from src.bots import admin_bot
+from src.server_status import StatusSampler, sparkline
+
+# --- Tests for sparkline ---
+
+def test_sparkline_scales_to_range():
+    """
+    Tests that the lowest value maps to the lowest block and the highest to the top one.
+    """
+    assert sparkline([0, 50, 100]) == "▁▅█"
+    assert sparkline([3, 3, 3]) == "▁▁▁"
+    assert sparkline([]) == ""
+
+def test_sparkline_keeps_latest_values():
+    """
+    Tests that a width keeps only the most recent values.
+    """
+    assert sparkline([100, 0, 1], width=2) == "▁█"
+
+# --- Tests for StatusSampler ---
+
+@pytest.mark.asyncio
+async def test_sampler_fills_bounded_history():
+    """
+    Tests that samples are collected on the cadence into a ring buffer.
+    """
+    sampler = StatusSampler(interval=0.01, history=3)
+    sampler.start()
+    await asyncio.sleep(0.2)
+    await sampler.stop()
+    assert len(sampler.samples) == 3
+    sample = sampler.latest
+    assert 0 <= sample.cpu_percent <= 100
+    assert sample.memory_total > 0 and sample.process_rss > 0
+    assert sample.loop_lag >= 0
+
+@pytest.mark.asyncio
+async def test_status_reads_cached_snapshot(monkeypatch):
+    """
+    Tests that the status message is built from stored samples without measuring.
+    """
+    sampler = StatusSampler(interval=5, history=10)
+    monkeypatch.setattr(admin_bot, "status_sampler", sampler)
+    assert "still being collected" in await admin_bot.get_server_status()
+
+    for cpu in (10.0, 30.0, 20.0):
+        sample = sampler.collect(loop_lag=0.002)
+        sample.cpu_percent = cpu
+        sampler.samples.append(sample)
+    monkeypatch.setattr(server_status.psutil, "cpu_percent",
+                        lambda *args, **kwargs: pytest.fail("status must not measure CPU"))
+    text = await admin_bot.get_server_status()
+    assert "`20.0%`" in text
+    assert "min/avg/max `10.0/20.0/30.0`" in text
+    assert "Event Loop Lag:** `2.0 ms`" in text
+
+def test_format_duration():
+    """
+    Tests uptime formatting with and without days.
+    """
+    assert server_status.format_duration(3 * 3600 + 125) == "3h 2m"
+    assert server_status.format_duration(2 * 86400 + 3600) == "2d 1h 0m"
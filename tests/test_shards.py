@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from src import metrics
+from src.cex.shards import ShardedScreener, shard_index, shard_key
+
+def event(category, asset, n=0):
+    return {"category": category, "asset": asset, "n": n}
+
+def keys_on_different_shards(shards):
+    """Returns two (category, asset) pairs that hash to different shards."""
+    first = ("flow_alerts", "BTC")
+    for i in range(100):
+        other = ("all_spot_percent", f"COIN{i}")
+        if shard_index(event(*other), shards) != shard_index(event(*first), shards):
+            return first, other
+    raise AssertionError("no two keys on different shards")
+
+# --- Tests for routing ---
+
+def test_shard_key_uses_category_and_normalised_symbol():
+    """
+    Tests that the key combines the category with the normalised symbol.
+    """
+    assert shard_key({"category": "flow_alerts", "asset": " btc "}) == "flow_alerts:BTC"
+    assert shard_key({"category": "flow_alerts", "symbol": "ETH"}) == "flow_alerts:ETH"
+    assert shard_key({"category": "flow_alerts"}) == "flow_alerts:"
+
+def test_shard_index_is_stable():
+    """
+    Tests that an event always maps to the same shard, within range.
+    """
+    indexes = {shard_index(event("all_spot", "BTC", n), 8) for n in range(10)}
+    assert len(indexes) == 1
+    assert 0 <= indexes.pop() < 8
+
+def test_requires_a_shard():
+    """
+    Tests that zero shards is refused.
+    """
+    with pytest.raises(ValueError):
+        ShardedScreener(lambda event: None, shards=0)
+
+# --- Tests for processing ---
+
+@pytest.mark.asyncio
+async def test_preserves_order_per_key():
+    """
+    Tests that events sharing a (category, symbol) are handled in arrival order.
+    """
+    handled = []
+
+    async def handler(item):
+        # Yield so the shards interleave.
+        await asyncio.sleep(0)
+        handled.append((item["asset"], item["n"]))
+
+    screener = ShardedScreener(handler, shards=4, queue_size=100)
+    await screener.start()
+    try:
+        for n in range(20):
+            for asset in ("BTC", "ETH", "SOL"):
+                await screener.submit(event("all_spot", asset, n))
+    finally:
+        await screener.stop()
+
+    assert len(handled) == 60
+    for asset in ("BTC", "ETH", "SOL"):
+        assert [n for name, n in handled if name == asset] == list(range(20))
+
+@pytest.mark.asyncio
+async def test_slow_shard_does_not_block_others():
+    """
+    Tests that a stuck shard does not hold up events routed to another shard.
+    """
+    (slow_category, slow_asset), (fast_category, fast_asset) = keys_on_different_shards(4)
+    release = asyncio.Event()
+    handled = []
+
+    async def handler(item):
+        if item["asset"] == slow_asset:
+            await release.wait()
+        handled.append(item["asset"])
+
+    screener = ShardedScreener(handler, shards=4, queue_size=10)
+    await screener.start()
+    try:
+        await screener.submit(event(slow_category, slow_asset))
+        await screener.submit(event(fast_category, fast_asset))
+        for _ in range(100):
+            if handled:
+                break
+            await asyncio.sleep(0.01)
+        assert handled == [fast_asset]
+        release.set()
+    finally:
+        await screener.stop()
+    assert handled == [fast_asset, slow_asset]
+
+@pytest.mark.asyncio
+async def test_failures_and_full_shard_are_counted():
+    """
+    Tests the per-shard stats for failed, dropped and processed events.
+    """
+    release = asyncio.Event()
+
+    async def handler(item):
+        await release.wait()
+        if item["n"] == 1:
+            raise RuntimeError("boom")
+
+    screener = ShardedScreener(handler, shards=1, queue_size=1)
+    await screener.start()
+    try:
+        assert screener.submit_nowait(event("all_spot", "BTC", 0))
+        await asyncio.sleep(0)  # the worker takes the first event
+        assert screener.submit_nowait(event("all_spot", "BTC", 1))
+        assert not screener.submit_nowait(event("all_spot", "BTC", 2))
+        release.set()
+        await asyncio.sleep(0.01)
+        [stats] = screener.stats()
+    finally:
+        await screener.stop()
+
+    assert stats["processed"] == 1
+    assert stats["failed"] == 1
+    assert stats["dropped"] == 1
+    assert stats["depth"] == 0
+    assert stats["max_lag"] >= 0
+    assert 'cex_shard_queue_depth{shard="0"}' in metrics.render()
+
+@pytest.mark.asyncio
+async def test_submit_requires_running_shards():
+    """
+    Tests that events are refused once the shards are stopped.
+    """
+    async def handler(item):
+        pass
+
+    screener = ShardedScreener(handler, shards=2)
+    with pytest.raises(RuntimeError):
+        await screener.submit(event("all_spot", "BTC"))
+    await screener.start()
+    await screener.stop()
+    assert not screener.running
+    with pytest.raises(RuntimeError):
+        screener.submit_nowait(event("all_spot", "BTC"))
@@ -0,0 +1,67 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src import startup
+
+ROOT = Path(__file__).parent.parent
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+
+# --- Tests for lazy imports ---
+
+def test_importing_main_skips_heavy_dependencies():
+    """
+    Tests that importing main.py loads none of the heavy third-party packages.
+    """
+    code = ("import sys, main; "
+            "heavy = [m for m in ('telegram', 'fastapi', 'uvicorn', 'psutil', 'httpx') if m in sys.modules]; "
+            "print(heavy); sys.exit(bool(heavy))")
+    result = run_python(code)
+    assert result.returncode == 0, result.stdout
+
+def test_module_state_is_built_on_first_use():
+    """
+    Tests that the API client, templates and queue are only built when first accessed.
+    """
+    code = ("import sys; from src.market_stats import poller; from src.cex import cex_screener; "
+            "assert 'cmc_api' not in vars(poller); "
+            "assert 'TEMPLATES' not in vars(cex_screener) and 'notification_queue' not in vars(cex_screener); "
+            "assert poller.cmc_api is poller.get_cmc_api(); "
+            "assert cex_screener.TEMPLATES and 'TEMPLATES' in vars(cex_screener); "
+            "assert cex_screener.notification_queue is cex_screener.get_notification_queue()")
+    result = run_python(code)
+    assert result.returncode == 0, result.stderr
+
+def test_unknown_attributes_still_raise():
+    """
+    Tests that the lazy module attributes don't hide genuine typos.
+    """
+    from src.cex import cex_screener
+    from src.market_stats import poller
+    with pytest.raises(AttributeError):
+        poller.cmc_apis
+    with pytest.raises(AttributeError):
+        cex_screener.TEMPLATE
+
+# --- Tests for the startup profiler ---
+
+def test_profiler_records_only_when_enabled(monkeypatch):
+    """
+    Tests that steps are recorded with their module counts only in profile mode.
+    """
+    monkeypatch.setattr(startup, "_steps", [])
+    monkeypatch.delenv(startup.PROFILE_ENV, raising=False)
+    with startup.timed("init", "quiet"):
+        pass
+    assert startup._steps == []
+
+    monkeypatch.setenv(startup.PROFILE_ENV, "1")
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    startup.import_module("colorsys")
+    [step] = startup._steps
+    assert (step.kind, step.name, step.modules) == ("import", "colorsys", 1)
+    assert step.packages == ["colorsys 1"]
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+import pytest_asyncio
+
+from src.storage.state_store import StateStore
+from src.storage.subscribers import SubscriberStore
+
+@pytest_asyncio.fixture
+async def store(tmp_path):
+    state = StateStore(tmp_path / "state.db")
+    yield state
+    await state.close()
+
+# --- Tests for StateStore ---
+
+@pytest.mark.asyncio
+async def test_subscribers_are_scoped(store):
+    """
+    Tests bulk subscriber writes and per-scope lookups.
+    """
+    await store.add_subscribers("market", [1, 2, 3])
+    await store.add_subscribers("other", [1])
+    await store.remove_subscribers("market", [2])
+    await store.apply_subscriber_changes("market", [(1, 9), (0, 9), (1, 4)])
+
+    assert await store.load_subscribers("market") == {1, 3, 4}
+    assert await store.is_subscribed("other", 1)
+    assert not await store.is_subscribed("other", 3)
+
+@pytest.mark.asyncio
+async def test_settings_round_trip(store):
+    """
+    Tests that settings keep their JSON types and can be overwritten.
+    """
+    await store.set_settings("market_stats", {"crypto_market_cap": True, "limit": 3})
+    await store.set_setting("market_stats", "crypto_market_cap", False)
+
+    assert await store.get_settings("market_stats") == {"crypto_market_cap": False, "limit": 3}
+    assert await store.get_settings("unknown") == {}
+
+@pytest.mark.asyncio
+async def test_user_filters(store):
+    """
+    Tests that a chat's filters are replaced as a whole and indexed by category.
+    """
+    await store.set_user_filters({
+        1: {"flow_alerts": {"active": True}, "all_spot": {"active": True}},
+        2: {"all_spot": {"active": False}},
+    })
+    await store.set_user_filters({1: {"flow_alerts": {"active": True, "favorite_coins": ["BTC"]}}})
+
+    assert await store.get_user_filters(1) == {"flow_alerts": {"active": True, "favorite_coins": ["BTC"]}}
+    assert sorted(await store.chats_for_category("all_spot")) == [2]
+    await store.delete_user_filters(2)
+    assert list(await store.load_user_filters()) == [1]
+
+@pytest.mark.asyncio
+async def test_state_survives_reopen(tmp_path):
+    """
+    Tests that data written before close is there after reopening.
+    """
+    first = StateStore(tmp_path / "state.db")
+    await first.add_subscribers("market", [5])
+    await first.close()
+
+    second = StateStore(tmp_path / "state.db")
+    assert await second.load_subscribers("market") == {5}
+    await second.close()
+
+# --- Tests for SubscriberStore on top of StateStore ---
+
+@pytest.mark.asyncio
+async def test_subscriber_store_migrates_and_writes_through(tmp_path, store):
+    """
+    Tests that legacy subscribers are migrated once and later changes are persisted.
+    """
+    legacy = tmp_path / "subscribers.json"
+    legacy.write_text(json.dumps([10, 20]))
+    subscribers = SubscriberStore(tmp_path / "subs", "market", legacy_json=legacy,
+                                  flush_interval=0.01, state_store=store)
+
+    assert await subscribers.open() == {10, 20}
+    subscribers.add(30)
+    subscribers.discard(10)
+    await subscribers.close()
+
+    assert await store.load_subscribers("market") == {20, 30}
+
+@pytest.mark.asyncio
+async def test_subscriber_migration_runs_once(tmp_path, store):
+    """
+    Tests that an emptied subscriber table is not refilled from the legacy files.
+    """
+    legacy = tmp_path / "subscribers.json"
+    legacy.write_text(json.dumps([10, 20]))
+
+    subscribers = SubscriberStore(tmp_path / "subs", "market", legacy_json=legacy,
+                                  flush_interval=0.01, state_store=store)
+    assert await subscribers.open() == {10, 20}
+    subscribers.discard_many([10, 20])
+    await subscribers.close()
+
+    reopened = SubscriberStore(tmp_path / "subs", "market", legacy_json=legacy,
+                               flush_interval=0.01, state_store=store)
+    assert await reopened.open() == set()
+    await reopened.close()
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from src.storage.subscribers import LOG_RECORD, SubscriberStore
+
+def make_store(tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval", 0.01)
+    return SubscriberStore(tmp_path / "subs", "market", **kwargs)
+
+# --- Tests for SubscriberStore ---
+
+@pytest.mark.asyncio
+async def test_changes_survive_reload(tmp_path):
+    """
+    Tests that queued changes are written behind and replayed on load.
+    """
+    store = make_store(tmp_path)
+    store.load()
+    await store.start()
+    for chat_id in range(5):
+        store.add(chat_id)
+    store.discard(3)
+    await store.close()
+
+    reloaded = make_store(tmp_path)
+    assert reloaded.load() == {0, 1, 2, 4}
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced_into_one_write(tmp_path, monkeypatch):
+    """
+    Tests that a burst of changes lands in the log with a single write.
+    """
+    store = make_store(tmp_path, flush_interval=0.05)
+    store.load()
+    writes = []
+    original = store._append_log
+    monkeypatch.setattr(store, "_append_log", lambda batch: (writes.append(len(batch)), original(batch)))
+
+    await store.start()
+    for chat_id in range(100):
+        store.add(chat_id)
+    await store.close()
+
+    assert writes == [100]
+
+@pytest.mark.asyncio
+async def test_log_is_compacted_into_snapshot(tmp_path):
+    """
+    Tests that a long log is folded into the snapshot and reset.
+    """
+    store = make_store(tmp_path, compact_after=10)
+    store.load()
+    for chat_id in range(12):
+        store.add(chat_id)
+    await store.flush()
+
+    assert store.log_path.stat().st_size == 0
+    assert make_store(tmp_path).load() == set(range(12))
+
+@pytest.mark.asyncio
+async def test_crash_before_log_reset_replays_cleanly(tmp_path):
+    """
+    Tests that a snapshot leaves queued changes out, so replaying the old log over it changes nothing.
+    """
+    store = make_store(tmp_path)
+    store.load()
+    for chat_id in (1, 2, 3):
+        store.add(chat_id)
+    await store.flush()
+    store.add(4)
+    store.discard(1)
+
+    snapshot = store._logged_members()
+    assert snapshot == {1, 2, 3}
+    # Crash after the snapshot is renamed into place but before the log is reset.
+    store._write_snapshot(snapshot)
+    assert make_store(tmp_path).load() == snapshot
+
+def test_torn_log_record_is_ignored(tmp_path):
+    """
+    Tests that a partial trailing log record is dropped on load.
+    """
+    store = make_store(tmp_path)
+    store.directory.mkdir(parents=True)
+    store.log_path.write_bytes(LOG_RECORD.pack(1, 7) + LOG_RECORD.pack(1, 8)[:4])
+
+    assert store.load() == {7}
+    assert store.log_path.stat().st_size == LOG_RECORD.size
+
+def test_migrates_legacy_json(tmp_path):
+    """
+    Tests that the old JSON subscriber list is imported once.
+    """
+    legacy = tmp_path / "subscribers.json"
+    legacy.write_text(json.dumps([10, 20]))
+    store = make_store(tmp_path, legacy_json=legacy)
+
+    assert store.load() == {10, 20}
+    assert store.snapshot_path.exists()
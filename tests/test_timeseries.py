@@ -0,0 +1,88 @@
+import pytest
+from src.market_stats.timeseries import RingSeries, TimeSeriesStore
+
+# --- Tests for RingSeries ---
+
+def test_append_and_last():
+    """
+    Tests that samples come back oldest first.
+    """
+    series = RingSeries(capacity=10)
+    for i in range(5):
+        series.append(100.0 + i, float(i))
+
+    assert len(series) == 5
+    assert series.last(2) == [(103.0, 3.0), (104.0, 4.0)]
+    assert series.latest() == (104.0, 4.0)
+
+def test_capacity_is_bounded():
+    """
+    Tests that the oldest samples are overwritten once the buffer is full.
+    """
+    series = RingSeries(capacity=3)
+    for i in range(10):
+        series.append(float(i), float(i))
+
+    assert len(series) == 3
+    assert series.last(10) == [(7.0, 7.0), (8.0, 8.0), (9.0, 9.0)]
+
+def test_range_query_across_wraparound():
+    """
+    Tests that range queries work after the ring has wrapped.
+    """
+    series = RingSeries(capacity=5)
+    for i in range(8):
+        series.append(float(i), float(i * 10))
+
+    assert series.range(4.0, 6.0) == [(4.0, 40.0), (5.0, 50.0), (6.0, 60.0)]
+    assert series.range(0.0, 2.0) == []
+    assert series.range(6.5) == [(7.0, 70.0)]
+
+def test_timestamps_stay_ordered():
+    """
+    Tests that a sample older than the last one is clamped to keep order.
+    """
+    series = RingSeries(capacity=5)
+    series.append(10.0, 1.0)
+    series.append(5.0, 2.0)
+    assert series.last(2) == [(10.0, 1.0), (10.0, 2.0)]
+
+def test_downsample():
+    """
+    Tests that samples are averaged into fixed-width buckets.
+    """
+    series = RingSeries(capacity=100)
+    for i in range(6):
+        series.append(float(i * 10), float(i))
+
+    assert series.downsample(30) == [(0.0, 1.0), (30.0, 4.0)]
+
+def test_aggregate():
+    """
+    Tests window min/max/mean and percent change.
+    """
+    series = RingSeries(capacity=100)
+    for ts, value in [(0, 50.0), (10, 100.0), (20, 75.0)]:
+        series.append(float(ts), value)
+
+    stats = series.aggregate(window_seconds=15, now=20)
+    assert stats["count"] == 2
+    assert stats["min"] == 75.0
+    assert stats["max"] == 100.0
+    assert stats["pct_change"] == pytest.approx(-25.0)
+    assert series.aggregate(window_seconds=5, now=100) is None
+
+# --- Tests for TimeSeriesStore ---
+
+def test_store_records_tracked_fields():
+    """
+    Tests that tracked numeric fields are stored, including numeric strings.
+    """
+    store = TimeSeriesStore(capacity=10)
+    store.record("fear_and_greed", {"value": "55", "value_classification": "Greed"}, timestamp=1.0)
+    store.record("market_cap", {"total_market_cap": 2.5e12, "btc_dominance": None}, timestamp=1.0)
+
+    assert store.latest()["fear_and_greed"]["value_classification"] == "Greed"
+    assert store.metrics() == ["fear_and_greed.value", "market_cap.total_market_cap"]
+    assert store.last("fear_and_greed.value", 1) == [(1.0, 55.0)]
+    assert store.version == 2
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import config, telegram_webhooks, web_server
+from src.market_stats import poller
+from src.market_stats.timeseries import TimeSeriesStore
+from tests.fakes import FakeApplication
+
+SECRET = "test-secret"
+
+@pytest.fixture
+def received(monkeypatch):
+    """Replaces the screener hand-off with a recorder."""
+    events = []
+
+    async def record(event):
+        events.append(event)
+
+    monkeypatch.setattr(config, "WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(web_server, "_process_ingested_event", record)
+    return events
+
+def wait_for(predicate, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+# --- Tests for /api/cex/events ---
+
+def test_rejects_bad_secret(received):
+    """
+    Tests that requests without the shared secret are refused.
+    """
+    with TestClient(web_server.app) as client:
+        response = client.post("/api/cex/events", json={"category": "all_spot"})
+        assert response.status_code == 401
+        response = client.post("/api/cex/events", json={"category": "all_spot"},
+                               headers={"X-Webhook-Secret": "wrong"})
+        assert response.status_code == 401
+
+def test_accepts_single_batch_and_ndjson(received):
+    """
+    Tests the three accepted body shapes and per-event validation.
+    """
+    headers = {"X-Webhook-Secret": SECRET}
+    with TestClient(web_server.app) as client:
+        response = client.post("/api/cex/events", json={"category": "all_spot", "asset": "BTC"}, headers=headers)
+        assert response.status_code == 202
+        assert response.json() == {"accepted": 1, "rejected": []}
+
+        batch = [{"category": "flow_alerts"}, {"category": "nope"}, "junk"]
+        response = client.post("/api/cex/events", json=batch, headers=headers)
+        assert response.status_code == 202
+        body = response.json()
+        assert body["accepted"] == 1
+        assert [error["index"] for error in body["rejected"]] == [1, 2]
+
+        ndjson = "\n".join(json.dumps({"category": "all_spot", "n": i}) for i in range(3))
+        response = client.post("/api/cex/events", content=ndjson,
+                               headers={**headers, "Content-Type": "application/x-ndjson"})
+        assert response.status_code == 202
+        assert response.json()["accepted"] == 3
+
+        assert wait_for(lambda: len(received) == 5)
+
+def test_malformed_body(received):
+    """
+    Tests that unparseable bodies are rejected with 400.
+    """
+    with TestClient(web_server.app) as client:
+        response = client.post("/api/cex/events", content="{not json",
+                               headers={"X-Webhook-Secret": SECRET})
+        assert response.status_code == 400
+
+def test_backpressure_when_queue_full(monkeypatch):
+    """
+    Tests that a batch that does not fit is refused with 429 instead of buffered.
+    """
+    async def stuck(event):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(config, "WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(config, "CEX_INGEST_QUEUE_SIZE", 2)
+    monkeypatch.setattr(web_server, "_process_ingested_event", stuck)
+
+    headers = {"X-Webhook-Secret": SECRET}
+    with TestClient(web_server.app) as client:
+        # The single worker takes one event and blocks; two more fill the queue.
+        assert client.post("/api/cex/events", json={"category": "all_spot"}, headers=headers).status_code == 202
+        assert wait_for(lambda: web_server.cex_ingestor.depth() == 0)
+        batch = [{"category": "all_spot"}] * 2
+        assert client.post("/api/cex/events", json=batch, headers=headers).status_code == 202
+
+        response = client.post("/api/cex/events", json={"category": "all_spot"}, headers=headers)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+
+        # More than the whole queue can hold is never going to fit.
+        batch = [{"category": "all_spot"}] * 3
+        assert client.post("/api/cex/events", json=batch, headers=headers).status_code == 413
+
+# --- Tests for /api/market/history ---
+
+def test_market_history_rejects_non_positive_parameters(monkeypatch):
+    """
+    Tests that a zero or negative window, resolution or count is refused with 422.
+    """
+    store = TimeSeriesStore()
+    for i in range(3):
+        store.record("fear_and_greed", {"value": 40 + i}, timestamp=time.time() - i)
+    monkeypatch.setattr(poller, "market_data_cache", store)
+
+    url = "/api/market/history/fear_and_greed.value"
+    with TestClient(web_server.app) as client:
+        assert client.get(url, params={"resolution": 60}).status_code == 200
+        for params in ({"resolution": 0}, {"resolution": -5}, {"window": 0}, {"last": 0}):
+            assert client.get(url, params=params).status_code == 422, params
+
+# --- Tests for EmbeddedServer ---
+
+@pytest.mark.asyncio
+async def test_embedded_server_runs_on_caller_loop(received):
+    """
+    Tests that the server serves requests from the caller's loop and shuts down cleanly.
+    """
+    import httpx
+
+    server = web_server.EmbeddedServer(port=0, host="127.0.0.1")
+    assert await server.start()
+    try:
+        port = server.server.servers[0].sockets[0].getsockname()[1]
+        async with httpx.AsyncClient() as client:
+            response = await client.post(f"http://127.0.0.1:{port}/api/cex/events",
+                                         json={"category": "all_spot"},
+                                         headers={"X-Webhook-Secret": SECRET})
+        assert response.status_code == 202
+        # The ingestor runs on this loop, so the event is handled without any thread hop.
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        assert received == [{"category": "all_spot"}]
+    finally:
+        await server.stop()
+    assert server.task is None
+    assert not web_server.cex_ingestor.running
+
+# --- Tests for /telegram/{bot_name} ---
+
+@pytest.fixture
+def webhook_app(monkeypatch):
+    """Registers a fake bot application for webhook delivery."""
+    monkeypatch.setattr(config, "WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(telegram_webhooks, "_applications", {})
+    monkeypatch.setattr(web_server, "event_bus", None)
+    application = FakeApplication()
+    telegram_webhooks.register("cex", application)
+    return application
+
+def test_telegram_update_reaches_update_queue(webhook_app):
+    """
+    Tests that an authenticated update is parsed and queued for its bot.
+    """
+    headers = {telegram_webhooks.SECRET_HEADER: telegram_webhooks.secret_token("cex")}
+    with TestClient(web_server.app) as client:
+        response = client.post("/telegram/cex", headers=headers,
+                               json=telegram_webhooks.make_fake_update("/start", chat_id=42))
+    assert response.status_code == 200
+    [update] = webhook_app.update_queue.updates
+    assert update.effective_chat.id == 42
+    assert update.message.text == "/start"
+
+def test_telegram_update_secret_is_per_bot(webhook_app):
+    """
+    Tests that a missing secret or another bot's secret is refused.
+    """
+    update = telegram_webhooks.make_fake_update("hi")
+    with TestClient(web_server.app) as client:
+        assert client.post("/telegram/cex", json=update).status_code == 401
+        headers = {telegram_webhooks.SECRET_HEADER: telegram_webhooks.secret_token("admin")}
+        assert client.post("/telegram/cex", json=update, headers=headers).status_code == 401
+    assert webhook_app.update_queue.updates == []
+
+def test_telegram_update_for_unknown_bot(webhook_app):
+    """
+    Tests that updates for a bot not served here are answered with 404.
+    """
+    headers = {telegram_webhooks.SECRET_HEADER: telegram_webhooks.secret_token("admin")}
+    with TestClient(web_server.app) as client:
+        response = client.post("/telegram/admin", headers=headers,
+                               json=telegram_webhooks.make_fake_update("hi"))
+    assert response.status_code == 404